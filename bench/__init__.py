@@ -0,0 +1,23 @@
+# bench/__init__.py
+"""
+Бенчмарки на окремій (тестовій) БД.
+
+Скрипти пишуть мільйони рядків, тому запускаються лише коли DB_NAME
+закінчується на «_bench» (або з --force):
+
+    DB_NAME=mpi_agro_bench python -m bench.notifications_1m
+    DB_NAME=mpi_agro_bench python -m bench.dataset        # синтетичний завод
+    DB_NAME=mpi_agro_bench python -m bench.run            # сценарії проти bench/baseline.json
+    DB_NAME=mpi_agro_bench python -m bench.query_budget   # ліміти запитів конструкторів (N+1)
+"""
+import sys
+
+
+def require_bench_db(argv: list[str] | None = None):
+    """Не даємо випадково засіяти робочу БД."""
+    from database.db_manager import DB_CONFIG   # .env уже підвантажено тут
+
+    argv = sys.argv[1:] if argv is None else argv
+    name = DB_CONFIG.get("database") or ""
+    if not name.endswith("_bench") and "--force" not in argv:
+        sys.exit(f"Відмова: DB_NAME={name!r} не схожа на тестову (очікується *_bench або --force)")
@@ -0,0 +1,277 @@
+# bench/dataset.py
+"""
+Синтетичний «завод» для бенчмарків.
+
+Засіює product_base, casting_requests і журнали всіх стадій так, як їх
+заповнюють сторінки: партії лиття → сушка по партії → К/Я лиття → обрізка
+(по артикулу) → різка по партії лиття → зачистка по партії різки →
+фінальний К/Я вибіркою по партії джерела → прийом на склад. Частина заявок
+доведена до кінця і закрита, решта зупинена на випадковій стадії.
+
+    DB_NAME=mpi_agro_bench python -m bench.dataset --products 500 --requests 300
+
+Генератор детермінований (seed), тому базові виміри (bench/baseline.json)
+порівнювані між запусками на тих самих параметрах.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import math
+import random
+import time
+
+from bench import require_bench_db
+from database import result_cache
+from database.db_manager import connect_db
+from database.journal_archive import JOURNAL_TABLES, archive_name
+
+BATCH = 2000
+
+# порядок очищення: дочірні таблиці раніше за батьківські
+TABLES = [
+    "notification_reads", "notification_read_marks", "notifications",
+    "warehouse_moves", "final_quality", "cleaning", "cutting", "trimming",
+    "casting_quality", "drying", "casting", "casting_requests", "product_base",
+]
+
+OPERATORS = ["Іваненко", "Петренко", "Коваль", "Шевчук", "Бондар", "Ткаченко", "Мельник", "Кравчук"]
+CLIENTS = ["Агро-Захід", "Ферма Схід", "Нива", "Зерно+", "Поле Плюс"]
+# (стадія, до якої дійшла незакрита заявка) — від неї і далі журнали не пишуться
+STOP_STAGES = ["casting", "drying", "casting_quality", "trimming", "cutting", "cleaning", "final_quality"]
+
+
+def _insert(cu, table: str, cols: list[str], rows: list[tuple]) -> list[int]:
+    """Багаторядковий INSERT пачками; повертає id вставлених рядків (InnoDB видає їх підряд)."""
+    ids: list[int] = []
+    collist = ", ".join(f"`{c}`" for c in cols)
+    ph = "(" + ",".join(["%s"] * len(cols)) + ")"
+    for k in range(0, len(rows), BATCH):
+        chunk = rows[k:k + BATCH]
+        cu.execute(
+            f"INSERT INTO `{table}` ({collist}) VALUES " + ",".join([ph] * len(chunk)),
+            [v for r in chunk for v in r],
+        )
+        ids.extend(range(cu.lastrowid, cu.lastrowid + len(chunk)))
+    return ids
+
+
+def _split(total: int, rnd: random.Random, lo: int = 40, hi: int = 250) -> list[int]:
+    out = []
+    while total > 0:
+        q = min(total, rnd.randint(lo, hi))
+        out.append(q)
+        total -= q
+    return out
+
+
+def reset(cu):
+    cu.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+    existing = {r[0] for r in cu.fetchall()}
+    cu.execute("SET FOREIGN_KEY_CHECKS = 0")
+    try:
+        # архіви журналів теж: інакше номери заявок нового засіву «успадкують» старі рядки
+        for t in TABLES + [archive_name(t) for t in JOURNAL_TABLES]:
+            if t in existing:
+                cu.execute(f"TRUNCATE TABLE `{t}`")
+    finally:
+        cu.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+def seed_products(cu, n: int, rnd: random.Random) -> list[dict]:
+    products = []
+    for i in range(n):
+        cutting = rnd.random() < 0.4
+        products.append({
+            "article_code": f"A{100000 + i}",
+            "name": f"Виріб {i} ({rnd.choice(['кронштейн', 'втулка', 'кришка', 'фланець', 'корпус'])})",
+            "weight_g": round(rnd.uniform(20, 900), 3),
+            "drying_needed": int(rnd.random() < 0.7),
+            "trimming_needed": int(rnd.random() < 0.6),
+            "cutting_needed": int(cutting),
+            # зачистка йде по партіях різки — без різки не буває
+            "cleaning_needed": int(cutting and rnd.random() < 0.7),
+        })
+    cols = list(products[0])
+    _insert(cu, "product_base", cols, [tuple(p[c] for c in cols) for p in products])
+    return products
+
+
+def seed_requests(cu, products: list[dict], n: int, rnd: random.Random, *,
+                  lines=(1, 8), closed_share: float = 0.6, days: int = 365) -> dict:
+    """Заявки з позиціями і журнали стадій. Повертає лічильники рядків по таблицях."""
+    counts: dict[str, int] = {}
+    today = dt.date.today()
+    for k in range(n):
+        req = str(1000 + k)
+        req_date = today - dt.timedelta(days=int((n - k) * days / max(n, 1)))
+        closed = rnd.random() < closed_share
+        stop = "done" if closed else rnd.choice(STOP_STAGES)
+        picked = rnd.sample(products, min(len(products), rnd.randint(*lines)))
+        t0 = dt.datetime.combine(req_date, dt.time(7, 0))
+
+        req_rows = [
+            (req, p["article_code"], rnd.randint(100, 2000), "casting", req_date,
+             rnd.choice(CLIENTS), "bench", int(closed))
+            for p in picked
+        ]
+        _insert(cu, "casting_requests",
+                ["request_number", "article_code", "quantity", "stage", "request_date", "client", "reason", "is_closed"],
+                req_rows)
+        counts["casting_requests"] = counts.get("casting_requests", 0) + len(req_rows)
+
+        def reached(stage: str) -> bool:
+            return stop == "done" or STOP_STAGES.index(stage) < STOP_STAGES.index(stop)
+
+        for p, (_, art, plan, *_rest) in zip(picked, req_rows):
+            name = p["name"]
+            ts = lambda h: t0 + dt.timedelta(hours=h, minutes=rnd.randint(0, 59))  # noqa: E731
+            # лиття: завжди хоча б частина плану
+            made = plan if reached("drying") else rnd.randint(plan // 4, plan)
+            batches = _split(made, rnd)
+            cast_rows = [
+                (req, art, name, q, rnd.randint(0, q // 20), rnd.choice(OPERATORS), f"M{rnd.randint(1, 12)}", ts(i))
+                for i, q in enumerate(batches)
+            ]
+            cast_ids = _insert(cu, "casting",
+                               ["request_number", "article_code", "product_name", "quantity", "defect_quantity",
+                                "operator_name", "machine_number", "created_at"], cast_rows)
+            counts["casting"] = counts.get("casting", 0) + len(cast_ids)
+            good = {cid: r[3] - r[4] for cid, r in zip(cast_ids, cast_rows)}
+
+            dry_ids: dict[int, int] = {}
+            if p["drying_needed"] and reached("drying"):
+                rows = []
+                for i, cid in enumerate(cast_ids):
+                    start = ts(i + 1)
+                    rows.append((req, art, name, good[cid], rnd.choice(OPERATORS), cid, start,
+                                 start + dt.timedelta(hours=rnd.randint(4, 24)), start))
+                ids = _insert(cu, "drying",
+                              ["request_number", "article_code", "product_name", "qty", "operator_name",
+                               "casting_id", "start_time", "end_time", "created_at"], rows)
+                dry_ids = dict(zip(cast_ids, ids))
+                counts["drying"] = counts.get("drying", 0) + len(ids)
+
+            if not reached("casting_quality"):
+                continue
+            qc_bad: dict[int, int] = {}
+            rows = []
+            for i, cid in enumerate(cast_ids):
+                bad = rnd.randint(0, max(0, good[cid] // 30))
+                qc_bad[cid] = bad
+                rows.append((req, art, name, rnd.choice(OPERATORS), good[cid], good[cid] - bad, bad,
+                             dry_ids.get(cid), cid, ts(i + 30)))
+            _insert(cu, "casting_quality",
+                    ["request_number", "article_code", "product_name", "controller_name", "checked_quantity",
+                     "accepted_quantity", "defect_quantity", "drying_id", "casting_id", "created_at"], rows)
+            counts["casting_quality"] = counts.get("casting_quality", 0) + len(rows)
+            accepted = sum(good[c] - qc_bad[c] for c in cast_ids)
+
+            # джерела для фінального К/Я: (префікс, id, к-сть)
+            parts: list[tuple[str, int, int]] = []
+            if p["trimming_needed"] and reached("trimming"):
+                rows = [(req, art, name, rnd.choice(OPERATORS), q, rnd.randint(0, q // 40), ts(40 + i))
+                        for i, q in enumerate(_split(accepted, rnd, 200, 600))]
+                ids = _insert(cu, "trimming",
+                              ["request_number", "article_code", "product_name", "operator_name",
+                               "processed_quantity", "defect_quantity", "created_at"], rows)
+                counts["trimming"] = counts.get("trimming", 0) + len(ids)
+                parts = [("TR", tid, r[4] - r[5]) for tid, r in zip(ids, rows)]
+
+            if p["cutting_needed"] and reached("cutting"):
+                rows = []
+                for i, cid in enumerate(cast_ids):
+                    q = good[cid] - qc_bad[cid]
+                    rows.append((req, art, name, rnd.choice(OPERATORS), q, rnd.randint(0, q // 40), cid, ts(50 + i)))
+                cut_ids = _insert(cu, "cutting",
+                                  ["request_number", "article_code", "product_name", "operator_name",
+                                   "processed_quantity", "defect_quantity", "casting_id", "created_at"], rows)
+                counts["cutting"] = counts.get("cutting", 0) + len(cut_ids)
+                parts = [("CU", xid, r[4] - r[5]) for xid, r in zip(cut_ids, rows)]
+
+                if p["cleaning_needed"] and reached("cleaning"):
+                    rows = [(req, art, name, rnd.choice(OPERATORS), q, rnd.randint(0, q // 50), xid, ts(60 + i))
+                            for i, (_, xid, q) in enumerate(parts)]
+                    ids = _insert(cu, "cleaning",
+                                  ["request_number", "article_code", "product_name", "operator_name",
+                                   "processed_quantity", "defect_quantity", "cutting_id", "created_at"], rows)
+                    counts["cleaning"] = counts.get("cleaning", 0) + len(ids)
+                    parts = [("CL", yid, r[4] - r[5]) for yid, r in zip(ids, rows)]
+
+            if not parts and dry_ids:
+                parts = [("DR", did, good[cid] - qc_bad[cid]) for cid, did in dry_ids.items()]
+            if not reached("final_quality") or not parts:
+                continue
+            link = {"DR": "drying_id", "TR": "trimming_id", "CU": "cutting_id", "CL": "cleaning_id"}
+            rows = []
+            for i, (prefix, pid, q) in enumerate(parts):
+                checked = max(1, math.ceil(q * 0.1))
+                ids_by_col = {c: None for c in link.values()}
+                ids_by_col[link[prefix]] = pid
+                rows.append((req, art, name, rnd.choice(OPERATORS), checked, checked - rnd.randint(0, checked // 20),
+                             ids_by_col["drying_id"], ids_by_col["trimming_id"],
+                             ids_by_col["cutting_id"], ids_by_col["cleaning_id"], ts(70 + i)))
+            fq_ids = _insert(cu, "final_quality",
+                             ["request_number", "article_code", "product_name", "inspector_name", "checked_quantity",
+                              "accepted_quantity", "drying_id", "trimming_id", "cutting_id", "cleaning_id",
+                              "created_at"], rows)
+            counts["final_quality"] = counts.get("final_quality", 0) + len(fq_ids)
+
+            if stop == "done":
+                moves = [(ts(80 + i), req, art, name, q, "Прийом з фінального К/Я", rnd.choice(OPERATORS),
+                          "final_quality", fid)
+                         for i, (fid, (_, _, q)) in enumerate(zip(fq_ids, parts))]
+                _insert(cu, "warehouse_moves",
+                        ["move_time", "request_number", "article_code", "product_name", "qty", "reason",
+                         "operator_name", "source_table", "source_id"], moves)
+                counts["warehouse_moves"] = counts.get("warehouse_moves", 0) + len(moves)
+    return counts
+
+
+def seed_notifications(cu, n: int, rnd: random.Random):
+    rows = [
+        (f"Заявка №{1000 + rnd.randint(0, 999)}: подія {i}",
+         rnd.choice(("info", "success", "warning", "error")),
+         "banner" if rnd.random() < 0.01 else rnd.choice(("app", "final_quality", "system")))
+        for i in range(n)
+    ]
+    _insert(cu, "notifications", ["message", "level", "src"], rows)
+
+
+def seed_plant(products: int = 500, requests: int = 300, notifications: int = 50_000, *,
+               seed: int = 42, closed_share: float = 0.6) -> dict:
+    rnd = random.Random(seed)
+    cn = connect_db()
+    try:
+        cu = cn.cursor()
+        reset(cu)
+        prods = seed_products(cu, products, rnd)
+        counts = seed_requests(cu, prods, requests, rnd, closed_share=closed_share)
+        seed_notifications(cu, notifications, rnd)
+        cn.commit()
+    finally:
+        cn.close()
+    # засів пише напряму, повз db_exec — кешовані агрегати вже недійсні
+    result_cache.clear()
+    counts.update(product_base=products, notifications=notifications)
+    return counts
+
+
+def main():
+    require_bench_db()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=500)
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--notifications", type=int, default=50_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    counts = seed_plant(args.products, args.requests, args.notifications, seed=args.seed)
+    print(f"seed: {time.perf_counter() - t0:.1f} s")
+    for t, n in sorted(counts.items()):
+        print(f"  {t:<18} {n:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# bench/harness.py
+"""
+Спільне для бенчмарків: «порожня» сторінка Flet, лічильник SQL-запитів,
+заміри сценаріїв і порівняння з базовими значеннями.
+
+    with count_queries() as qc:
+        build_all_stage_cards("1042", BenchPage())
+    print(qc.count, qc.db_ms, qc.by_fingerprint.most_common(3))
+"""
+from __future__ import annotations
+
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+from database import query_profiler
+from database.executor import wait_idle
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+
+class BenchPage:
+    """
+    Заміна ft.Page без клієнта: будь-які виклики (update, go, run_task, open…)
+    нічого не роблять, а списки overlay/views/controls — справжні.
+    Фонові задачі (page.run_task) не запускаються — у замір іде лише побудова.
+    """
+
+    def __init__(self):
+        self.overlay: list = []
+        self.views: list = []
+        self.controls: list = []
+        self.data: dict = {}
+        self.route = "/"
+        self.width = 1600
+        self.height = 900
+
+    def __getattr__(self, _):
+        def _noop(*a, **k):  # noqa: ANN001
+            return None
+        return _noop
+
+
+class QueryCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.db_sec = 0.0
+        self.by_fingerprint: Counter[str] = Counter()
+
+    def _on_query(self, fp, elapsed, rows, caller):
+        with self._lock:
+            self.count += 1
+            self.db_sec += elapsed
+            self.by_fingerprint[fp] += 1
+
+    @property
+    def db_ms(self) -> float:
+        return self.db_sec * 1000
+
+    def __enter__(self):
+        query_profiler.enable(True)
+        query_profiler.add_listener(self._on_query)
+        return self
+
+    def __exit__(self, *exc):
+        # запити, запущені через QuerySlot, теж належать до цього заміру
+        wait_idle(30)
+        query_profiler.remove_listener(self._on_query)
+        return False
+
+
+def count_queries() -> QueryCounter:
+    return QueryCounter()
+
+
+def measure(fn: Callable[[], object], repeat: int = 10, warmup: int = 1) -> dict:
+    """p50/p95 часу (мс) і к-сть запитів за один прогін сценарію."""
+    for _ in range(warmup):
+        with count_queries():
+            fn()
+    times: list[float] = []
+    queries: list[int] = []
+    db: list[float] = []
+    for _ in range(repeat):
+        with count_queries() as qc:
+            t0 = time.perf_counter()
+            fn()
+            wait_idle(30)
+            times.append((time.perf_counter() - t0) * 1000)
+        queries.append(qc.count)
+        db.append(qc.db_ms)
+    times.sort()
+    return {
+        "p50_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[max(0, int(len(times) * 0.95) - 1)], 2),
+        "db_ms": round(statistics.median(db), 2),
+        "queries": max(queries),
+    }
+
+
+# ───────────────────────── базові значення ─────────────────────────
+def load_baseline(path: Path = BASELINE_PATH) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results: dict, dataset: dict, path: Path = BASELINE_PATH):
+    path.write_text(
+        json.dumps({"dataset": dataset, "scenarios": results}, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list[str]:
+    """
+    Регресії відносно базових значень: більше запитів, ніж було,
+    або p50 повільніший більш ніж на tolerance (частка).
+    """
+    problems = []
+    base = baseline.get("scenarios", {})
+    for name, r in results.items():
+        b = base.get(name)
+        if not b:
+            continue
+        if r["queries"] > b["queries"]:
+            problems.append(f"{name}: запитів {r['queries']} > базових {b['queries']}")
+        if r["p50_ms"] > b["p50_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p50 {r['p50_ms']} мс > базових {b['p50_ms']} мс (+{tolerance:.0%})")
+    return problems
@@ -0,0 +1,117 @@
+# bench/notifications_1m.py
+"""
+unread_of_source('banner') на 1M нотифікацій.
+
+Засіює notifications (1% — банери) і notification_reads (кожен користувач
+прочитав усі банери, крім останніх кількох), після чого порівнює старий
+анти-join по всій таблиці з пошуком по (src, id) від останнього прочитаного.
+
+    DB_NAME=mpi_agro_bench python -m bench.notifications_1m [--rows 1000000] [--users 20] [--skip-seed]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from bench import require_bench_db
+from database.db_manager import connect_db
+from utils import notifications as notif
+
+BATCH = 5000
+LEVELS = ("info", "success", "warning", "error")
+
+OLD_SQL = """
+    SELECT n.id
+    FROM notifications n
+    LEFT JOIN notification_reads r
+           ON r.notification_id = n.id AND r.user_key = %s
+    WHERE r.id IS NULL AND n.src = %s
+    ORDER BY n.id ASC
+    LIMIT 1
+"""
+
+
+def seed(rows: int, users: int, unread_tail: int = 3):
+    notif._ensure_reads_table()
+    rnd = random.Random(42)
+    with connect_db() as cn:
+        cu = cn.cursor()
+        cu.execute("DELETE FROM notification_reads")
+        cu.execute("DELETE FROM notification_read_marks")
+        cu.execute("DELETE FROM notifications")
+        cn.commit()
+        done = 0
+        while done < rows:
+            n = min(BATCH, rows - done)
+            vals = []
+            for i in range(n):
+                src = "banner" if rnd.random() < 0.01 else rnd.choice(("app", "final_quality", "system"))
+                vals.extend((f"bench #{done + i}", rnd.choice(LEVELS), src))
+            cu.execute(
+                "INSERT INTO notifications (message, level, src) VALUES "
+                + ",".join(["(%s,%s,%s)"] * n),
+                vals,
+            )
+            cn.commit()
+            done += n
+        cu.execute("SELECT id FROM notifications WHERE src='banner' ORDER BY id")
+        banners = [r[0] for r in cu.fetchall()]
+        read = banners[:-unread_tail] if len(banners) > unread_tail else []
+        for u in range(users):
+            for k in range(0, len(read), BATCH):
+                chunk = read[k:k + BATCH]
+                cu.execute(
+                    "INSERT IGNORE INTO notification_reads (notification_id, user_key) VALUES "
+                    + ",".join(["(%s,%s)"] * len(chunk)),
+                    [v for nid in chunk for v in (nid, f"user{u}")],
+                )
+            cn.commit()
+    return len(banners)
+
+
+def timed(fn, repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def _fmt(ms: list[float]) -> str:
+    ms = sorted(ms)
+    return f"p50={statistics.median(ms):.2f} ms  p95={ms[int(len(ms) * 0.95) - 1]:.2f} ms"
+
+
+def main():
+    require_bench_db()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--skip-seed", action="store_true")
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+
+    if not args.skip_seed:
+        t0 = time.perf_counter()
+        banners = seed(args.rows, args.users)
+        print(f"seed: {args.rows} рядків, {banners} банерів, {time.perf_counter() - t0:.1f} s")
+
+    def old():
+        with connect_db() as cn:
+            cu = cn.cursor()
+            cu.execute(OLD_SQL, ("user0", "banner"))
+            cu.fetchall()
+
+    def new():
+        notif.unread_of_source("user0", src_value="banner", limit=1)
+
+    print("old anti-join        :", _fmt(timed(old, args.repeat)))
+    print("seek from read marks :", _fmt(timed(new, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
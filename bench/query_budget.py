@@ -0,0 +1,145 @@
+# bench/query_budget.py
+"""
+Ліміти кількості SQL-запитів для конструкторів екранів (захист від N+1).
+
+Кожен конструктор запускається на двох засіяних наборах різного розміру
+(bench.dataset) з лічильником запитів. Перевірка падає (код виходу 1), якщо
+
+* запитів більше за бюджет із BUDGETS, або
+* на більшому наборі запитів більше, ніж на меншому — тобто кількість
+  росте з даними (з'явився запит на рядок/партію/заявку).
+
+    DB_NAME=mpi_agro_bench python -m bench.query_budget [--sizes 15,120]
+    DB_NAME=mpi_agro_bench python -m pytest tests/test_query_budget.py
+
+Для конструкторів однієї заявки береться заявка з найбільшою кількістю
+партій лиття — там N+1 видно найкраще.
+
+Модуль імпортується без драйвера БД (BUDGETS читає збирач тестів pytest),
+тому залежності від БД імпортуються у функціях.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Callable
+
+from bench import require_bench_db
+
+# назва → макс. запитів за один виклик
+BUDGETS: dict[str, int] = {
+    "stage_cards.build_all_stage_cards": 3,      # позиції + знімок стадій (UNION ALL) + таймер сушки
+    "monitoring._requests_view(active)": 2,
+    "monitoring._requests_view(closed)": 4,      # незакриті з 100% + закриті з архівом
+    "monitoring._no_request_active_view": 1,
+    "casting_request.view (load_active + load_history)": 4,
+    "final_quality.reload_parts (plan_samples)": 5,   # артикули + ≤4 стадії-джерела
+    "casting_quality.reload_parts (plan_parts)": 2,
+    "monitoring_cards.build_request_breakdown": 1,   # UNION ALL по семи стадіях
+}
+
+
+DEFAULT_SIZES = (15, 120)
+
+
+def _busiest_request() -> str:
+    from database.db_manager import db_fetch
+
+    rows = db_fetch(
+        "SELECT request_number FROM casting GROUP BY request_number ORDER BY COUNT(*) DESC LIMIT 1"
+    )
+    return rows[0]["request_number"] if rows else "0"
+
+
+def builders() -> dict[str, Callable[[], object]]:
+    from bench.harness import BenchPage
+    import monitoring_cards
+    import monitoring_cards.stage_cards as stage_cards
+    import pages.casting_request as casting_request
+    import pages.monitoring as monitoring
+    from pages.casting_quality import plan_parts
+    from pages.final_quality import plan_samples
+
+    rn = _busiest_request()
+    return {
+        "stage_cards.build_all_stage_cards": lambda: stage_cards.build_all_stage_cards(rn, BenchPage()),
+        "monitoring._requests_view(active)": lambda: monitoring._requests_view(BenchPage(), active=True),
+        "monitoring._requests_view(closed)": lambda: monitoring._requests_view(BenchPage(), active=False),
+        "monitoring._no_request_active_view": lambda: monitoring._no_request_active_view(BenchPage()),
+        "casting_request.view (load_active + load_history)": lambda: casting_request.view(BenchPage()),
+        "final_quality.reload_parts (plan_samples)": lambda: plan_samples(rn),
+        "casting_quality.reload_parts (plan_parts)": lambda: plan_parts(rn),
+        "monitoring_cards.build_request_breakdown": lambda: monitoring_cards.build_request_breakdown(BenchPage(), rn),
+    }
+
+
+def count_all() -> dict[str, int | str]:
+    from bench.harness import count_queries
+
+    out: dict[str, int | str] = {}
+    for name, fn in builders().items():
+        try:
+            # перший виклик — прогрів (імпорти, journal_archive.has_archive), рахуємо другий
+            fn()
+            with count_queries() as qc:
+                fn()
+            out[name] = qc.count
+        except Exception as e:
+            out[name] = f"error: {e}"
+    return out
+
+
+def measure(sizes) -> list[dict[str, int | str]]:
+    """Засіяти набір кожного розміру і порахувати запити всіх конструкторів."""
+    from bench.dataset import seed_plant
+    from database import result_cache
+
+    # рахуємо запити самих конструкторів, а не влучання в спільний кеш
+    result_cache.enable(False)
+    runs: list[dict] = []
+    for n in sorted(sizes):
+        seed_plant(products=max(20, n * 2), requests=n, notifications=1000)
+        runs.append(count_all())
+    return runs
+
+
+def violations(name: str, runs: list[dict]) -> list[str]:
+    """Порушення бюджету конструктора name на наборах runs (від меншого до більшого)."""
+    budget = BUDGETS[name]
+    counts = [r.get(name) for r in runs]
+    bad = next((c for c in counts if not isinstance(c, int)), None)
+    if bad is not None:
+        return [f"{name}: {bad}"]
+    problems = []
+    if max(counts) > budget:
+        problems.append(f"{name}: {max(counts)} запитів > бюджет {budget}")
+    if counts[-1] > counts[0]:
+        problems.append(f"{name}: запитів {counts[0]} → {counts[-1]} зі зростанням даних (N+1?)")
+    return problems
+
+
+def check(sizes: list[int]) -> list[str]:
+    runs = measure(sizes)
+    print(f"{'конструктор':<52}" + "".join(f"{f'n={n}':>9}" for n in sizes) + f"{'бюджет':>9}")
+    problems: list[str] = []
+    for name, budget in BUDGETS.items():
+        print(f"{name:<52}" + "".join(f"{str(r.get(name)):>9}" for r in runs) + f"{budget:>9}")
+        problems += violations(name, runs)
+    return problems
+
+
+def main() -> int:
+    require_bench_db()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="к-сть заявок у наборах, через кому")
+    args = ap.parse_args()
+    sizes = sorted(int(x) for x in args.sizes.split(",") if x.strip())
+    problems = check(sizes)
+    for p in problems:
+        print("FAIL", p)
+    print("OK" if not problems else f"{len(problems)} порушень")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
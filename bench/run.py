@@ -0,0 +1,108 @@
+# bench/run.py
+"""
+Сценарії «як у цеху» на засіяній БД (bench.dataset) з порівнянням з базою.
+
+    DB_NAME=mpi_agro_bench python -m bench.run --seed-plant           # засіяти і виміряти
+    DB_NAME=mpi_agro_bench python -m bench.run --save-baseline        # записати bench/baseline.json
+    DB_NAME=mpi_agro_bench python -m bench.run                        # порівняти з базою (код 1 — регресія)
+
+Кожен сценарій виконується --repeat разів; у звіті p50/p95, час SQL і
+кількість запитів за прогін.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import Callable
+
+from bench import require_bench_db
+from bench.dataset import seed_plant
+from bench.harness import BenchPage, compare, load_baseline, measure, save_baseline
+from database import result_cache
+from database.db_manager import db_fetch
+
+
+def _sample_requests() -> dict:
+    """Типові заявки: найновіша відкрита і найновіша закрита."""
+    rows = db_fetch(
+        """
+        SELECT request_number, MIN(is_closed) AS closed
+          FROM casting_requests
+         GROUP BY request_number
+         ORDER BY MAX(id) DESC
+        """
+    )
+    open_rn = next((r["request_number"] for r in rows if not r["closed"]), None)
+    closed_rn = next((r["request_number"] for r in rows if r["closed"]), None)
+    return {"open": open_rn or closed_rn or "0", "closed": closed_rn or open_rn or "0"}
+
+
+def scenarios() -> dict[str, Callable[[], object]]:
+    # імпорти сторінок тут, щоб засів (--seed-plant) працював і без Flet
+    from monitoring_cards.stage_cards import build_all_stage_cards
+    from pages.final_quality import plan_samples
+    from pages.monitoring import monitoring_view
+    from pages.monitoring_warehouse import warehouse_view
+    from utils import notifications as notif
+
+    reqs = _sample_requests()
+    return {
+        "open monitoring":          lambda: monitoring_view(BenchPage()),
+        "monitoring: stage cards":  lambda: build_all_stage_cards(reqs["open"], BenchPage()),
+        "open warehouse":           lambda: warehouse_view(BenchPage()),
+        "final QC: pick parts":     lambda: plan_samples(reqs["open"]),
+        "history search":           lambda: notif.history("bench", q="подія 1", limit=200),
+        "history search + archive": lambda: notif.history("bench", q="подія 1", limit=200, include_archive=True),
+    }
+
+
+def main() -> int:
+    require_bench_db()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seed-plant", action="store_true", help="перезасіяти БД перед замірами")
+    ap.add_argument("--products", type=int, default=500)
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--notifications", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--only", default="", help="підрядок назви сценарію")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+
+    dataset = {"products": args.products, "requests": args.requests, "notifications": args.notifications}
+    if args.seed_plant:
+        t0 = time.perf_counter()
+        counts = seed_plant(**dataset)
+        print(f"seed: {sum(counts.values())} рядків за {time.perf_counter() - t0:.1f} s")
+
+    results = {}
+    print(f"{'сценарій':<28} {'p50':>9} {'p95':>9} {'SQL':>9} {'запитів':>8}")
+    for name, fn in scenarios().items():
+        if args.only and args.only not in name:
+            continue
+        r = measure(fn, repeat=args.repeat)
+        results[name] = r
+        print(f"{name:<28} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['db_ms']:>7.1f}ms {r['queries']:>8}")
+    print(result_cache.report(top=10))
+
+    if args.save_baseline:
+        save_baseline(results, dataset)
+        print("baseline збережено")
+        return 0
+
+    baseline = load_baseline()
+    if not baseline:
+        print("baseline відсутній (--save-baseline, щоб створити)")
+        return 0
+    if baseline.get("dataset") != dataset:
+        print(f"увага: baseline знято на іншому наборі {baseline.get('dataset')}")
+    problems = compare(results, baseline, args.tolerance)
+    for p in problems:
+        print("REGRESSION", p)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# components/journal_table.py
+# -*- coding: utf-8 -*-
+"""
+Журнальна таблиця стадії з локальною моделлю рядків.
+
+Сторінки стадій після кожного збереження/видалення перечитували весь журнал
+і будували всі DataRow заново. JournalTable тримає записи в пам'яті і після
+зміни торкається лише одного DataRow:
+
+    journal = JournalTable(
+        table, make_row,
+        load_rows=lambda: db_fetch("SELECT * FROM casting ORDER BY id DESC LIMIT 50"),
+        load_one=lambda rid: (db_fetch("SELECT * FROM casting WHERE id=%s", (rid,)) or [None])[0],
+        limit=50,
+    )
+    journal.reload()            # повне завантаження (відкриття сторінки, зміна фільтра)
+    journal.refresh_one(rid)    # після INSERT/UPDATE: один SELECT по PK і заміна рядка
+    journal.remove(rid)         # після DELETE: без запитів
+
+Якщо модель розійшлася з таблицею (рядка, який оновлюємо/видаляємо, немає,
+або хтось змінив table.rows напряму) — робимо повний reload().
+Оновлення сторінки (page.update()) лишається за викликачем, як і раніше.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import flet as ft
+
+from utils.logger import log
+
+
+class JournalTable:
+    def __init__(
+        self,
+        table: ft.DataTable,
+        make_row: Callable[[dict], ft.DataRow],
+        *,
+        load_rows: Callable[[], list[dict]],
+        load_one: Callable[[Any], dict | None] | None = None,
+        key: str = "id",
+        limit: int | None = None,
+    ):
+        self.table = table
+        self.make_row = make_row
+        self.load_rows = load_rows
+        self.load_one = load_one
+        self.key = key
+        self.limit = limit
+        self._records: list[dict] = []
+        self.reloads = 0
+        self.patches = 0
+
+    # ── читання моделі ──
+    @property
+    def records(self) -> list[dict]:
+        return list(self._records)
+
+    def get(self, k) -> dict | None:
+        i = self._index(k)
+        return self._records[i] if i is not None else None
+
+    # ── повне завантаження ──
+    def load(self, rows: list[dict]):
+        self._records = list(rows)
+        self.table.rows = [self.make_row(r) for r in self._records]
+
+    def reload(self):
+        self.reloads += 1
+        self.load(self.load_rows())
+
+    # ── точкові зміни ──
+    def upsert(self, rec: dict, *, front: bool = True):
+        """Замінити рядок з тим самим ключем або додати новий (згори за замовчуванням)."""
+        if not self._in_sync():
+            self.reload()
+            return
+        self.patches += 1
+        i = self._index(rec[self.key])
+        if i is not None:
+            self._records[i] = rec
+            self.table.rows[i] = self.make_row(rec)
+            return
+        if front:
+            self._records.insert(0, rec)
+            self.table.rows.insert(0, self.make_row(rec))
+        else:
+            self._records.append(rec)
+            self.table.rows.append(self.make_row(rec))
+        if self.limit and len(self._records) > self.limit:
+            del self._records[self.limit:]
+            del self.table.rows[self.limit:]
+
+    def remove(self, k):
+        i = self._index(k)
+        if i is None or not self._in_sync():
+            # видаляємо те, чого ми не показували — модель застаріла
+            self.reload()
+            return
+        self.patches += 1
+        del self._records[i]
+        del self.table.rows[i]
+
+    def refresh_one(self, k, *, front: bool = True):
+        """Перечитати один запис за ключем і оновити лише його рядок."""
+        if self.load_one is None:
+            self.reload()
+            return
+        try:
+            rec = self.load_one(k)
+        except Exception as e:
+            log(f"journal refresh_one({k}) failed: {e}", tag="journal")
+            self.reload()
+            return
+        if rec is None:
+            # запис уже видалено (іншим користувачем) — прибираємо, якщо показували
+            if self._index(k) is not None:
+                self.remove(k)
+            return
+        self.upsert(rec, front=front)
+
+    # ── службове ──
+    def _index(self, k) -> int | None:
+        for i, r in enumerate(self._records):
+            if r.get(self.key) == k:
+                return i
+        return None
+
+    def _in_sync(self) -> bool:
+        return len(self.table.rows) == len(self._records)
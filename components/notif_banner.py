@@ -2,8 +2,14 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 import asyncio
+import threading
 import flet as ft
+from database import changes
 from utils import notifications as notif
+from utils.ui_updates import schedule_update
+
+
+FALLBACK_POLL_SEC = 60
 
 
 def _bg_for_level(level: str | None) -> str:
@@ -20,7 +26,8 @@ def _bg_for_level(level: str | None) -> str:
 def NotifBanner(page: ft.Page, *, user_key: str):
     """
     Банер системних повідомлень (src='banner'), що показується 1 раз для кожного користувача.
-    Автоперевірка кожні 10 секунд.
+    Перевіряється одразу після нового сповіщення (database/changes, з інших ПК — через
+    change_log) і про всяк випадок раз на FALLBACK_POLL_SEC.
     """
     banner = ft.Banner(
         bgcolor="#0b1a2a",
@@ -30,27 +37,39 @@ def NotifBanner(page: ft.Page, *, user_key: str):
     )
     page.banner = banner
 
-    async def _poll():
-        while True:
+    shown = {"id": None}
+    check_lock = threading.Lock()
+
+    def _check():
+        # зміна і резервне опитування можуть збігтися — перевіряємо по черзі
+        with check_lock:
             rows = notif.unread_of_source(user_key, src_value="banner", limit=1)
-            if rows:
+            # оновлюємо UI лише коли з'явився НОВИЙ банер, а не на кожну перевірку
+            if rows and int(rows[0]["id"]) != shown["id"]:
                 r = rows[0]
                 msg = r.get("msg", "") or ""
                 level = r.get("level")
                 nid = int(r["id"])
+                shown["id"] = nid
                 banner.bgcolor = _bg_for_level(level)
                 banner.content = ft.Text(msg, size=16, selectable=True)
                 # Кнопки дій
                 def _close_and_mark(_):
                     notif.mark_read_by_user([nid], user_key)
                     banner.open = False
-                    page.update()
+                    schedule_update(page)
 
                 banner.actions = [
                     ft.TextButton("Закрити", on_click=_close_and_mark),
                 ]
                 banner.open = True
-                page.update()
-            await asyncio.sleep(10)
+                schedule_update(page)
+
+    changes.watch(page, "notif_banner", lambda _batch: _check(), tables=("notifications",))
+
+    async def _poll():
+        while True:
+            await asyncio.to_thread(_check)
+            await asyncio.sleep(FALLBACK_POLL_SEC)
 
     page.run_task(_poll)
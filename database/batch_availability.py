@@ -0,0 +1,92 @@
+# database/batch_availability.py
+"""
+Залишок по партіях для стадій «Різка» та «Зачистка».
+
+Для кожної партії попередньої стадії рахує «добру» кількість після
+верхнього контролю мінус уже оброблене на поточній стадії — одним
+згрупованим запитом на всю заявку (замість 2–3 запитів на кожну партію).
+
+    rows = batch_availability("cutting", request_number="102")
+    row  = batch_row("cleaning", cut_id)
+
+Кожен рядок: id, request_number, article_code, product_name, total, done, left.
+"""
+from __future__ import annotations
+
+from database.db_manager import db_fetch
+
+# stage → звідки беремо партії і як рахуємо «добре» / «вже оброблено»
+BATCH_SOURCES: dict[str, dict] = {
+    # Різка: партії лиття; добре = лиття − брак лиття − брак К/Я лиття
+    "cutting": {
+        "source": "casting",
+        "flag": "cutting_needed",
+        "name": "pb.name",
+        "good": "s.quantity - COALESCE(s.defect_quantity,0) - COALESCE(qc.bad,0)",
+        "qc_join": """
+            LEFT JOIN (
+                SELECT casting_id, SUM(checked_quantity - accepted_quantity) AS bad
+                  FROM casting_quality
+                 WHERE casting_id IN (SELECT id FROM casting s WHERE {where})
+                 GROUP BY casting_id
+            ) qc ON qc.casting_id = s.id
+        """,
+        "target": "cutting",
+        "fk": "casting_id",
+    },
+    # Зачистка: партії різки; добре = оброблено − брак різки
+    "cleaning": {
+        "source": "cutting",
+        "flag": "cleaning_needed",
+        "name": "s.product_name",
+        "good": "s.processed_quantity - COALESCE(s.defect_quantity,0)",
+        "qc_join": "",
+        "target": "cleaning",
+        "fk": "cutting_id",
+    },
+}
+
+
+def _query(stage: str, where: str, params: tuple, *, need_flag: bool) -> list[dict]:
+    spec = BATCH_SOURCES[stage]
+    flag_sql = f" AND pb.{spec['flag']} = 1" if need_flag else ""
+    qc_join = spec["qc_join"].format(where=where) if spec["qc_join"] else ""
+    sql = f"""
+        SELECT s.id, s.request_number, s.article_code,
+               {spec['name']} AS product_name,
+               GREATEST(0, {spec['good']}) AS total,
+               COALESCE(dn.q, 0) AS done
+          FROM {spec['source']} s
+          JOIN product_base pb ON pb.article_code = s.article_code
+          {qc_join}
+          LEFT JOIN (
+                SELECT {spec['fk']} AS bid, SUM(processed_quantity) AS q
+                  FROM {spec['target']}
+                 WHERE {spec['fk']} IN (SELECT id FROM {spec['source']} s WHERE {where})
+                 GROUP BY {spec['fk']}
+          ) dn ON dn.bid = s.id
+         WHERE {where}{flag_sql}
+         ORDER BY s.id
+    """
+    # умова where стоїть у підзапиті «оброблено», в основному WHERE і (для різки) у підзапиті К/Я
+    rows = db_fetch(sql, params * (3 if qc_join else 2))
+    for r in rows:
+        r["total"] = int(r["total"] or 0)
+        r["done"] = int(r["done"] or 0)
+        r["left"] = r["total"] - r["done"]
+    return rows
+
+
+def batch_availability(stage: str, request_number: str, *, only_open: bool = True) -> list[dict]:
+    """
+    Усі партії заявки, що потребують стадії `stage`.
+    only_open=True — лише ті, де ще є залишок (done < total).
+    """
+    rows = _query(stage, "s.request_number = %s", (request_number,), need_flag=True)
+    return [r for r in rows if r["left"] > 0] if only_open else rows
+
+
+def batch_row(stage: str, batch_id: int) -> dict | None:
+    """Одна партія за id (для вибору партії / редагування запису)."""
+    rows = _query(stage, "s.id = %s", (batch_id,), need_flag=False)
+    return rows[0] if rows else None
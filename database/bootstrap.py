@@ -4,19 +4,19 @@ from __future__ import annotations
 
 import datetime as _dt
 from contextlib import contextmanager
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from database.db_manager import connect_db
 
 # Логер: використовуємо utils.logger.log, а якщо немає — простий принт
 try:
     from utils.logger import log as _ext_log
-    def log(msg: str, tag: str = "bootstrap"):
-        _ext_log(msg, tag=tag)
+    def log(msg: str, tag: str = "bootstrap", *, level: str = "info"):
+        _ext_log(msg, tag=tag, level=level)
 except Exception:
-    def log(msg: str, tag: str = "bootstrap"):
+    def log(msg: str, tag: str = "bootstrap", *, level: str = "info"):
         now = _dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{tag} {now}] {msg}")
+        print(f"[{tag} {now}] {level.upper()} {msg}")
 
 # ───────────────────────────── helpers ─────────────────────────────
 
@@ -225,6 +225,7 @@ TABLES: Dict[str, Dict[str, Any]] = {
             ("`client`         VARCHAR(120) NOT NULL",                        "Клієнт/замовник", "request_date"),
             ("`reason`         VARCHAR(255) NOT NULL",                        "Примітка/причина", "client"),
             ("`is_closed` TINYINT(1) NOT NULL DEFAULT 0",                    "Прапорець: 1 – заявка закрита, 0 – активна", "reason"),
+            ("`closed_notified_at` DATETIME NULL",                           "Коли опубліковано «Заявка … завершена» (один раз)", "is_closed"),
             ("`created_at`     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP", "Створено", "reason"),
             ("PRIMARY KEY (`id`)", "", None),
         ],
@@ -252,8 +253,9 @@ TABLES: Dict[str, Dict[str, Any]] = {
         ],
         "unique": [],
         "indexes": [
-            ("idx_casting_req", ["request_number"]),
             ("idx_casting_art", ["article_code"]),
+            # покриваючий для SUM(quantity) по (заявка, артикул) — без звернення до рядків
+            ("idx_casting_req_art_qty", ["request_number", "article_code", "quantity", "defect_quantity"]),
         ],
         "fks": [],
     },
@@ -275,8 +277,9 @@ TABLES: Dict[str, Dict[str, Any]] = {
         ],
         "unique": [("uq_drying_casting", ["casting_id"])],
         "indexes": [
-            ("idx_drying_req", ["request_number"]),
             ("idx_drying_art", ["article_code"]),
+            ("idx_drying_req_art_qty", ["request_number", "article_code", "end_time", "qty"]),
+            ("idx_drying_end", ["end_time"]),
         ],
         "fks": [
             ("fk_drying_casting", "casting_id", "casting", "id", "CASCADE", "CASCADE"),
@@ -302,10 +305,10 @@ TABLES: Dict[str, Dict[str, Any]] = {
         ],
         "unique": [],
         "indexes": [
-            ("idx_cq_req", ["request_number"]),
             ("idx_cq_art", ["article_code"]),
             ("idx_cq_cast", ["casting_id"]),
             ("idx_cq_dry",  ["drying_id"]),
+            ("idx_cq_req_art_qty", ["request_number", "article_code", "checked_quantity", "accepted_quantity"]),
         ],
         "fks": [
             ("fk_cq_casting", "casting_id", "casting", "id", "SET NULL", "CASCADE"),
@@ -328,8 +331,8 @@ TABLES: Dict[str, Dict[str, Any]] = {
         ],
         "unique": [],
         "indexes": [
-            ("idx_trim_req", ["request_number"]),
             ("idx_trim_art", ["article_code"]),
+            ("idx_trim_req_art_qty", ["request_number", "article_code", "processed_quantity", "defect_quantity"]),
         ],
         "fks": [],
     },
@@ -350,9 +353,9 @@ TABLES: Dict[str, Dict[str, Any]] = {
         ],
         "unique": [],
         "indexes": [
-            ("idx_cut_req", ["request_number"]),
             ("idx_cut_art", ["article_code"]),
             ("idx_cut_cast", ["casting_id"]),
+            ("idx_cut_req_art_qty", ["request_number", "article_code", "processed_quantity", "defect_quantity"]),
         ],
         "fks": [
             ("fk_cut_cast", "casting_id", "casting", "id", "SET NULL", "CASCADE"),
@@ -375,9 +378,9 @@ TABLES: Dict[str, Dict[str, Any]] = {
         ],
         "unique": [],
         "indexes": [
-            ("idx_clean_req", ["request_number"]),
             ("idx_clean_art", ["article_code"]),
             ("idx_clean_cut", ["cutting_id"]),
+            ("idx_clean_req_art_qty", ["request_number", "article_code", "processed_quantity", "defect_quantity"]),
         ],
         "fks": [
             ("fk_clean_cut", "cutting_id", "cutting", "id", "SET NULL", "CASCADE"),
@@ -403,12 +406,12 @@ TABLES: Dict[str, Dict[str, Any]] = {
         ],
         "unique": [],
         "indexes": [
-            ("idx_fq_req", ["request_number"]),
             ("idx_fq_art", ["article_code"]),
             ("idx_fq_dry", ["drying_id"]),
             ("idx_fq_trim", ["trimming_id"]),
             ("idx_fq_cut", ["cutting_id"]),
             ("idx_fq_clean", ["cleaning_id"]),
+            ("idx_fq_req_art_qty", ["request_number", "article_code", "checked_quantity", "accepted_quantity"]),
         ],
         "fks": [
             ("fk_fq_dry",   "drying_id",   "drying",  "id", "SET NULL", "CASCADE"),
@@ -451,14 +454,73 @@ TABLES: Dict[str, Dict[str, Any]] = {
             ("`id` INT NOT NULL AUTO_INCREMENT",                              "Первинний ключ", None),
             ("`message` VARCHAR(255) NOT NULL",                               "Текст сповіщення", "id"),
             ("`is_read` TINYINT(1) NOT NULL DEFAULT 0",                       "Позначка «прочитано»", "message"),
-            ("`created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",     "Створено", "is_read"),
+            ("`level` VARCHAR(16) NOT NULL DEFAULT 'info'",                   "Рівень: info|success|warning|error", "is_read"),
+            ("`src` VARCHAR(32) NOT NULL DEFAULT 'app'",                      "Джерело: app|system|banner|final_quality|…", "level"),
+            ("`created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",     "Створено", "src"),
             ("PRIMARY KEY (`id`)", "", None),
         ],
         "unique": [],
+        "indexes": [
+            # unread_of_source: WHERE src=? AND id > <останній прочитаний> ORDER BY id
+            ("idx_notifications_src_id", ["src", "id"]),
+            # ретеншн: вибірка старих записів пачками (utils/notification_retention)
+            ("idx_notifications_created", ["created_at"]),
+        ],
+        "fks": [],
+    },
+
+    "notifications_archive": {
+        "comment": "Архів сповіщень, старших за термін зберігання (id збережено з notifications)",
+        "columns": [
+            ("`id` INT NOT NULL",                                             "Первинний ключ (id з notifications)", None),
+            ("`message` VARCHAR(255) NOT NULL",                               "Текст сповіщення", "id"),
+            ("`level` VARCHAR(16) NOT NULL DEFAULT 'info'",                   "Рівень: info|success|warning|error", "message"),
+            ("`src` VARCHAR(32) NOT NULL DEFAULT 'app'",                      "Джерело", "level"),
+            ("`created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",     "Створено", "src"),
+            ("`archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",    "Перенесено в архів", "created_at"),
+            ("PRIMARY KEY (`id`)", "", None),
+        ],
+        "unique": [],
+        "indexes": [
+            ("idx_notif_arch_created", ["created_at"]),
+        ],
+        "fks": [],
+    },
+
+    "notification_read_marks": {
+        "comment": "Межа прочитаного по користувачу: усі сповіщення з id ≤ last_id прочитані",
+        "columns": [
+            ("`user_key` VARCHAR(191) NOT NULL",                              "Користувач", None),
+            ("`last_id` INT NOT NULL DEFAULT 0",                              "Останній id, до якого все прочитано", "user_key"),
+            ("`updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP", "Оновлено", "last_id"),
+            ("PRIMARY KEY (`user_key`)", "", None),
+        ],
+        "unique": [],
         "indexes": [],
         "fks": [],
     },
 
+    "change_log": {
+        "comment": "Стрічка змін (outbox): пишеться в тій самій транзакції, що й запис стадії/складу; читають усі робочі місця",
+        "columns": [
+            ("`id` BIGINT NOT NULL AUTO_INCREMENT",                           "Первинний ключ (позиція у стрічці)", None),
+            ("`table_name` VARCHAR(64) NOT NULL",                             "Змінена таблиця", "id"),
+            ("`op` VARCHAR(10) NOT NULL",                                     "insert|update|delete|move", "table_name"),
+            ("`request_number` VARCHAR(30) NULL",                             "Номер заявки (якщо відомий)", "op"),
+            ("`article_code` VARCHAR(64) NULL",                               "Артикул (якщо відомий)", "request_number"),
+            ("`row_id` BIGINT NULL",                                          "id зміненого рядка (якщо відомий)", "article_code"),
+            ("`origin` VARCHAR(64) NOT NULL",                                 "Процес, що зробив запис (хост:pid)", "row_id"),
+            ("`created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",     "Створено", "origin"),
+            ("PRIMARY KEY (`id`)", "", None),
+        ],
+        "unique": [],
+        "indexes": [
+            # очищення старих записів (database/change_log.purge)
+            ("idx_change_log_created", ["created_at"]),
+        ],
+        "fks": [],
+    },
+
     # === Лиття без заявки ===
     "casting_no_request": {
         "comment": "Етап «Лиття без заявки»: журнальні записи по виробленим партіям без прив'язки до заявки",
@@ -1133,7 +1195,7 @@ def migrate_weight_g_column(cur):
         if not info:
             continue
         # DATA_TYPE may be 'int' and COLUMN_TYPE may be 'int' or 'int(11)' etc
-        dt = (info.get("DATA_TYPE") or "").lower()
+        dt = (info.get("DATA_TYPE") or info.get("COLUMN_TYPE") or "").lower()
         if dt and dt.startswith("int"):
             # Change column type preserving the NULLability and comment
             cur.execute(
@@ -1180,6 +1242,15 @@ def ensure_notifications_compat(cur):
             "ON `notifications`(`is_read`, `created_at`)"
         )
 
+def migrate_notifications_src_level(cur):
+    """Старі БД могли мати `source` замість `src` — переносимо значення у нову колонку."""
+    cols = table_columns(cur, "notifications")
+    if "source" in cols and "src" in cols:
+        cur.execute(
+            "UPDATE `notifications` SET `src` = `source` "
+            "WHERE `source` IS NOT NULL AND `source` <> '' AND `src` = 'app'"
+        )
+
 def migrate_final_quality_warehouse_link(cur):
     if not column_info(cur, "final_quality", "warehouse_in_id"):
         add_column(
@@ -1189,10 +1260,12 @@ def migrate_final_quality_warehouse_link(cur):
             after="cleaning_id",
         )
     ensure_index(cur, "final_quality", "idx_fq_whin", ["warehouse_in_id"])
-    try:
-        ensure_fk(cur, "final_quality", "fk_fq_whin", "warehouse_in_id", "warehouse_moves", "id", "SET NULL", "CASCADE")
-    except Exception:
-        pass
+    # посилання на вже видалені рухи складу інакше не дадуть створити FK
+    cur.execute(
+        "UPDATE `final_quality` fq LEFT JOIN `warehouse_moves` wm ON wm.id = fq.warehouse_in_id "
+        "SET fq.warehouse_in_id = NULL WHERE fq.warehouse_in_id IS NOT NULL AND wm.id IS NULL"
+    )
+    ensure_fk(cur, "final_quality", "fk_fq_whin", "warehouse_in_id", "warehouse_moves", "id", "SET NULL", "CASCADE")
 
 def migrate_wh_operator_column(cur):
     cols = table_columns(cur, "warehouse_moves") if table_exists(cur, "warehouse_moves") else set()
@@ -1253,12 +1326,121 @@ def migrate_casting_requests_closed(cur):
     The column is a tinyint(1) with default 0, indicating whether the request is closed.
     It is added after the `reason` column.
     """
+    if not column_info(cur, "casting_requests", "is_closed"):
+        # Insert the new column after `reason`
+        add_column(cur, "casting_requests", "`is_closed` TINYINT(1) NOT NULL DEFAULT 0", after="reason")
+
+# --- DDL, яку раніше виконували сторінки при імпорті (drying.ensure_cols) ---
+def migrate_drying_no_request_timing(cur):
+    """
+    Сушка без заявки працює з тими ж полями, що й drying: посилання на партію
+    лиття без заявки та таймінг старту/завершення.
+    """
+    for ddl, cmt, after in (
+        ("`casting_id` INT NULL", "Посилання на партію лиття без заявки (casting_no_request.id)", "operator_name"),
+        ("`start_time` DATETIME NULL", "Час старту сушіння", "casting_id"),
+        ("`end_time`   DATETIME NULL", "Час завершення сушіння", "start_time"),
+    ):
+        col = ddl.split()[0].strip("`")
+        if not column_info(cur, "drying_no_request", col):
+            add_column(cur, "drying_no_request", f"{ddl} COMMENT '{esc(cmt)}'", after=after)
+
+# --- (request_number) перекривається лівим префіксом (request_number, article_code, …) ---
+REDUNDANT_REQ_INDEXES = [
+    ("casting",         "idx_casting_req"),
+    ("drying",          "idx_drying_req"),
+    ("casting_quality", "idx_cq_req"),
+    ("trimming",        "idx_trim_req"),
+    ("cutting",         "idx_cut_req"),
+    ("cleaning",        "idx_clean_req"),
+    ("final_quality",   "idx_fq_req"),
+]
+
+def migrate_drop_redundant_req_indexes(cur):
+    """Зайві одноколонкові індекси лише сповільнюють запис журналів стадій."""
+    for table, idx in REDUNDANT_REQ_INDEXES:
+        if index_exists(cur, table, idx):
+            cur.execute(f"ALTER TABLE {qid(table)} DROP INDEX {qid(idx)}")
+
+# ───────────────────────── реєстр версійних міграцій ─────────────────────────
+# Кожна міграція виконується РІВНО ОДИН раз на БД: після успіху її версія
+# записується в schema_migrations, і наступні запуски її пропускають.
+# Міграції помилок не ковтають: невдала не записується, наступні за нею
+# не виконуються, і при наступному запуску вона пробується знову.
+# Невдала міграція не вимикає застосунок: вона потрапляє у FAILED_MIGRATIONS,
+# лог (level=error) і системне сповіщення, а робота йде на вже застосованій
+# схемі. Лише міграції з REQUIRED_MIGRATIONS зупиняють ensure_schema().
+# Нові міграції — лише в кінець списку, з наступним номером версії.
+
+MIGRATIONS: List[Tuple[str, str, Callable]] = [
+    ("0001", "product_base: drying/trimming/... → *_needed",           migrate_product_base_flags),
+    ("0002", "casting_requests.article_code",                          migrate_missing_article_code_in_casting_requests),
+    ("0003", "final_quality: *_id посилання на стадії + індекси",       migrate_final_quality_ids),
+    ("0004", "final_quality.warehouse_in_id",                          migrate_final_quality_warehouse_link),
+    ("0005", "weight_g → DECIMAL(10,3), FK final_quality",             migrate_weight_g_column),
+    ("0006", "notifications: message/msg сумісність",                  ensure_notifications_compat),
+    ("0007", "warehouse_moves.worker_name → operator_name",            migrate_wh_operator_column),
+    ("0008", "casting_requests: UNIQUE (request_number, article_code)", migrate_casting_requests_unique),
+    ("0009", "casting_requests.is_closed",                             migrate_casting_requests_closed),
+    ("0010", "drying_no_request: casting_id/start_time/end_time",      migrate_drying_no_request_timing),
+    ("0011", "notifications: source → src",                            migrate_notifications_src_level),
+    ("0012", "стадії: прибрати idx_*_req (є *_req_art_qty)",            migrate_drop_redundant_req_indexes),
+]
+
+# версії, без яких робочі екрани не працюють: їхня помилка піднімається з ensure_schema()
+REQUIRED_MIGRATIONS: set[str] = set()
+
+# (версія, опис, помилка) невдалих міграцій цього запуску
+FAILED_MIGRATIONS: List[Tuple[str, str, str]] = []
+
+def ensure_migrations_table(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS `schema_migrations` (
+            `version`     VARCHAR(32)  NOT NULL COMMENT 'Версія міграції',
+            `description` VARCHAR(255) NULL     COMMENT 'Опис',
+            `applied_at`  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Застосовано',
+            PRIMARY KEY (`version`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Журнал застосованих міграцій схеми'
+        """
+    )
+
+def applied_migrations(cur) -> set[str]:
+    cur.execute("SELECT version FROM `schema_migrations`")
+    return {r["version"] for r in cur.fetchall()}
+
+def _notify_failed_migration(version: str, description: str):
+    """Системне сповіщення (одне на версію), щоб збій було видно не лише в лозі."""
     try:
-        if not column_info(cur, "casting_requests", "is_closed"):
-            # Insert the new column after `reason`
-            add_column(cur, "casting_requests", "`is_closed` TINYINT(1) NOT NULL DEFAULT 0", after="reason")
+        from utils.notifications import push_once
+        push_once(f"Міграція схеми {version} ({description}) не застосована — див. лог bootstrap",
+                  level="error", src="system")
     except Exception as e:
-        log(f"Failed to add is_closed column: {e}", tag="bootstrap")
+        log(f"Migration {version}: notification failed: {e}", tag="bootstrap", level="warning")
+
+def run_migrations(cur) -> List[str]:
+    """Застосувати нові міграції. Повертає версії, що впали (без REQUIRED_MIGRATIONS)."""
+    ensure_migrations_table(cur)
+    done = applied_migrations(cur)
+    for version, description, fn in MIGRATIONS:
+        if version in done:
+            continue
+        log(f"Applying migration {version}: {description}", tag="bootstrap")
+        try:
+            fn(cur)
+        except Exception as e:
+            log(f"Migration {version} failed, not recorded: {e}", tag="bootstrap", level="error")
+            if version in REQUIRED_MIGRATIONS:
+                raise
+            FAILED_MIGRATIONS.append((version, description, str(e)))
+            _notify_failed_migration(version, description)
+            # наступні можуть залежати від цієї — чекають наступного запуску
+            return [version]
+        cur.execute(
+            "INSERT INTO `schema_migrations` (version, description) VALUES (%s, %s)",
+            (version, description),
+        )
+    return []
 
 # ───────────────────────────── entry point ─────────────────────────────
 
@@ -1276,19 +1458,8 @@ def ensure_schema():
         for tname, spec in TABLES.items():
             ensure_columns_and_comments(cur, tname, spec)
 
-        # міграції/узгодження
-        migrate_product_base_flags(cur)
-        migrate_missing_article_code_in_casting_requests(cur)
-        migrate_final_quality_ids(cur)
-        migrate_final_quality_warehouse_link(cur)
-        # Ensure weight columns use DECIMAL instead of INT
-        migrate_weight_g_column(cur)
-        ensure_notifications_compat(cur)
-        migrate_wh_operator_column(cur)
-        migrate_casting_requests_unique(cur)
-
-        # ensure casting_requests has is_closed flag
-        migrate_casting_requests_closed(cur)
+        # версійні міграції (кожна — один раз на БД)
+        run_migrations(cur)
 
         log("Schema bootstrap finished", tag="bootstrap")
 
@@ -0,0 +1,257 @@
+# database/change_log.py
+"""
+Стрічка змін між процесами (outbox у таблиці change_log).
+
+Робочі місця — окремі процеси лаунчера над однією MySQL, тож події
+database/changes до інших ПК не доходять. Тому кожен запис стадії / складу
+/ сповіщень додає рядки в change_log У ТІЙ САМІЙ транзакції:
+
+    with db_manager.write_tx() as (cn, cu, pending):
+        cu.execute(sql, params)
+        pending += change_log.record(cn, sql, params, last_id=cu.lastrowid)
+    # після COMMIT write_tx публікує pending у своєму процесі — одразу
+
+(звичайні записи — db_manager.db_exec / db_exec_many / db_write.)
+
+Один фоновий потік на процес (start_background) читає стрічку від
+останнього побаченого id (seek по первинному ключу, без сканування) і
+публікує чужі зміни в database/changes — кеші та відкриті екрани всіх
+сесій оновлюються без власних періодичних опитувань. Поки змін немає,
+пауза між читаннями подвоюється від CHANGE_FEED_MIN_SEC до CHANGE_FEED_MAX_SEC;
+перша ж зміна повертає її до мінімуму.
+
+    CHANGE_LOG=0                   # не писати і не читати стрічку
+    CHANGE_FEED_MIN_SEC=0.5
+    CHANGE_FEED_MAX_SEC=5
+    CHANGE_LOG_KEEP_H=24           # скільки годин тримати записи
+
+AUTO_INCREMENT видається до COMMIT, тож рядок довгої транзакції може
+з'явитися пізніше за рядки з більшими id. Перед «діркою» стрічка чекає
+CHANGE_FEED_GAP_WAIT_SEC, а пропущені id ще CHANGE_FEED_GAP_RESCAN_SEC
+перечитує окремо; транзакція, довша за обидва вікна, до інших ПК дійде
+лише після TTL їхніх кешів (database/result_cache).
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+
+from database import changes
+from database.changes import Change
+from database import db_manager    # db_manager.db_exec сам пише в стрічку — без циклу імпорту
+from utils.logger import log
+
+ENABLED = os.getenv("CHANGE_LOG", "1").lower() in ("1", "true", "yes")
+MIN_SEC = float(os.getenv("CHANGE_FEED_MIN_SEC", "0.5"))
+MAX_SEC = max(MIN_SEC, float(os.getenv("CHANGE_FEED_MAX_SEC", "5")))
+KEEP_H = float(os.getenv("CHANGE_LOG_KEEP_H", "24"))
+BATCH = 500
+# AUTO_INCREMENT видається до COMMIT: рядок з меншим id може з'явитися пізніше.
+# Перед «діркою» в id чекаємо стільки секунд (відкат транзакції лишає дірку назавжди)
+GAP_WAIT_SEC = float(os.getenv("CHANGE_FEED_GAP_WAIT_SEC", "3"))
+# ...а пропущені після цього id ще стільки секунд перечитуємо (пізні COMMIT)
+GAP_RESCAN_SEC = float(os.getenv("CHANGE_FEED_GAP_RESCAN_SEC", "60"))
+PURGE_EVERY_SEC = 3600
+
+# хто записав: свої зміни вже опубліковані локально, зі стрічки їх пропускаємо
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+_COLS = "(table_name, op, request_number, article_code, row_id, origin)"
+
+
+# ───────────────────────── запис ─────────────────────────
+def record_changes(cn, pending: list[Change]) -> list[Change]:
+    """Додати зміни в change_log на з'єднанні cn (у його поточній транзакції)."""
+    if not ENABLED or not pending:
+        return pending
+    # таблиця стрічки сама в стрічку не пишеться
+    rows = [c for c in pending if c.table != "change_log"]
+    if not rows:
+        return pending
+    try:
+        cu = cn.cursor()
+        cu.execute(
+            f"INSERT INTO change_log {_COLS} VALUES " + ",".join(["(%s,%s,%s,%s,%s,%s)"] * len(rows)),
+            [v for c in rows for v in (c.table, c.op, c.request_number, c.article_code, c.id, ORIGIN)],
+        )
+        cu.close()
+    except Exception as e:
+        # без стрічки інші ПК дізнаються про зміну лише з TTL кешу — сам запис не зриваємо
+        log(f"change_log write failed: {e}", tag="changes", level="warning")
+    return pending
+
+
+def record(cn, sql: str, params=None, *, last_id: int | None = None, many: bool = False) -> list[Change]:
+    """Розібрати виконаний запис і додати його зміни в change_log. Повертає ці зміни."""
+    return record_changes(cn, changes.parse_sql(sql, params, last_id=last_id, many=many))
+
+
+def record_rows(cn, table: str, op: str, cols: list[str], seq, ids: list[int] | None = None) -> list[Change]:
+    return record_changes(cn, changes.row_changes(table, op, cols, seq, ids))
+
+
+# ───────────────────────── читання ─────────────────────────
+class ChangeFeed:
+    """Хвіст change_log: seek по id, пауза з подвоєнням, поки змін немає."""
+
+    def __init__(self, min_sec: float = MIN_SEC, max_sec: float = MAX_SEC):
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        self.last_id: int | None = None
+        self.polls = 0
+        self.delivered = 0
+        self._stop = threading.Event()
+        self._last_purge = 0.0
+        self._gaps: dict[int, float] = {}     # перший відсутній id → коли помітили
+        self._late: dict[int, float] = {}     # пропущений id → до коли перечитувати
+        self.waiting_gap = False
+
+    def _start_position(self) -> int:
+        rows = db_manager.db_fetch("SELECT COALESCE(MAX(id), 0) AS m FROM change_log")
+        return int(rows[0]["m"]) if rows else 0
+
+    def poll(self) -> int:
+        """Один прохід: опублікувати нові чужі зміни. Повертає к-сть прочитаних рядків."""
+        if self.last_id is None:
+            self.last_id = self._start_position()
+            return 0
+        rows = db_manager.db_fetch(
+            """
+            SELECT id, table_name, op, request_number, article_code, row_id, origin
+              FROM change_log
+             WHERE id > %s
+             ORDER BY id
+             LIMIT %s
+            """,
+            (self.last_id, BATCH),
+        )
+        self.polls += 1
+        rows = self._contiguous(rows)
+        if rows:
+            self.last_id = int(rows[-1]["id"])
+        late = self._rescan()
+        self._publish(late + rows)
+        return len(rows) + len(late)
+
+    def _publish(self, rows: list[dict]):
+        foreign = [
+            Change(r["table_name"], r["op"], r["request_number"], r["article_code"],
+                   int(r["row_id"]) if r["row_id"] is not None else None)
+            for r in rows if r["origin"] != ORIGIN
+        ]
+        if foreign:
+            changes.publish(foreign)
+            self.delivered += len(foreign)
+
+    def _rescan(self) -> list[dict]:
+        """Пропущені id, що таки з'явилися (закомічені пізніше за GAP_WAIT_SEC)."""
+        if not self._late:
+            return []
+        now = time.monotonic()
+        self._late = {i: until for i, until in self._late.items() if until > now}
+        if not self._late:
+            return []
+        ids = sorted(self._late)
+        rows = db_manager.db_fetch(
+            "SELECT id, table_name, op, request_number, article_code, row_id, origin "
+            "FROM change_log WHERE id IN (" + ",".join(["%s"] * len(ids)) + ")",
+            tuple(ids),
+        )
+        for r in rows:
+            self._late.pop(int(r["id"]), None)
+        return rows
+
+    def _contiguous(self, rows: list[dict]) -> list[dict]:
+        """Рядки до першої «свіжої» дірки в id — решту перечитаємо наступного разу."""
+        now = time.monotonic()
+        expected = self.last_id + 1
+        out: list[dict] = []
+        self.waiting_gap = False
+        for r in rows:
+            rid = int(r["id"])
+            if rid != expected:
+                first = self._gaps.setdefault(expected, now)
+                if now - first < GAP_WAIT_SEC:
+                    self.waiting_gap = True
+                    break
+                self._gaps.pop(expected, None)
+                # дірку більше не чекаємо, але її id ще перечитуємо (_rescan);
+                # величезні стрибки AUTO_INCREMENT — лише перші BATCH id
+                until = now + GAP_RESCAN_SEC
+                for i in range(expected, min(rid, expected + BATCH)):
+                    self._late.setdefault(i, until)
+            out.append(r)
+            expected = rid + 1
+        return out
+
+    def run(self):
+        delay = self.min_sec
+        while not self._stop.is_set():
+            try:
+                n = self.poll()
+                # повна пачка — одразу далі; є зміни (або чекаємо дірку) — мінімальна пауза; тиша — подвоюємо
+                if n >= BATCH:
+                    delay = 0
+                elif n or self.waiting_gap:
+                    delay = self.min_sec
+                else:
+                    delay = min(delay * 2 or self.min_sec, self.max_sec)
+                if time.monotonic() - self._last_purge > PURGE_EVERY_SEC:
+                    self._last_purge = time.monotonic()
+                    purge()
+            except Exception as e:
+                log(f"change feed failed: {e}", tag="changes", level="warning")
+                delay = self.max_sec
+            self._stop.wait(delay)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"last_id": self.last_id, "polls": self.polls, "delivered": self.delivered}
+
+
+def purge(keep_h: float = KEEP_H, batch: int = 5000) -> int:
+    """Видалити записи стрічки, старші за keep_h годин (пачками). Повертає к-сть."""
+    total = 0
+    while True:
+        cn = db_manager.connect_db()
+        try:
+            cu = cn.cursor()
+            cu.execute(
+                "DELETE FROM change_log WHERE created_at < NOW() - INTERVAL %s HOUR LIMIT %s",
+                (keep_h, int(batch)),
+            )
+            n = cu.rowcount or 0
+            cn.commit()
+        finally:
+            cn.close()
+        total += n
+        if n < batch:
+            break
+    if total:
+        log(f"change_log: purged {total} rows older than {keep_h} h", tag="changes")
+    return total
+
+
+_feed: ChangeFeed | None = None
+_worker: threading.Thread | None = None
+
+
+def start_background() -> ChangeFeed | None:
+    """Запустити читання стрічки (один потік на процес)."""
+    global _feed, _worker
+    if not ENABLED:
+        return None
+    if _worker is not None and _worker.is_alive():
+        return _feed
+    _feed = ChangeFeed()
+    _worker = threading.Thread(target=_feed.run, name="change-feed", daemon=True)
+    _worker.start()
+    return _feed
+
+
+def feed() -> ChangeFeed | None:
+    return _feed
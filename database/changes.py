@@ -0,0 +1,389 @@
+# database/changes.py
+"""
+Внутрішньопроцесна шина змін даних.
+
+Кожен запис через спільний writer database/db_manager (write_tx: db_exec,
+db_exec_many, db_write, db_insert_batches) публікує Change — яка таблиця, що зроблено
+і, якщо це видно з параметрів, заявка / артикул / id рядка:
+
+    Change(table="casting", op="insert", request_number="1042", article_code="A-17", id=9031)
+
+Підписники:
+
+* кеші (database/result_cache) — синхронно, одразу після запису;
+* database/change_log — ті самі зміни з інших процесів (робочих місць),
+  прочитані зі стрічки change_log;
+* відкриті екрани — через watch(): зміни збираються у вікні DEBOUNCE_SEC
+  і віддаються одним списком у фоновому потоці, щоб екран перечитав
+  лише зачеплену заявку / артикул.
+
+    changes.watch(page, "monitoring.active", on_changes,
+                  tables=("casting", "final_quality"), request_number=None)
+
+Екран, що сам коригує свій кеш після запису, робить запис у written_by(page)
+і підписується з skip_own=True — свої зміни йому не повертаються:
+
+    with changes.written_by(page):
+        db_exec(...)
+
+Якщо заявку з параметрів запиту визначити не вдалося (UPDATE ... WHERE id=%s),
+request_number=None — такий запис підходить під будь-який фільтр заявки.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, NamedTuple
+
+from utils.logger import log
+
+DEBOUNCE_SEC = 0.3
+
+
+class Change(NamedTuple):
+    table: str
+    op: str                          # insert / update / delete / move
+    request_number: str | None = None
+    article_code: str | None = None
+    id: int | None = None
+
+
+# ───────────────────────── розбір запиту ─────────────────────────
+_RE_WRITE = re.compile(
+    r"^\s*(INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?", re.I
+)
+_RE_INSERT_COLS = re.compile(r"^\s*\w+(?:\s+IGNORE)?\s+INTO\s+`?\w+`?\s*\(([^)]*)\)\s*VALUES\s*(.*)$", re.I | re.S)
+_RE_ASSIGN = re.compile(r"`?(\w+)`?\s*=\s*%s")
+_RE_WHERE = re.compile(r"\bWHERE\b", re.I)
+_RE_OR = re.compile(r"\bOR\b", re.I)
+_KEYS = ("request_number", "article_code")
+
+
+def _norm(v) -> str | None:
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+def _top_level(sql: str) -> str:
+    """Той самий рядок, але вміст дужок і лапок замінено пробілами (позиції зберігаються)."""
+    out, depth, quote = [], 0, ""
+    for ch in sql:
+        if quote:
+            out.append(" ")
+            if ch == quote:
+                quote = ""
+            continue
+        if ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        out.append(ch if depth == 0 or (ch == "(" and depth == 1) else " ")
+    return "".join(out)
+
+
+def _value_rows(values: str) -> list[list[str]]:
+    """"(%s, 'x', NOW()), (%s, ...)" → [["%s", "'x'", "NOW()"], ...] (дужки й лапки враховуються)."""
+    rows: list[list[str]] = []
+    depth, quote, item, cur = 0, "", [], []
+    for ch in values:
+        if depth == 0 and not quote and ch not in "(, \t\r\n":
+            break  # хвіст після рядків (ON DUPLICATE KEY UPDATE ...)
+        if quote:
+            item.append(ch)
+            if ch == quote:
+                quote = ""
+            continue
+        if ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+            if depth == 1:
+                item, cur = [], []
+                continue
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                cur.append("".join(item).strip())
+                rows.append(cur)
+                continue
+        elif ch == "," and depth == 1:
+            cur.append("".join(item).strip())
+            item = []
+            continue
+        if depth >= 1:
+            item.append(ch)
+    return rows
+
+
+def _change(table: str, op: str, fields: dict, row_id: int | None = None) -> Change:
+    rid = fields.get("id", row_id)
+    return Change(
+        table, op,
+        _norm(fields.get("request_number")),
+        _norm(fields.get("article_code")),
+        int(rid) if isinstance(rid, int) or (isinstance(rid, str) and rid.isdigit()) else None,
+    )
+
+
+def parse_write(sql: str, params=None, last_id: int | None = None) -> list[Change]:
+    """
+    Зміни, які робить один INSERT / UPDATE / DELETE з такими параметрами.
+    Для SELECT та інших запитів — порожній список.
+
+    Параметри зіставляються з колонками за позицією кожного %s у всьому запиті;
+    %s усередині виразів і підзапитів лише зсувають позицію. Якщо розбір
+    неоднозначний — Change(table, op) без заявки/артикула (інвалідація таблиці).
+    """
+    m = _RE_WRITE.match(sql)
+    if not m:
+        return []
+    verb, table = m.group(1).split()[0].lower(), m.group(2).lower()
+    op = {"replace": "insert"}.get(verb, verb)
+    params = tuple(params or ())
+
+    if op == "insert":
+        mi = _RE_INSERT_COLS.match(sql)
+        cols = [c.strip(" `\n\r\t") for c in mi.group(1).split(",")] if mi else []
+        rows = _value_rows(mi.group(2)) if mi else []
+        if cols and rows and all(len(r) == len(cols) for r in rows) and sql.count("%s") == len(params):
+            out = []
+            pos = sql.count("%s") - mi.group(2).count("%s")     # %s до VALUES
+            for items in rows:
+                fields = {}
+                for c, v in zip(cols, items):
+                    # колонка отримує параметр лише за простого %s; %s у виразах
+                    # і підзапитах ((SELECT ... WHERE x=%s)) лише зсувають позицію
+                    if v == "%s":
+                        fields[c] = params[pos]
+                    pos += v.count("%s")
+                # lastrowid — id лише першого рядка; решта не обов'язково підряд
+                out.append(_change(table, op, fields, last_id if last_id and len(rows) == 1 else None))
+            return out
+        return [Change(table, op, id=last_id or None)]
+
+    if sql.count("%s") != len(params):
+        return [Change(table, op)]
+    # лише `col = %s` поза дужками: SET x = IF(y=%s, ...), WHERE id IN (SELECT ... %s)
+    # не приписують значення колонці, але своє місце серед параметрів займають
+    top = _top_level(sql)
+    index = {m.start(): i for i, m in enumerate(re.finditer("%s", sql))}
+    mw = _RE_WHERE.search(top)
+    where_at = mw.start() if mw else len(sql)
+    set_fields, where_fields = {}, {}
+    for m in _RE_ASSIGN.finditer(top):
+        i = index.get(m.end() - 2)
+        if i is not None:
+            (set_fields if m.start() < where_at else where_fields)[m.group(1)] = params[i]
+    if _RE_OR.search(top, where_at):
+        where_fields = {}       # WHERE a=%s OR b=%s — жодна пара не гарантована
+    if not set_fields and not where_fields:
+        return [Change(table, op)]
+    if op != "update":
+        return [_change(table, op, where_fields or set_fields)]
+    new = _change(table, op, {**where_fields, **set_fields})
+    # рядок міг перейти в іншу заявку / артикул: стара пара — з WHERE,
+    # а якщо WHERE її не задає — невідома (None, підходить під будь-який фільтр)
+    old = _change(table, op, {**{k: v for k, v in set_fields.items() if k not in _KEYS}, **where_fields})
+    return [new] if old == new else [new, old]
+
+
+# ───────────────────────── підписки ─────────────────────────
+class Subscription:
+    __slots__ = ("fn", "tables", "request_number", "article_code")
+
+    def __init__(self, fn: Callable[[Change], None], tables: Iterable[str] | None,
+                 request_number: str | None, article_code: str | None):
+        self.fn = fn
+        self.tables = frozenset(t.lower() for t in tables) if tables else None
+        self.request_number = _norm(request_number)
+        self.article_code = _norm(article_code)
+
+    def matches(self, c: Change) -> bool:
+        if self.tables is not None and c.table not in self.tables:
+            return False
+        if self.request_number and c.request_number and c.request_number != self.request_number:
+            return False
+        if self.article_code and c.article_code and c.article_code != self.article_code:
+            return False
+        return True
+
+    def cancel(self):
+        unsubscribe(self)
+
+
+_lock = threading.Lock()
+_subs: tuple[Subscription, ...] = ()
+_published: Counter[str] = Counter()
+
+
+def subscribe(fn: Callable[[Change], None], *, tables: Iterable[str] | None = None,
+              request_number: str | None = None, article_code: str | None = None) -> Subscription:
+    """
+    fn(change) викликається у потоці, що зробив запис, — одразу після COMMIT.
+    Обробник має бути швидким (інвалідація, планування оновлення), без запитів до БД.
+    """
+    global _subs
+    sub = Subscription(fn, tables, request_number, article_code)
+    with _lock:
+        _subs = _subs + (sub,)
+    return sub
+
+
+def unsubscribe(sub: Subscription):
+    global _subs
+    with _lock:
+        _subs = tuple(s for s in _subs if s is not sub)
+
+
+def publish(changes: Iterable[Change]):
+    subs = _subs
+    for c in changes:
+        with _lock:
+            _published[c.table] += 1
+        for s in subs:
+            if s.matches(c):
+                try:
+                    s.fn(c)
+                except Exception as e:
+                    log(f"change subscriber failed on {c}: {e}", tag="changes")
+
+
+def parse_sql(sql: str, params=None, *, last_id: int | None = None, many: bool = False) -> list[Change]:
+    """parse_write() для execute або executemany (many=True — params це seq наборів)."""
+    if not many:
+        return parse_write(sql, params, last_id)
+    seq = list(params or ())
+    out: list[Change] = []
+    for i, p in enumerate(seq):
+        out += parse_write(sql, p, last_id if i == len(seq) - 1 else None)
+    return out
+
+
+def row_changes(table: str, op: str, cols: list[str], seq, ids: list[int] | None = None) -> list[Change]:
+    """Зміни багаторядкового запису, коли колонки, значення і (прочитані назад) id уже відомі."""
+    ids = list(ids or ())
+    return [
+        _change(table.lower(), op, dict(zip(cols, row)), ids[i] if i < len(ids) else None)
+        for i, row in enumerate(seq)
+    ]
+
+
+def publish_sql(sql: str, params=None, *, last_id: int | None = None, many: bool = False):
+    """Опублікувати зміни виконаного запису."""
+    publish(parse_sql(sql, params, last_id=last_id, many=many))
+
+
+def publish_rows(table: str, op: str, cols: list[str], seq, ids: list[int] | None = None):
+    publish(row_changes(table, op, cols, seq, ids))
+
+
+def stats() -> dict[str, int]:
+    """К-сть опублікованих змін за таблицями."""
+    with _lock:
+        return dict(_published)
+
+
+# ───────────────────────── екрани сесій ─────────────────────────
+# id сесії (page), чий запис зараз публікується — publish() іде в потоці запису
+_writer: ContextVar[int | None] = ContextVar("changes_writer", default=None)
+
+
+@contextmanager
+def written_by(page):
+    """Записи всередині блоку — від цієї сесії (для watch(..., skip_own=True))."""
+    token = _writer.set(id(page))
+    try:
+        yield
+    finally:
+        _writer.reset(token)
+
+
+class _Watcher:
+    """Збирає зміни у вікні DEBOUNCE_SEC і віддає їх fn(list[Change]) у таймер-потоці."""
+
+    def __init__(self, fn: Callable[[list[Change]], None], delay: float, skip_owner: int | None = None):
+        self.fn = fn
+        self.delay = delay
+        self.skip_owner = skip_owner
+        self.sub: Subscription | None = None
+        self._lock = threading.Lock()
+        self._batch: list[Change] = []
+        self._timer: threading.Timer | None = None
+        self._closed = False
+
+    def push(self, c: Change):
+        if self.skip_owner is not None and _writer.get() == self.skip_owner:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._batch.append(c)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._fire)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _fire(self):
+        with self._lock:
+            batch, self._batch, self._timer = self._batch, [], None
+            if self._closed or not batch:
+                return
+        try:
+            self.fn(batch)
+        except Exception as e:
+            log(f"change watcher failed: {e}", tag="changes")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if self.sub is not None:
+            unsubscribe(self.sub)
+
+
+_WATCHERS: dict[tuple[int, str], _Watcher] = {}
+_WATCHERS_LOCK = threading.Lock()
+
+
+def watch(page, key: str, fn: Callable[[list[Change]], None], *, tables: Iterable[str] | None = None,
+          request_number: str | None = None, article_code: str | None = None,
+          delay: float = DEBOUNCE_SEC, skip_own: bool = False):
+    """
+    Підписка екрану сесії. Повторний watch() з тим самим key замінює попередню
+    (екран відкрили вдруге), forget(page) знімає всі підписки сесії.
+    skip_own — не віддавати зміни, записані цією сесією у written_by(page).
+    """
+    w = _Watcher(fn, delay, id(page) if skip_own else None)
+    w.sub = subscribe(w.push, tables=tables, request_number=request_number, article_code=article_code)
+    with _WATCHERS_LOCK:
+        old = _WATCHERS.pop((id(page), key), None)
+        _WATCHERS[(id(page), key)] = w
+    if old is not None:
+        old.close()
+    return w
+
+
+def unwatch(page, key: str):
+    with _WATCHERS_LOCK:
+        w = _WATCHERS.pop((id(page), key), None)
+    if w is not None:
+        w.close()
+
+
+def forget(page):
+    """Зняти всі підписки сесії (на відключенні клієнта)."""
+    pid = id(page)
+    with _WATCHERS_LOCK:
+        keys = [k for k in _WATCHERS if k[0] == pid]
+        ws = [_WATCHERS.pop(k) for k in keys]
+    for w in ws:
+        w.close()
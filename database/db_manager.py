@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 
 # локальний логер (не обов’язково, але зручно відслідковувати помилки SQL)
 from utils.logger import log
+from database import change_log, changes, query_profiler
 
 load_dotenv()
 
@@ -19,10 +20,14 @@ DB_CONFIG: dict = dict(
     collation="utf8mb4_0900_ai_ci",
 )
 
+# Скільки одночасних з’єднань дозволяємо процесу (див. database/executor.py)
+DB_POOL_SIZE: int = max(1, int(os.getenv("DB_POOL_SIZE", "5")))
+
 # ──────────────────────────────────────────────────────────────
 def connect_db():
-    """Отримати «сире» з’єднання, якщо десь потрібно вручну."""
-    return mysql.connector.connect(**DB_CONFIG)
+    """Отримати «сире» з’єднання, якщо десь потрібно вручну.
+    При DB_PROFILE=1 курсори з'єднання пишуть статистику в query_profiler."""
+    return query_profiler.wrap_connection(mysql.connector.connect(**DB_CONFIG))
 
 @contextmanager
 def db():
@@ -37,6 +42,28 @@ def db():
     finally:
         conn.close()
 
+@contextmanager
+def named_lock(name: str):
+    """
+    with named_lock("notif_retention") as got: …
+    MySQL GET_LOCK(name, 0) на окремому з'єднанні: got=False, якщо лок уже тримає
+    інший процес (робоче місце). Лок живе, поки відкрите з'єднання.
+    """
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT GET_LOCK(%s, 0)", (name,))
+        got = (cur.fetchone() or (0,))[0] == 1
+        try:
+            yield got
+        finally:
+            if got:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (name,))
+                cur.fetchall()
+            cur.close()
+    finally:
+        conn.close()
+
 # ──────────────────────────────────────────────────────────────
 def db_fetch(sql: str, params: tuple | None = None) -> list[dict]:
     """
@@ -51,14 +78,78 @@ def db_fetch(sql: str, params: tuple | None = None) -> list[dict]:
         cur.close()
         return rows
 
-def db_exec(sql: str, params: tuple | None = None) -> int:
+# ──────────────────────────────────────────────────────────────
+# Усі записи (db_manager, сторінки, utils/notifications) ідуть через write_tx():
+# запис і рядки change_log — одна транзакція, а зміни публікуються
+# в database/changes лише після COMMIT.
+@contextmanager
+def write_tx(**tx):
     """
-    INSERT / UPDATE / DELETE.
-    Повертає lastrowid (0, якщо не INSERT).
+    with write_tx() as (conn, cur, pending):
+        cur.execute(sql, params)
+        pending += change_log.record(conn, sql, params, last_id=cur.lastrowid)
+    tx — параметри start_transaction (напр. consistent_snapshot=True).
     """
+    pending: list = []
     with db() as conn:
+        conn.start_transaction(**tx)
         cur = conn.cursor()
-        cur.execute(sql, params or ())
-        last_id = cur.lastrowid
+        yield conn, cur, pending
+        conn.commit()
         cur.close()
-        return last_id
+    changes.publish(pending)
+
+def db_write(sql: str, params=None, *, many: bool = False) -> tuple[int, int]:
+    """
+    Один запис (execute або executemany при many=True) з outbox.
+    Повертає (lastrowid, rowcount).
+    """
+    with write_tx() as (conn, cur, pending):
+        if many:
+            cur.executemany(sql, params or [])
+        else:
+            cur.execute(sql, params or ())
+        last_id, rowcount = cur.lastrowid, cur.rowcount
+        pending += change_log.record(conn, sql, params, last_id=last_id, many=many)
+    return last_id, rowcount
+
+def db_exec(sql: str, params: tuple | None = None) -> int:
+    """
+    INSERT / UPDATE / DELETE.
+    Повертає lastrowid (0, якщо не INSERT).
+    Разом із записом у тій самій транзакції пишеться change_log (database/change_log).
+    """
+    return db_write(sql, params)[0]
+
+def db_exec_many(sql: str, seq) -> int:
+    """executemany з тим самим outbox; повертає lastrowid останнього набору."""
+    if not seq:
+        return 0
+    return db_write(sql, seq, many=True)[0]
+
+def db_insert_batches(batches) -> list[list[int]]:
+    """
+    Багаторядкові INSERT у кілька таблиць однією транзакцією: [(table, cols, seq), ...].
+    Повертає id вставлених рядків для кожної пачки (у порядку seq).
+    """
+    batches = [(t, cols, seq) for t, cols, seq in batches if seq]
+    if not batches:
+        return []
+    out = []
+    # знімок — на початку транзакції: SELECT нижче бачить свої рядки,
+    # але не чужі, закомічені після нього (id не обов'язково йдуть підряд)
+    with write_tx(consistent_snapshot=True) as (conn, cur, pending):
+        for table, cols, seq in batches:
+            ph = "(" + ",".join(["%s"] * len(cols)) + ")"
+            cur.execute(
+                f"INSERT INTO {table} ({', '.join(cols)}) VALUES " + ",".join([ph] * len(seq)),
+                [v for row in seq for v in row],
+            )
+            cur.execute(
+                f"SELECT id FROM {table} WHERE id >= %s ORDER BY id LIMIT %s",
+                (cur.lastrowid, len(seq)),
+            )
+            ids = [r[0] for r in cur.fetchall()]
+            pending += change_log.record_rows(conn, table, "insert", cols, seq, ids)
+            out.append(ids)
+    return out
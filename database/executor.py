@@ -0,0 +1,134 @@
+# database/executor.py
+"""
+Фоновий виконавець SQL-запитів для Flet-сторінок.
+
+Обробники Flet не повинні чекати MySQL у своєму потоці: запит іде у пул потоків
+(розмір = DB_POOL_SIZE, тобто стільки ж, скільки з’єднань дозволено процесу),
+а результат застосовується до контролів одним page.update().
+
+Використання на сторінці:
+
+    slot = QuerySlot(page)
+
+    def on_change(e):
+        slot.run(
+            lambda: db_fetch("SELECT ... WHERE request_number=%s", (dd.value,)),
+            apply=lambda rows: fill_dropdown(rows),
+        )
+
+Якщо оператор знову змінює фільтр до завершення попереднього запиту,
+старий запит скасовується (або, якщо вже виконується, його результат відкидається).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from database.db_manager import DB_POOL_SIZE
+from utils.logger import log
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+# к-сть запитів QuerySlot, які ще не застосовано (для бенчмарків / wait_idle)
+_pending = 0
+_pending_cv = threading.Condition()
+
+
+def _track(delta: int):
+    global _pending
+    with _pending_cv:
+        _pending += delta
+        if _pending <= 0:
+            _pending = 0
+            _pending_cv.notify_all()
+
+
+def wait_idle(timeout: float | None = None) -> bool:
+    """Дочекатися, поки всі QuerySlot.run() виконаються і застосуються. False — таймаут."""
+    with _pending_cv:
+        return _pending_cv.wait_for(lambda: _pending == 0, timeout)
+
+
+def submit(fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """
+    Виконати fn(*args, **kwargs) у пулі БД-потоків.
+    Потік пулу отримує копію ContextVar-ів того, хто викликав (perf_overlay.action,
+    changes.written_by), — як asyncio.to_thread.
+    """
+    ctx = contextvars.copy_context()
+    return _EXECUTOR.submit(ctx.run, fn, *args, **kwargs)
+
+
+async def run_async(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Awaitable-обгортка для корутин (page.run_task): await run_async(db_fetch, sql, p)."""
+    return await asyncio.wrap_future(submit(fn, *args, **kwargs))
+
+
+class QuerySlot:
+    """
+    «Слот» для одного логічного запиту сторінки (список заявок, деталі, партії…).
+    Новий run() робить попередній неактуальним: його Future скасовується,
+    а якщо він уже виконується — результат просто не застосовується.
+    """
+
+    def __init__(self, page=None, *, name: str = "query"):
+        self.page = page
+        self.name = name
+        self._lock = threading.Lock()
+        self._gen = 0
+        self._future: Future | None = None
+
+    def cancel(self):
+        with self._lock:
+            self._gen += 1
+            if self._future is not None:
+                self._future.cancel()
+                self._future = None
+
+    def run(
+        self,
+        fetch: Callable[[], Any],
+        apply: Callable[[Any], None],
+        *,
+        on_error: Callable[[Exception], None] | None = None,
+    ) -> Future:
+        with self._lock:
+            self._gen += 1
+            gen = self._gen
+            if self._future is not None:
+                self._future.cancel()
+            fut = submit(fetch)
+            self._future = fut
+        _track(+1)
+
+        def _done(f: Future):
+            try:
+                _apply(f)
+            finally:
+                _track(-1)
+
+        def _apply(f: Future):
+            if f.cancelled():
+                return
+            with self._lock:
+                if gen != self._gen:
+                    return  # запит застарів — його замінив новіший
+                self._future = None
+            exc = f.exception()
+            if exc is not None:
+                log(f"{self.name}: {exc}", tag="db")
+                if on_error:
+                    on_error(exc)
+                return
+            try:
+                apply(f.result())
+                if self.page is not None:
+                    self.page.update()
+            except Exception as e:
+                log(f"{self.name} apply: {e}", tag="db")
+
+        fut.add_done_callback(_done)
+        return fut
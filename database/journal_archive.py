@@ -0,0 +1,357 @@
+# database/journal_archive.py
+"""
+Архів журналів стадій для закритих заявок.
+
+Коли заявка закрита (усі позиції casting_requests.is_closed = 1), її рядки
+у casting / drying / casting_quality / trimming / cutting / cleaning /
+final_quality більше не потрібні робочим запитам. archive_closed_requests()
+переносить їх у <table>_archive — таблиці з тими самими колонками,
+секціоновані помісячно за created_at (RANGE COLUMNS, p202501 …), невеликими
+транзакціями по BATCH_SIZE рядків.
+
+Робочі сторінки і моніторинг активних заявок читають лише «живі» таблиці.
+Архів читається тільки там, де явно просять історію: вкладка закритих заявок,
+деталі закритої заявки (is_request_closed), журнал заявок з include_archive:
+
+    src = journal_source("casting", include_archive=is_request_closed(req))
+    db_fetch(f"SELECT SUM(quantity) q FROM {src} WHERE request_number=%s", (req,))
+
+Для ручних запитів є представлення <table>_with_archive (UNION ALL).
+
+    python -m database.journal_archive            # один прохід архівації
+    start_background()                            # з лаунчера: раз на JOURNAL_ARCHIVE_INTERVAL_H год
+
+Фоновий прохід виконує лише процес, що взяв MySQL GET_LOCK('journal_archive').
+"""
+from __future__ import annotations
+
+import datetime as dt
+import os
+import sys
+import threading
+import time
+
+from database import change_log, changes
+from database.db_manager import connect_db, db_fetch, named_lock
+from utils.logger import log
+
+# порядок важливий: спершу «дочірні» таблиці, щоб FK (CASCADE / SET NULL)
+# на батьківських не зачепили ще не перенесені рядки
+JOURNAL_TABLES: list[str] = [
+    "final_quality",
+    "cleaning",
+    "cutting",
+    "trimming",
+    "casting_quality",
+    "drying",
+    "casting",
+]
+
+BATCH_SIZE = max(1, int(os.getenv("JOURNAL_ARCHIVE_BATCH", "500")))
+INTERVAL_H = float(os.getenv("JOURNAL_ARCHIVE_INTERVAL_H", "24"))
+
+
+def archive_name(table: str) -> str:
+    return f"{table}_archive"
+
+
+def _partition_name(d: dt.date) -> str:
+    return f"p{d.year:04d}{d.month:02d}"
+
+
+def _month_start(d: dt.date) -> dt.date:
+    return dt.date(d.year, d.month, 1)
+
+
+def _next_month(d: dt.date) -> dt.date:
+    return dt.date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+# ───────────────────────── схема архіву ─────────────────────────
+def _columns(cur, table: str) -> list[dict]:
+    cur.execute(
+        """
+        SELECT COLUMN_NAME AS name, COLUMN_TYPE AS type
+          FROM information_schema.columns
+         WHERE table_schema = DATABASE() AND table_name = %s
+         ORDER BY ORDINAL_POSITION
+        """,
+        (table,),
+    )
+    return cur.fetchall()
+
+
+def _table_exists(cur, table: str) -> bool:
+    cur.execute(
+        "SELECT 1 FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,),
+    )
+    return bool(cur.fetchall())
+
+
+def _partitions(cur, table: str) -> set[str]:
+    cur.execute(
+        """
+        SELECT PARTITION_NAME AS p
+          FROM information_schema.partitions
+         WHERE table_schema = DATABASE() AND table_name = %s AND PARTITION_NAME IS NOT NULL
+        """,
+        (table,),
+    )
+    return {r["p"] for r in cur.fetchall()}
+
+
+def ensure_archive_table(cur, table: str):
+    """
+    <table>_archive: ті самі колонки, без AUTO_INCREMENT/UNIQUE/FK,
+    PK (id, created_at) — ключ секціонування має входити в кожен унікальний ключ.
+    Нові колонки робочої таблиці додаються в архів як NULL.
+    """
+    arch = archive_name(table)
+    if not _table_exists(cur, arch):
+        cur.execute(f"CREATE TABLE `{arch}` LIKE `{table}`")
+        cur.execute(
+            """
+            SELECT DISTINCT INDEX_NAME AS n
+              FROM information_schema.statistics
+             WHERE table_schema = DATABASE() AND table_name = %s
+               AND NON_UNIQUE = 0 AND INDEX_NAME <> 'PRIMARY'
+            """,
+            (arch,),
+        )
+        for r in cur.fetchall():
+            cur.execute(f"ALTER TABLE `{arch}` DROP INDEX `{r['n']}`")
+        cur.execute(
+            f"ALTER TABLE `{arch}` "
+            "MODIFY `id` INT NOT NULL, "
+            "MODIFY `created_at` DATETIME NOT NULL, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `created_at`), "
+            "ADD COLUMN `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"
+        )
+        cur.execute(
+            f"ALTER TABLE `{arch}` PARTITION BY RANGE COLUMNS(`created_at`) ("
+            "PARTITION p_old VALUES LESS THAN ('2000-01-01'), "
+            "PARTITION p_max VALUES LESS THAN (MAXVALUE))"
+        )
+        log(f"Created archive table {arch}", tag="archive")
+
+    have = {c["name"] for c in _columns(cur, arch)}
+    for c in _columns(cur, table):
+        if c["name"] not in have:
+            cur.execute(f"ALTER TABLE `{arch}` ADD COLUMN `{c['name']}` {c['type']} NULL")
+    _ensure_union_view(cur, table)
+    _with_archive.add(table)
+
+
+def _ensure_union_view(cur, table: str):
+    cols = ", ".join(f"`{c['name']}`" for c in _columns(cur, table))
+    cur.execute(
+        f"CREATE OR REPLACE VIEW `{table}_with_archive` AS "
+        f"SELECT {cols} FROM `{table}` UNION ALL SELECT {cols} FROM `{archive_name(table)}`"
+    )
+
+
+def ensure_month_partitions(cur, table: str, first: dt.date, last: dt.date):
+    """
+    Розбити p_max так, щоб для кожного місяця [first, last] була своя секція.
+    Наявні секції ніколи не видаляються і не перебудовуються — лише p_max ділиться
+    на нові, новіші за верхню. Рядки старших місяців без власної секції лягають
+    у найближчу наявну секцію вище (RANGE), тобто не губляться.
+    """
+    arch = archive_name(table)
+    existing = _partitions(cur, arch)
+    month = _month_start(first)
+    missing = []
+    while month <= last:
+        if _partition_name(month) not in existing:
+            missing.append(month)
+        month = _next_month(month)
+    if not missing:
+        return
+    # REORGANIZE працює лише з верхньою секцією: місяці мають бути новішими за вже наявні
+    top = max((p for p in existing if p[1:].isdigit()), default=None)
+    older = [m for m in missing if top is not None and _partition_name(m) <= top]
+    if older:
+        log(f"{arch}: months {_partition_name(older[0])}…{_partition_name(older[-1])} go to "
+            f"existing partition(s) up to {top}", tag="archive")
+    missing = [m for m in missing if m not in older]
+    if not missing:
+        return
+    parts = ", ".join(
+        f"PARTITION {_partition_name(m)} VALUES LESS THAN ('{_next_month(m).isoformat()}')"
+        for m in missing
+    )
+    cur.execute(
+        f"ALTER TABLE `{arch}` REORGANIZE PARTITION p_max INTO "
+        f"({parts}, PARTITION p_max VALUES LESS THAN (MAXVALUE))"
+    )
+
+
+# ───────────────────────── перенесення ─────────────────────────
+def closed_requests(limit: int | None = None) -> list[str]:
+    """Заявки, у яких закриті всі позиції і ще лишилися рядки в робочому журналі лиття."""
+    sql = """
+        SELECT cr.request_number
+          FROM casting_requests cr
+         GROUP BY cr.request_number
+        HAVING MIN(cr.is_closed) = 1
+           AND EXISTS (SELECT 1 FROM casting c WHERE c.request_number = cr.request_number)
+         ORDER BY MAX(cr.id)
+    """
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return [r["request_number"] for r in db_fetch(sql)]
+
+
+def _move(cn, src: str, dst: str, request_number: str, batch: int, fill_ts: dt.datetime) -> int:
+    """
+    Перенести рядки заявки з src у dst пачками; кожна пачка — своя транзакція.
+    created_at у старих схемах (cutting, cleaning) буває NULL, а в архіві це ключ
+    секціонування (NOT NULL) — такі рядки отримують fill_ts.
+    """
+    cu = cn.cursor(dictionary=True)
+    dst_cols = {c["name"] for c in _columns(cu, dst)}
+    names = [c["name"] for c in _columns(cu, src) if c["name"] in dst_cols]
+    cols = ", ".join(f"`{n}`" for n in names)
+    select = ", ".join("COALESCE(`created_at`, %s)" if n == "created_at" else f"`{n}`" for n in names)
+    fill = (fill_ts,) if "created_at" in names else ()
+    moved = 0
+    while True:
+        cn.start_transaction()
+        cu.execute(
+            f"SELECT id FROM `{src}` WHERE request_number = %s ORDER BY id LIMIT %s FOR UPDATE",
+            (request_number, int(batch)),
+        )
+        ids = [r["id"] for r in cu.fetchall()]
+        if not ids:
+            cn.rollback()
+            break
+        ph = ",".join(["%s"] * len(ids))
+        cu.execute(f"INSERT INTO `{dst}` ({cols}) SELECT {select} FROM `{src}` WHERE id IN ({ph})", fill + tuple(ids))
+        cu.execute(f"DELETE FROM `{src}` WHERE id IN ({ph})", tuple(ids))
+        pending = change_log.record_changes(cn, [changes.Change(src, "move", request_number)])
+        cn.commit()
+        changes.publish(pending)
+        moved += len(ids)
+        if len(ids) < batch:
+            break
+    return moved
+
+
+def archive_request(request_number: str, batch: int = BATCH_SIZE) -> dict[str, int]:
+    """Перенести журнали однієї закритої заявки в архів. Повертає {table: к-сть}."""
+    out: dict[str, int] = {}
+    cn = connect_db()
+    try:
+        cu = cn.cursor(dictionary=True)
+        # рядкам без created_at — один і той самий час перенесення (сервера БД)
+        cu.execute("SELECT NOW() AS now")
+        fill_ts = cu.fetchall()[0]["now"]
+        for table in JOURNAL_TABLES:
+            # DDL (секції) — до транзакцій з даними: ALTER робить неявний COMMIT
+            ensure_archive_table(cu, table)
+            cu.execute(
+                f"SELECT MIN(COALESCE(created_at, %s)) AS a, MAX(COALESCE(created_at, %s)) AS b "
+                f"FROM `{table}` WHERE request_number = %s",
+                (fill_ts, fill_ts, request_number),
+            )
+            span = cu.fetchall()[0]
+            if span["a"] is None:
+                continue
+            ensure_month_partitions(cu, table, span["a"].date(), span["b"].date())
+            out[table] = _move(cn, table, archive_name(table), request_number, batch, fill_ts)
+    except Exception:
+        cn.rollback()
+        raise
+    finally:
+        cn.close()
+    return out
+
+
+def archive_closed_requests(max_requests: int | None = None, batch: int = BATCH_SIZE) -> dict[str, dict[str, int]]:
+    result = {}
+    for req in closed_requests(max_requests):
+        try:
+            result[req] = archive_request(req, batch)
+            log(f"archived request {req}: {result[req]}", tag="archive")
+        except Exception as e:
+            log(f"archive of request {req} failed: {e}", tag="archive")
+    return result
+
+
+# ───────────────────────── фоновий потік ─────────────────────────
+_worker: threading.Thread | None = None
+
+
+def start_background(interval_h: float = INTERVAL_H) -> threading.Thread | None:
+    """Періодична архівація закритих заявок (один потік на процес)."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return _worker
+    if interval_h <= 0:
+        return None
+
+    def _loop():
+        while True:
+            try:
+                with named_lock("journal_archive") as got:
+                    if got:
+                        archive_closed_requests()
+                    else:
+                        log("journal archive: already running elsewhere", tag="archive", level="debug")
+            except Exception as e:
+                log(f"journal archive failed: {e}", tag="archive")
+            time.sleep(interval_h * 3600)
+
+    _worker = threading.Thread(target=_loop, name="journal-archive", daemon=True)
+    _worker.start()
+    return _worker
+
+
+# ───────────────────────── читання ─────────────────────────
+_with_archive: set[str] = set()
+_views_checked = 0.0
+# архів, створений іншим процесом, помічаємо не пізніше ніж через стільки секунд
+VIEWS_TTL_SEC = 60
+
+
+def has_archive(table: str) -> bool:
+    """Чи є вже представлення <table>_with_archive (архів створюється при першому перенесенні)."""
+    global _views_checked
+    if table not in _with_archive and time.monotonic() - _views_checked > VIEWS_TTL_SEC:
+        # одним запитом усі представлення — і «немає» теж пам'ятаємо до VIEWS_TTL_SEC
+        _views_checked = time.monotonic()
+        _with_archive.update(
+            r["t"][: -len("_with_archive")]
+            for r in db_fetch(
+                "SELECT table_name AS t FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name LIKE %s",
+                ("%\\_with\\_archive",),
+            )
+        )
+    return table in _with_archive
+
+
+def is_request_closed(request_number: str) -> bool:
+    """Усі позиції заявки закриті — її журнали могли вже переїхати в архів."""
+    rows = db_fetch(
+        "SELECT MIN(is_closed) AS c FROM casting_requests WHERE request_number = %s",
+        (request_number,),
+    )
+    return bool(rows and rows[0]["c"])
+
+
+def journal_source(table: str, *, include_archive: bool = False) -> str:
+    """
+    FROM-джерело для журналу стадії. Без include_archive — сама таблиця;
+    з ним — UNION ALL з архівом під тим самим ім'ям (аліасом).
+    """
+    if not include_archive or not has_archive(table):
+        return f"`{table}`"
+    return f"`{table}_with_archive` AS `{table}`"
+
+
+if __name__ == "__main__":
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    for req, moved in archive_closed_requests(limit).items():
+        print(req, moved)
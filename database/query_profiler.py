@@ -0,0 +1,355 @@
+# database/query_profiler.py
+"""
+Профайлер SQL-запитів.
+
+Сторінки виконують запити через власні db_fetch/db_exec поверх connect_db(),
+тому вимірювання стоїть на рівні з'єднання: коли профайлер увімкнено,
+connect_db() повертає з'єднання, курсори якого засікають час execute + fetch.
+
+Статистика збирається за «відбитком» запиту (fingerprint — SQL без літералів,
+зі згорнутими IN-списками): кількість викликів, сумарний / p50 / p95 / p99 час,
+к-сть повернутих рядків і хто викликав (файл:функція сторінки).
+
+    DB_PROFILE=1 python launcher.py          # або query_profiler.enable()
+    DB_SLOW_MS=200                           # поріг журналу повільних запитів
+    DB_PROFILE_DUMP=profile.json             # JSON-звіт при виході
+
+    print(query_profiler.report())           # топ за сумарним часом
+    query_profiler.dump_json("profile.json")
+    query_profiler.reset()
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from utils.logger import log
+
+ENABLED = os.getenv("DB_PROFILE", "0").lower() in ("1", "true", "yes")
+SLOW_MS = float(os.getenv("DB_SLOW_MS", "200"))
+DUMP_PATH = os.getenv("DB_PROFILE_DUMP", "")   # куди скинути JSON при виході процесу
+SAMPLES = 2000               # скільки останніх замірів тримаємо на відбиток для перцентилів
+
+_lock = threading.Lock()
+_stats: dict[str, "QueryStats"] = {}
+_listeners: list = []
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+def is_enabled() -> bool:
+    return ENABLED
+
+
+# ───────────────────────── відбиток ─────────────────────────
+_RE_COMMENT = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PARAM = re.compile(r"%\(\w+\)s|%s")
+_RE_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_RE_VALUES = re.compile(r"\bVALUES\s*(?=\()", re.I)
+_RE_WS = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """
+    SELECT * FROM casting WHERE id IN (1, 2, 3) AND req='7'
+        → select * from casting where id in (?+) and req=?
+    """
+    s = _RE_COMMENT.sub(" ", sql)
+    s = _RE_STRING.sub("?", s)
+    s = _RE_PARAM.sub("?", s)
+    s = _RE_NUMBER.sub("?", s)
+    s = _RE_IN_LIST.sub("IN (?+)", s)
+    s = _collapse_values(s)
+    return _RE_WS.sub(" ", s).strip().lower()
+
+
+def _collapse_values(s: str) -> str:
+    """VALUES (?, NOW()), (?, NOW()) → VALUES (?+): дужки рахуються (рядки вже замінені на ?)."""
+    out, pos = [], 0
+    for m in _RE_VALUES.finditer(s):
+        if m.start() < pos:
+            continue
+        i, depth = m.end(), 0
+        end = None
+        while i < len(s):
+            ch = s[i]
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    end = i + 1
+                    # наступний рядок «, (...)» — продовжуємо, інакше кінець списку
+                    j = i + 1
+                    while j < len(s) and s[j].isspace():
+                        j += 1
+                    if j < len(s) and s[j] == ",":
+                        j += 1
+                        while j < len(s) and s[j].isspace():
+                            j += 1
+                        if j < len(s) and s[j] == "(":
+                            i = j
+                            continue
+                    break
+            i += 1
+        if end is None:
+            continue
+        out.append(s[pos:m.start()] + "VALUES (?+)")
+        pos = end
+    out.append(s[pos:])
+    return "".join(out)
+
+
+# ───────────────────────── статистика ─────────────────────────
+class QueryStats:
+    __slots__ = ("fingerprint", "count", "total", "max", "rows", "samples", "callers", "sample_sql")
+
+    def __init__(self, fp: str, sql: str):
+        self.fingerprint = fp
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples: deque[float] = deque(maxlen=SAMPLES)
+        self.callers: Counter[str] = Counter()
+        self.sample_sql = sql
+
+    def add(self, elapsed: float, rows: int, caller: str):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.rows += max(rows, 0)
+        self.samples.append(elapsed)
+        self.callers[caller] += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        data = sorted(self.samples)
+        k = min(len(data) - 1, max(0, int(round(p / 100 * (len(data) - 1)))))
+        return data[k]
+
+    def as_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 2),
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+            "rows": self.rows,
+            "callers": dict(self.callers.most_common()),
+            "sample_sql": self.sample_sql,
+        }
+
+
+def _caller() -> str:
+    """Перший кадр стеку поза БД-шаром (сторінка / модуль, що зробив запит)."""
+    f = sys._getframe(2)
+    skip = ("database/db_manager.py", "database/query_profiler.py", "mysql", "contextlib.py")
+    while f is not None:
+        fn = f.f_code.co_filename.replace("\\", "/")
+        if not any(s in fn for s in skip) and f.f_code.co_name not in ("db_fetch", "db_exec", "db_insert_batches"):
+            parts = fn.rsplit("/", 2)
+            short = "/".join(parts[-2:]) if len(parts) >= 2 else fn
+            return f"{short}:{f.f_code.co_name}"
+        f = f.f_back
+    return "?"
+
+
+def record(sql: str, elapsed: float, rows: int = 0, caller: str | None = None):
+    """Записати один виконаний запит (викликається курсором-обгорткою)."""
+    caller = caller or _caller()
+    fp = fingerprint(sql)
+    with _lock:
+        st = _stats.get(fp)
+        if st is None:
+            st = _stats[fp] = QueryStats(fp, sql.strip())
+        st.add(elapsed, rows, caller)
+        listeners = list(_listeners)
+    if elapsed * 1000 >= SLOW_MS:
+        log(f"{elapsed * 1000:.0f} ms, {rows} rows, {caller}: {_RE_WS.sub(' ', sql).strip()[:300]}", tag="slow-sql")
+    for fn in listeners:
+        try:
+            fn(fp, elapsed, rows, caller)
+        except Exception as e:
+            log(f"profiler listener failed: {e}", tag="db")
+
+
+def add_listener(fn):
+    """fn(fingerprint, elapsed_sec, rows, caller) — на кожен запит (для оверлеїв/лічильників)."""
+    with _lock:
+        _listeners.append(fn)
+
+
+def remove_listener(fn):
+    with _lock:
+        if fn in _listeners:
+            _listeners.remove(fn)
+
+
+def snapshot() -> list[dict]:
+    with _lock:
+        return [st.as_dict() for st in _stats.values()]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def report(top: int = 20, sort: str = "total_ms") -> str:
+    rows = sorted(snapshot(), key=lambda r: r[sort], reverse=True)[:top]
+    total_calls = sum(r["count"] for r in snapshot())
+    out = [f"SQL profile: {len(_stats)} fingerprints, {total_calls} calls (sorted by {sort})"]
+    for r in rows:
+        top_caller = next(iter(r["callers"]), "?")
+        out.append(
+            f"{r['count']:>7} × | total {r['total_ms']:>9.1f} ms | p50 {r['p50_ms']:>7.1f} "
+            f"p95 {r['p95_ms']:>7.1f} p99 {r['p99_ms']:>7.1f} | rows {r['rows']:>8} | "
+            f"{top_caller} | {r['fingerprint'][:120]}"
+        )
+    return "\n".join(out)
+
+
+def report_by_caller(top: int = 20) -> str:
+    """Хто робить найбільше звернень до БД (сторінка/функція → к-сть запитів, мс)."""
+    calls: Counter[str] = Counter()
+    ms: Counter[str] = Counter()
+    for r in snapshot():
+        share = r["total_ms"] / r["count"] if r["count"] else 0.0
+        for c, n in r["callers"].items():
+            calls[c] += n
+            ms[c] += share * n
+    out = [f"{'calls':>7} | {'ms':>9} | caller"]
+    for c, n in calls.most_common(top):
+        out.append(f"{n:>7} | {ms[c]:>9.1f} | {c}")
+    return "\n".join(out)
+
+
+def dump_json(path: str) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"generated_at": time.strftime("%Y-%m-%d %H:%M:%S"), "slow_ms": SLOW_MS, "queries": snapshot()},
+            f, ensure_ascii=False, indent=2, default=str,
+        )
+    return path
+
+
+# ───────────────────────── обгортки з'єднання ─────────────────────────
+class _ProfiledCursor:
+    """
+    Курсор, що засікає execute + fetch. Для SELECT запит записується після
+    вибірки (щоб врахувати рядки і час передачі), для решти — одразу.
+    """
+
+    def __init__(self, cursor):
+        self._cur = cursor
+        self._pending: tuple[str, float, str] | None = None
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _flush(self, extra: float = 0.0, rows: int = 0):
+        if self._pending is not None:
+            sql, elapsed, caller = self._pending
+            self._pending = None
+            record(sql, elapsed + extra, rows, caller)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._flush()
+        caller = _caller()
+        t0 = time.perf_counter()
+        res = self._cur.execute(operation, params, *args, **kwargs)
+        elapsed = time.perf_counter() - t0
+        if getattr(self._cur, "with_rows", False):
+            self._pending = (operation, elapsed, caller)
+        else:
+            record(operation, elapsed, self._cur.rowcount or 0, caller)
+        return res
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._flush()
+        caller = _caller()
+        t0 = time.perf_counter()
+        res = self._cur.executemany(operation, seq_params, *args, **kwargs)
+        record(operation, time.perf_counter() - t0, self._cur.rowcount or 0, caller)
+        return res
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = self._cur.fetchall()
+        self._flush(time.perf_counter() - t0, len(rows))
+        return rows
+
+    def fetchmany(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        rows = self._cur.fetchmany(*args, **kwargs)
+        self._flush(time.perf_counter() - t0, len(rows))
+        return rows
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = self._cur.fetchone()
+        self._flush(time.perf_counter() - t0, 1 if row is not None else 0)
+        return row
+
+    def close(self):
+        self._flush()
+        return self._cur.close()
+
+
+class ProfiledConnection:
+    """Проксі над mysql.connector-з'єднанням: cursor() повертає _ProfiledCursor."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def cursor(self, *args, **kwargs):
+        return _ProfiledCursor(self._conn.cursor(*args, **kwargs))
+
+
+def wrap_connection(conn):
+    return ProfiledConnection(conn) if ENABLED else conn
+
+
+if DUMP_PATH:
+    atexit.register(lambda: ENABLED and dump_json(DUMP_PATH))
+
+
+if __name__ == "__main__":
+    # python -m database.query_profiler "SELECT ... IN (1,2,3)" — показати відбиток
+    for a in sys.argv[1:]:
+        print(fingerprint(a))
@@ -0,0 +1,274 @@
+# database/result_cache.py
+"""
+Спільний для всіх сесій Flet кеш результатів агрегатних запитів.
+
+Кілька керівників з відкритим моніторингом рахують одні й ті самі агрегати
+(прогрес заявок, активні етапи, план/передано складу). Кеш живе на рівні
+процесу, тож повторний запит з іншої сесії протягом TTL не йде в MySQL.
+
+* ключ — відбиток запиту (query_profiler.fingerprint) + текст SQL + параметри
+  (для memoize — ім'я функції + аргументи);
+* single-flight: однакові запити, що прийшли одночасно, виконуються один раз,
+  решта чекає на результат першого;
+* інвалідація за таблицями: запис у таблицю (подія database/changes або
+  invalidate()) скидає всі результати, що її читали, а запит, який
+  стартував до запису, свій результат не кешує;
+* метрики hit / miss / coalesced / invalidated по кожному відбитку.
+
+    rows = cached_fetch("SELECT ... FROM casting_requests ...", (rn,), ttl=5)
+
+    @memoize(ttl=5, tables=("casting_requests", "final_quality"))
+    def calculate_progress(rn): ...
+
+    RESULT_CACHE=0           # вимкнути (кожен виклик іде в БД)
+    RESULT_CACHE_TTL=5       # TTL за замовчуванням, с
+    RESULT_CACHE_MAX=2000    # макс. к-сть записів
+
+Результати спільні для всіх сесій — змінювати їх не можна.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Iterable
+
+from database import changes
+from database.db_manager import db_fetch
+from database.query_profiler import fingerprint
+from utils.logger import log
+
+ENABLED = os.getenv("RESULT_CACHE", "1").lower() in ("1", "true", "yes")
+DEFAULT_TTL = float(os.getenv("RESULT_CACHE_TTL", "5"))
+MAX_ENTRIES = max(1, int(os.getenv("RESULT_CACHE_MAX", "2000")))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+_inflight: dict[tuple, "_Flight"] = {}
+_by_table: dict[str, set[tuple]] = {}
+_table_gen: Counter[str] = Counter()
+_metrics: dict[str, Counter[str]] = {}
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+    if not on:
+        clear()
+
+
+# ───────────────────────── таблиці запиту ─────────────────────────
+_RE_READ = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.I)
+_RE_WRITE = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?", re.I
+)
+
+
+def _base(table: str) -> str:
+    """casting_archive / casting_with_archive → casting (архів — та сама стадія)."""
+    t = table.lower()
+    for suffix in ("_with_archive", "_archive"):
+        if t.endswith(suffix):
+            return t[: -len(suffix)]
+    return t
+
+
+def tables_read(sql: str) -> frozenset[str]:
+    return frozenset(_base(t) for t in _RE_READ.findall(sql))
+
+
+def table_written(sql: str) -> str | None:
+    m = _RE_WRITE.match(sql)
+    return _base(m.group(1)) if m else None
+
+
+# ───────────────────────── записи / single-flight ─────────────────────────
+class _Entry:
+    __slots__ = ("value", "expires", "tables", "name")
+
+    def __init__(self, value, expires: float, tables: frozenset[str], name: str):
+        self.value = value
+        self.expires = expires
+        self.tables = tables
+        self.name = name
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+
+def _count(name: str, what: str, n: int = 1):
+    _metrics.setdefault(name, Counter())[what] += n
+
+
+def _drop(key: tuple):
+    e = _entries.pop(key, None)
+    if e is None:
+        return
+    for t in e.tables:
+        keys = _by_table.get(t)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _by_table[t]
+
+
+def get_or_load(key: tuple, name: str, tables: Iterable[str], loader: Callable[[], Any],
+                ttl: float | None = None) -> Any:
+    """
+    Значення з кешу або loader() — один раз на ключ, навіть якщо його
+    одночасно просять кілька сесій.
+    """
+    if not ENABLED:
+        return loader()
+    tables = frozenset(_base(t) for t in tables)
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    now = time.monotonic()
+    with _lock:
+        e = _entries.get(key)
+        if e is not None and e.expires > now:
+            _entries.move_to_end(key)
+            _count(name, "hit")
+            return e.value
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+            gens = {t: _table_gen[t] for t in tables}
+            _count(name, "miss")
+        else:
+            _count(name, "coalesced")
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        value = loader()
+    except BaseException as exc:
+        flight.error = exc
+        with _lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+        raise
+
+    flight.value = value
+    with _lock:
+        _inflight.pop(key, None)
+        # поки вантажили, у таблицю могли записати — такий результат не кешуємо
+        if all(_table_gen[t] == g for t, g in gens.items()):
+            _drop(key)
+            _entries[key] = _Entry(value, time.monotonic() + ttl, tables, name)
+            for t in tables:
+                _by_table.setdefault(t, set()).add(key)
+            while len(_entries) > MAX_ENTRIES:
+                _drop(next(iter(_entries)))
+                _count(name, "evicted")
+        else:
+            _count(name, "stale")
+    flight.done.set()
+    return value
+
+
+def cached_fetch(sql: str, params: tuple | None = None, *, ttl: float | None = None,
+                 tables: Iterable[str] | None = None) -> list[dict]:
+    """db_fetch() через кеш. Таблиці для інвалідації беруться з FROM/JOIN, якщо не задані."""
+    fp = fingerprint(sql)
+    params = tuple(params or ())
+    return get_or_load(
+        ("sql", fp, sql, params), fp,
+        tables if tables is not None else tables_read(sql),
+        lambda: db_fetch(sql, params), ttl,
+    )
+
+
+def memoize(ttl: float | None = None, tables: Iterable[str] = ()):
+    """Декоратор для функцій-агрегатів з хешованими аргументами."""
+    tables = frozenset(tables)
+
+    def deco(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = ("fn", name, args, tuple(sorted(kwargs.items())))
+            return get_or_load(key, name, tables, lambda: fn(*args, **kwargs), ttl)
+
+        wrapper.uncached = fn
+        return wrapper
+    return deco
+
+
+# ───────────────────────── інвалідація ─────────────────────────
+def invalidate(*tables: str) -> int:
+    """Скинути результати, що читали ці таблиці. Повертає к-сть скинутих записів."""
+    dropped = 0
+    with _lock:
+        for t in {_base(t) for t in tables}:
+            _table_gen[t] += 1
+            for key in list(_by_table.get(t, ())):
+                e = _entries.get(key)
+                if e is not None:
+                    _count(e.name, "invalidated")
+                    dropped += 1
+                _drop(key)
+    return dropped
+
+
+def invalidate_sql(sql: str) -> int:
+    """Інвалідація за INSERT / UPDATE / DELETE (для SELECT нічого не робить)."""
+    table = table_written(sql)
+    return invalidate(table) if table else 0
+
+
+# записи через db_exec-хелпери приходять сюди синхронно, одразу після COMMIT
+changes.subscribe(lambda c: invalidate(c.table))
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _by_table.clear()
+
+
+# ───────────────────────── метрики ─────────────────────────
+def stats() -> dict[str, dict[str, int]]:
+    with _lock:
+        return {name: dict(c) for name, c in _metrics.items()}
+
+
+def reset_stats():
+    with _lock:
+        _metrics.clear()
+
+
+def report(top: int = 20) -> str:
+    rows = stats()
+    total = Counter()
+    for c in rows.values():
+        total.update(c)
+    looked = total["hit"] + total["miss"] + total["coalesced"]
+    hit_rate = (total["hit"] + total["coalesced"]) / looked if looked else 0.0
+    out = [f"result cache: {len(_entries)} entries, hit rate {hit_rate:.0%} "
+           f"(hit {total['hit']}, coalesced {total['coalesced']}, miss {total['miss']}, "
+           f"invalidated {total['invalidated']})"]
+    for name, c in sorted(rows.items(), key=lambda kv: -(kv[1]["hit"] + kv[1]["miss"]))[:top]:
+        out.append(
+            f"{c['hit']:>7} hit | {c['coalesced']:>5} coal | {c['miss']:>6} miss | "
+            f"{c['invalidated']:>5} inv | {name[:110]}"
+        )
+    return "\n".join(out)
+
+
+def log_report():
+    log(report(), tag="result-cache")
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 # MPI Agro — Launcher + Main Menu (Flet) — refined
 
-import os, sys, re, time, tempfile, hashlib, shutil, zipfile, threading, json, traceback, datetime, asyncio, calendar
+import os, sys, re, time, tempfile, hashlib, shutil, zipfile, threading, json, traceback, datetime, asyncio, calendar, contextlib
 import datetime as _dt
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
@@ -31,6 +31,51 @@ def _log_exc(prefix: str, err: Exception):
     except Exception:
         pass
 
+# ========= STARTUP TIMINGS =========
+# Звіт «де йде час при старті»: фази запуску процесу (один раз), далі — окремими
+# рядками побудова меню кожної сесії та перше відкриття кожної сторінки.
+STARTUP_REPORT_PATH = USER_DIR / "startup_report.log"
+_STARTUP_T0 = time.perf_counter()
+# лише фази старту процесу (до першої сесії); сесії й сторінки сюди не пишуться
+STARTUP_TIMINGS: List[Tuple[str, float]] = []
+_startup_reported = False
+_report_lock = threading.Lock()
+
+class _startup_phase:
+    """with _startup_phase("ensure_schema"): ... → запис у STARTUP_TIMINGS (сек)."""
+    def __init__(self, label: str): self.label = label
+    def __enter__(self): self.t = time.perf_counter(); return self
+    def __exit__(self, *exc):
+        STARTUP_TIMINGS.append((self.label, time.perf_counter() - self.t))
+        return False
+
+def startup_report() -> str:
+    total = time.perf_counter() - _STARTUP_T0
+    lines = [f"[{datetime.datetime.now().isoformat(timespec='seconds')}] startup report, total {total * 1000:.0f} ms"]
+    for label, sec in STARTUP_TIMINGS:
+        lines.append(f"  {label:<40} {sec * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+def _append_report(text: str):
+    try:
+        with _report_lock, open(STARTUP_REPORT_PATH, "a", encoding="utf-8") as f:
+            f.write(text + "\n")
+    except Exception:
+        pass
+
+def write_startup_report():
+    """Звіт старту процесу — один раз, при побудові першої сесії."""
+    global _startup_reported
+    with _report_lock:
+        if _startup_reported:
+            return
+        _startup_reported = True
+    _append_report(startup_report())
+
+def report_timing(kind: str, label: str, sec: float):
+    """Рядок поза стартом процесу: kind = "session" (меню сесії) або "first open" (сторінка)."""
+    _append_report(f"  {kind:<10} {label:<29} {sec * 1000:8.1f} ms")
+
 def load_env():
     if not ENV_PATH.exists():
         ENV_PATH.write_text("APP_LANG=uk\r\nCLIENT_MODE=remote\r\nDISABLE_DIRECT_DB=1\r\n", encoding="utf-8")
@@ -40,7 +85,8 @@ def load_env():
             continue
         k, v = s.split("=", 1)
         os.environ.setdefault(k.strip(), v.strip().strip("'").strip('"'))
-load_env()
+with _startup_phase("load_env"):
+    load_env()
 
 # ========= API/UPDATE =========
 API_BASE = (os.getenv("API_BASE") or os.getenv("API_URL") or "https://api.mpi-ringroup.pp.ua").rstrip("/")
@@ -207,10 +253,27 @@ DB_AVAILABLE = False
 PARAM_STYLE = "%s"
 
 try:
-    from database.db_manager import connect_db, db_fetch, db_exec
-    from database.bootstrap import ensure_schema
-    ensure_schema()
+    with _startup_phase("import database"):
+        from database.db_manager import connect_db, db_fetch, db_exec
+        from database.bootstrap import ensure_schema
+    with _startup_phase("ensure_schema"):
+        ensure_schema()
     DB_AVAILABLE = True
+    try:
+        from utils.notification_retention import start_background as _start_notif_retention
+        _start_notif_retention()
+    except Exception as e:
+        _log_exc("notif_retention", e)
+    try:
+        from database.journal_archive import start_background as _start_journal_archive
+        _start_journal_archive()
+    except Exception as e:
+        _log_exc("journal_archive", e)
+    try:
+        from database.change_log import start_background as _start_change_feed
+        _start_change_feed()
+    except Exception as e:
+        _log_exc("change_feed", e)
 except Exception:
     def connect_db(): raise RuntimeError("DB unavailable")
     def db_fetch(*a, **k): return []
@@ -765,12 +828,35 @@ except Exception:
     class NotifBanner:
         def __init__(self, *a, **k): pass
 
+try:
+    from utils.ui_updates import schedule_update, forget as forget_scheduler
+except Exception:
+    def schedule_update(page: ft.Page, *controls):
+        page.update()
+    def forget_scheduler(page: ft.Page): pass
+
+try:
+    from utils import perf_overlay
+except Exception:
+    perf_overlay = None
+
+try:
+    from database import changes as data_changes
+except Exception:
+    data_changes = None
+
+def _perf_action(page: ft.Page, name: str):
+    return perf_overlay.action(page, name) if perf_overlay else contextlib.nullcontext()
+
+def _perf_phase(page: ft.Page, kind: str):
+    return perf_overlay.phase(page, kind) if perf_overlay else contextlib.nullcontext()
+
 def _fallback_view(name: str):
     def _v(page: ft.Page):
         return ft.View(f"/{name}", controls=[ft.Container(ft.Text(f"{name}: сторінка тимчасово недоступна"), padding=20)])
     return _v
 
-def import_view(candidates, attr):
+def _resolve_view(candidates, attr):
     for mod_name in candidates:
         try:
             mod = __import__(mod_name, fromlist=[attr])
@@ -779,6 +865,22 @@ def import_view(candidates, attr):
             continue
     return _fallback_view(candidates[-1].split(".")[-1])
 
+def import_view(candidates, attr):
+    """
+    Лінивий імпорт сторінки: модуль (і його одноразові налаштування) завантажується
+    лише при першому відкритті плитки, далі використовується закешована функція.
+    """
+    resolved = {}
+    def _lazy(page: ft.Page, *a, **k):
+        if "view" not in resolved:
+            t = time.perf_counter()
+            resolved["view"] = _resolve_view(candidates, attr)
+            report_timing("first open", f"{candidates[0]}.{attr}", time.perf_counter() - t)
+        return resolved["view"](page, *a, **k)
+    # «pages.casting.view», а не «view» для всіх сторінок
+    _lazy.__module__, _lazy.__name__, _lazy.__qualname__ = candidates[0], attr, attr
+    return _lazy
+
 # Removed import of the warehouse module as the "Склад" section has been deprecated.
 
 
@@ -797,6 +899,7 @@ warehouse_view       = None
 
 # ========= MAIN MENU + POPUP CALENDAR =========
 def app_main(page: ft.Page):
+    _app_main_t0 = time.perf_counter()
     set_page_locale_uk(page)
     try: page.locale = ft.Locale("uk","UA")
     except Exception: pass
@@ -816,6 +919,15 @@ def app_main(page: ft.Page):
             page.views.pop(); page.go(_top_route())
     page.on_view_pop = back_to_root
     page.on_route_change = lambda _: page.update()
+    def _on_disconnect(_):
+        forget_scheduler(page)
+        if perf_overlay: perf_overlay.forget(page)
+        if data_changes: data_changes.forget(page)
+        # таймер «Сушка» деталей моніторингу (модуль міг і не завантажуватись)
+        sc = sys.modules.get("monitoring_cards.stage_cards")
+        if sc: sc.stop_drying_timer(page)
+    page.on_disconnect = _on_disconnect
+    perf = perf_overlay.attach(page) if perf_overlay else None
 
     # --- CLOCK ---
     time_lbl = ft.Text(size=32, weight="bold", color="#22d3ee")
@@ -1299,6 +1411,8 @@ def app_main(page: ft.Page):
     def _kb(e: ft.KeyboardEvent):
         if e.key == "Escape" and cal_popover.visible:
             _toggle_calendar(force=False)
+        elif perf and e.ctrl and e.shift and e.key.upper() == "P":
+            perf.toggle()
     page.on_keyboard_event = _kb
 
     async def _clock():
@@ -1306,8 +1420,14 @@ def app_main(page: ft.Page):
             now = _dt.datetime.now()
             time_lbl.value = now.strftime("%H:%M:%S")
             wd = ukr_wd_short[now.weekday() if now.weekday() < len(ukr_wd_short) else 0]
-            date_lbl.value = f"{wd}  {now:%d.%m.%Y}"
-            page.update(); await asyncio.sleep(1)
+            date_txt = f"{wd}  {now:%d.%m.%Y}"
+            # щосекунди відправляємо лише годинник, дату — тільки коли змінилась
+            if date_lbl.value != date_txt:
+                date_lbl.value = date_txt
+                schedule_update(page, time_lbl, date_lbl)
+            else:
+                schedule_update(page, time_lbl)
+            await asyncio.sleep(1)
     page.run_task(_clock)
 
     version_text = ft.Text(f"v{read_local_version()}", size=14, weight="bold", color="#22c55e")
@@ -1315,7 +1435,7 @@ def app_main(page: ft.Page):
         prev = None
         while True:
             cur = read_local_version()
-            if cur != prev: version_text.value = f"v{cur}"; page.update(); prev = cur
+            if cur != prev: version_text.value = f"v{cur}"; schedule_update(page, version_text); prev = cur
             await asyncio.sleep(5)
     page.run_task(_version_poller)
 
@@ -1378,13 +1498,21 @@ def app_main(page: ft.Page):
             gradient=ft.LinearGradient(begin=ft.alignment.top_left, end=ft.alignment.bottom_right,
                                        colors=["#161634", "#0e0e24"]),
             border_radius=18, padding=24, ink=True,
-            on_click=lambda e: ((lambda view=_wrap_view(vf(page), lbl): (page.views.append(view), page.go(view.route)))()),
+            on_click=lambda e: _open_tile(vf, lbl),
             animate=ft.Animation(220, "easeInOut"),
         )
         def _hover(e): card.scale = 1.05 if e.data == "true" else 1.0; card.update()
         card.on_hover = _hover
         return card
 
+    def _open_tile(vf, lbl):
+        # при PERF_OVERLAY=1 панель покаже DB / build / update для відкриття екрану
+        with _perf_action(page, lbl):
+            view = perf_overlay.timed_build(page, lambda: _wrap_view(vf(page), lbl)) if perf_overlay \
+                else _wrap_view(vf(page), lbl)
+            with _perf_phase(page, "update"):
+                page.views.append(view); page.go(view.route)
+
     def _wrap_view(v, title):
         if not isinstance(v, ft.View): v = ft.View(f"/{title}", controls=[v])
         v.appbar = ft.AppBar(leading=ft.IconButton(ft.icons.ARROW_BACK, on_click=back_to_root),
@@ -1401,6 +1529,8 @@ def app_main(page: ft.Page):
     page.go("/")
     try: NotifBanner(page, user_key=disp)
     except Exception: pass
+    write_startup_report()
+    report_timing("session", "app_main (menu built)", time.perf_counter() - _app_main_t0)
 
 # ========= ENTRY =========
 if __name__ == "__main__":
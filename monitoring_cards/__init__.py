@@ -2,233 +2,144 @@
 
 import flet as ft
 from database.db_manager import db_fetch
+from database.journal_archive import journal_source
 from utils.logger import log
 
-# ── Лиття
-def build_casting_products(page: ft.Page, req: str) -> list[ft.Control]:
-    log(f"Fetching casting data for {req}", tag="monitoring_cards")
-    rows = db_fetch(
-        """
-        SELECT article_code, quantity, defect_quantity, operator_name, machine_number
-        FROM casting
-        WHERE request_number = %s
-        """,
-        (req,)
-    )
-    cards: list[ft.Control] = []
-    for r in rows:
-        qty = r["quantity"] or 0
-        defect = r.get("defect_quantity") or 0
-        good = qty - defect
-        pct = (defect * 100 / qty) if qty else 0
-        cards.append(
-            ft.Container(
-                content=ft.Column([
-                    ft.Text(r["article_code"], weight="bold"),
-                    ft.Text(f"К-сть: {qty}  Брак: {defect} ({pct:.1f}%)"),
-                    ft.Text(f"Гарні: {good}"),
-                    ft.Text(f"Оператор: {r.get('operator_name','-')}  Станок: {r.get('machine_number','-')}"),
-                ], tight=True),
-                padding=10,
-                margin=ft.margin.all(5),
-                bgcolor="#1f1f2b",
-                border_radius=6,
-            )
-        )
-    return cards
-
-# ── Сушка
-def build_drying_products(page: ft.Page, req: str) -> list[ft.Control]:
-    log(f"Fetching drying data for {req}", tag="monitoring_cards")
-    rows = db_fetch(
-        """
-        SELECT article_code, qty, operator_name, start_time
-        FROM drying
-        WHERE request_number = %s
-        """,
-        (req,)
-    )
-    cards: list[ft.Control] = []
-    for r in rows:
-        start = r.get("start_time")
-        start_str = start.strftime("%H:%M") if start else "не стартовано"
-        cards.append(
-            ft.Container(
-                content=ft.Column([
-                    ft.Text(r["article_code"], weight="bold"),
-                    ft.Text(f"К-сть: {r['qty']}"),
-                    ft.Text(f"Оператор: {r.get('operator_name','-')}"),
-                    ft.Text(f"Старт: {start_str}"),
-                ], tight=True),
-                padding=10,
-                margin=ft.margin.all(5),
-                bgcolor="#1f1f2b",
-                border_radius=6,
-            )
-        )
-    return cards
-
-# ── Контроль якості лиття
-def build_casting_quality_products(page: ft.Page, req: str) -> list[ft.Control]:
-    log(f"Fetching casting_quality data for {req}", tag="monitoring_cards")
-    rows = db_fetch(
-        """
-        SELECT article_code, product_name, checked_quantity, accepted_quantity, controller_name
-        FROM casting_quality
-        WHERE request_number = %s
-        """,
-        (req,)
-    )
-    cards: list[ft.Control] = []
-    for r in rows:
-        checked = r["checked_quantity"] or 0
-        accepted = r["accepted_quantity"] or 0
-        defect = checked - accepted
-        pct = (defect * 100 / checked) if checked else 0
-        cards.append(
-            ft.Container(
-                content=ft.Column([
-                    ft.Text(r["article_code"], weight="bold"),
-                    ft.Text(r.get("product_name","")),
-                    ft.Text(f"Перевірено: {checked}  Прийнято: {accepted}  Брак: {defect} ({pct:.1f}%)"),
-                    ft.Text(f"Контролер: {r.get('controller_name','-')}"),
-                ], tight=True),
-                padding=10,
-                margin=ft.margin.all(5),
-                bgcolor="#1f1f2b",
-                border_radius=6,
-            )
-        )
-    return cards
-
-# ── Обрізка
-def build_trimming_products(page: ft.Page, req: str) -> list[ft.Control]:
-    log(f"Fetching trimming data for {req}", tag="monitoring_cards")
-    rows = db_fetch(
-        """
-        SELECT article_code, product_name, processed_quantity, defect_quantity, operator_name
-        FROM trimming
-        WHERE request_number = %s
-        """,
-        (req,)
-    )
-    cards: list[ft.Control] = []
-    for r in rows:
-        proc = r["processed_quantity"] or 0
-        defect = r["defect_quantity"] or 0
-        good = proc - defect
-        pct = (defect * 100 / proc) if proc else 0
-        cards.append(
-            ft.Container(
-                content=ft.Column([
-                    ft.Text(r["article_code"], weight="bold"),
-                    ft.Text(r.get("product_name","")),
-                    ft.Text(f"Оброблено: {proc}  Брак: {defect} ({pct:.1f}%)  Гарні: {good}"),
-                    ft.Text(f"Оператор: {r.get('operator_name','-')}"),
-                ], tight=True),
-                padding=10,
-                margin=ft.margin.all(5),
-                bgcolor="#1f1f2b",
-                border_radius=6,
-            )
-        )
-    return cards
-
-# ── Різка
-def build_cutting_products(page: ft.Page, req: str) -> list[ft.Control]:
-    log(f"Fetching cutting data for {req}", tag="monitoring_cards")
-    rows = db_fetch(
-        """
-        SELECT article_code, product_name, processed_quantity, defect_quantity, operator_name
-        FROM cutting
-        WHERE request_number = %s
-        """,
-        (req,)
-    )
-    cards: list[ft.Control] = []
-    for r in rows:
-        proc = r["processed_quantity"] or 0
-        defect = r["defect_quantity"] or 0
-        good = proc - defect
-        pct = (defect * 100 / proc) if proc else 0
-        cards.append(
-            ft.Container(
-                content=ft.Column([
-                    ft.Text(r["article_code"], weight="bold"),
-                    ft.Text(r.get("product_name","")),
-                    ft.Text(f"Різка: {proc}  Брак: {defect} ({pct:.1f}%)  Гарні: {good}"),
-                    ft.Text(f"Оператор: {r.get('operator_name','-')}"),
-                ], tight=True),
-                padding=10,
-                margin=ft.margin.all(5),
-                bgcolor="#1f1f2b",
-                border_radius=6,
-            )
-        )
-    return cards
-
-# ── Зачистка
-def build_cleaning_products(page: ft.Page, req: str) -> list[ft.Control]:
-    log(f"Fetching cleaning data for {req}", tag="monitoring_cards")
-    rows = db_fetch(
-        """
-        SELECT article_code, product_name, processed_quantity, defect_quantity, operator_name
-        FROM cleaning
-        WHERE request_number = %s
-        """,
-        (req,)
-    )
-    cards: list[ft.Control] = []
-    for r in rows:
-        proc = r["processed_quantity"] or 0
-        defect = r["defect_quantity"] or 0
-        good = proc - defect
-        pct = (defect * 100 / proc) if proc else 0
-        cards.append(
-            ft.Container(
-                content=ft.Column([
-                    ft.Text(r["article_code"], weight="bold"),
-                    ft.Text(r.get("product_name","")),
-                    ft.Text(f"Зачистка: {proc}  Брак: {defect} ({pct:.1f}%)  Гарні: {good}"),
-                    ft.Text(f"Оператор: {r.get('operator_name','-')}"),
-                ], tight=True),
-                padding=10,
-                margin=ft.margin.all(5),
-                bgcolor="#1f1f2b",
-                border_radius=6,
-            )
+# ─────────── знімок заявки: усі стадії одним запитом ───────────
+# stage → (таблиця, q1, q2, ПІБ, станок, старт) — колонки зводяться до спільного вигляду
+SNAPSHOT_SOURCES: dict[str, tuple[str, str, str, str, str, str]] = {
+    "casting":         ("casting",         "quantity",           "defect_quantity",   "operator_name",   "machine_number", "NULL"),
+    "drying":          ("drying",          "qty",                "NULL",              "operator_name",   "NULL",           "start_time"),
+    "casting_quality": ("casting_quality", "checked_quantity",   "accepted_quantity", "controller_name", "NULL",           "NULL"),
+    "trimming":        ("trimming",        "processed_quantity", "defect_quantity",   "operator_name",   "NULL",           "NULL"),
+    "cutting":         ("cutting",         "processed_quantity", "defect_quantity",   "operator_name",   "NULL",           "NULL"),
+    "cleaning":        ("cleaning",        "processed_quantity", "defect_quantity",   "operator_name",   "NULL",           "NULL"),
+    "final_quality":   ("final_quality",   "checked_quantity",   "accepted_quantity", "inspector_name",  "NULL",           "NULL"),
+}
+
+
+def load_request_snapshot(req: str, stages: list[str] | None = None, *,
+                          history: bool = False) -> dict[str, list[dict]]:
+    """
+    Записи всіх (або вказаних) стадій заявки за один запит:
+    UNION ALL з дискримінатором stage. Рядок: stage, id, article_code,
+    product_name, q1, q2, person, machine, start_time.
+    history=True — разом з архівом (для закритої заявки).
+    """
+    stages = [s for s in (stages or SNAPSHOT_SOURCES) if s in SNAPSHOT_SOURCES]
+    out: dict[str, list[dict]] = {s: [] for s in stages}
+    if not stages:
+        return out
+    parts = []
+    for i, stage in enumerate(stages):
+        table, q1, q2, person, machine, start = SNAPSHOT_SOURCES[stage]
+        parts.append(
+            f"SELECT {i} AS ord, '{stage}' AS stage, id, article_code, product_name, "
+            f"{q1} AS q1, {q2} AS q2, {person} AS person, {machine} AS machine, {start} AS start_time "
+            f"FROM {journal_source(table, include_archive=history)} WHERE request_number = %s"
         )
-    return cards
-
-# ── Фінальний контроль якості
-def build_final_quality_products(page: ft.Page, req: str) -> list[ft.Control]:
-    log(f"Fetching final_quality data for {req}", tag="monitoring_cards")
-    rows = db_fetch(
-        """
-        SELECT article_code, product_name, checked_quantity, accepted_quantity, inspector_name
-        FROM final_quality
-        WHERE request_number = %s
-        """,
-        (req,)
-    )
-    cards: list[ft.Control] = []
+    log(f"Fetching request snapshot for {req} ({len(stages)} stages)", tag="monitoring_cards")
+    rows = db_fetch(" UNION ALL ".join(parts) + " ORDER BY ord, id", (req,) * len(stages))
     for r in rows:
-        checked = r["checked_quantity"] or 0
-        accepted = r["accepted_quantity"] or 0
+        out[r["stage"]].append(r)
+    return out
+
+
+# ─────────── рендер карток за описом стадії ───────────
+def _pct(part: int, whole: int) -> float:
+    return (part * 100 / whole) if whole else 0
+
+
+def _lines_casting(r: dict) -> list[str]:
+    qty, defect = r["q1"] or 0, r["q2"] or 0
+    return [
+        f"К-сть: {qty}  Брак: {defect} ({_pct(defect, qty):.1f}%)",
+        f"Гарні: {qty - defect}",
+        f"Оператор: {r.get('person') or '-'}  Станок: {r.get('machine') or '-'}",
+    ]
+
+
+def _lines_drying(r: dict) -> list[str]:
+    start = r.get("start_time")
+    return [
+        f"К-сть: {r['q1']}",
+        f"Оператор: {r.get('person') or '-'}",
+        f"Старт: {start.strftime('%H:%M') if start else 'не стартовано'}",
+    ]
+
+
+def _lines_quality(person_label: str):
+    def _lines(r: dict) -> list[str]:
+        checked, accepted = r["q1"] or 0, r["q2"] or 0
         defect = checked - accepted
-        pct = (defect * 100 / checked) if checked else 0
-        cards.append(
-            ft.Container(
-                content=ft.Column([
-                    ft.Text(r["article_code"], weight="bold"),
-                    ft.Text(r.get("product_name","")),
-                    ft.Text(f"Перевірено: {checked}  Прийнято: {accepted}  Брак: {defect} ({pct:.1f}%)"),
-                    ft.Text(f"Інспектор: {r.get('inspector_name','-')}"),
-                ], tight=True),
-                padding=10,
-                margin=ft.margin.all(5),
-                bgcolor="#1f1f2b",
-                border_radius=6,
-            )
+        return [
+            r.get("product_name") or "",
+            f"Перевірено: {checked}  Прийнято: {accepted}  Брак: {defect} ({_pct(defect, checked):.1f}%)",
+            f"{person_label}: {r.get('person') or '-'}",
+        ]
+    return _lines
+
+
+def _lines_processed(label: str):
+    def _lines(r: dict) -> list[str]:
+        proc, defect = r["q1"] or 0, r["q2"] or 0
+        return [
+            r.get("product_name") or "",
+            f"{label}: {proc}  Брак: {defect} ({_pct(defect, proc):.1f}%)  Гарні: {proc - defect}",
+            f"Оператор: {r.get('person') or '-'}",
+        ]
+    return _lines
+
+
+CARD_LINES = {
+    "casting":         _lines_casting,
+    "drying":          _lines_drying,
+    "casting_quality": _lines_quality("Контролер"),
+    "trimming":        _lines_processed("Оброблено"),
+    "cutting":         _lines_processed("Різка"),
+    "cleaning":        _lines_processed("Зачистка"),
+    "final_quality":   _lines_quality("Інспектор"),
+}
+
+
+def render_stage_cards(stage: str, rows: list[dict]) -> list[ft.Control]:
+    lines = CARD_LINES[stage]
+    return [
+        ft.Container(
+            content=ft.Column(
+                [ft.Text(r["article_code"], weight="bold"), *(ft.Text(t) for t in lines(r))],
+                tight=True,
+            ),
+            padding=10,
+            margin=ft.margin.all(5),
+            bgcolor="#1f1f2b",
+            border_radius=6,
         )
-    return cards
+        for r in rows
+    ]
+
+
+def build_request_breakdown(page: ft.Page, req: str, history: bool = False) -> dict[str, list[ft.Control]]:
+    """Картки всіх стадій заявки — один запит замість семи."""
+    snapshot = load_request_snapshot(req, history=history)
+    return {stage: render_stage_cards(stage, rows) for stage, rows in snapshot.items()}
+
+
+def _stage_builder(stage: str):
+    def _build(page: ft.Page, req: str, snapshot: dict[str, list[dict]] | None = None,
+               history: bool = False) -> list[ft.Control]:
+        if snapshot is None:
+            snapshot = load_request_snapshot(req, [stage], history=history)
+        return render_stage_cards(stage, snapshot.get(stage, []))
+    _build.__name__ = f"build_{stage}_products"
+    return _build
+
+
+# Сумісні точки входу: з готовим snapshot не роблять жодного запиту
+build_casting_products         = _stage_builder("casting")
+build_drying_products          = _stage_builder("drying")
+build_casting_quality_products = _stage_builder("casting_quality")
+build_trimming_products        = _stage_builder("trimming")
+build_cutting_products         = _stage_builder("cutting")
+build_cleaning_products        = _stage_builder("cleaning")
+build_final_quality_products   = _stage_builder("final_quality")
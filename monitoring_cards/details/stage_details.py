@@ -0,0 +1,256 @@
+# monitoring_cards/details/stage_details.py
+"""
+Деталі етапу для картки моніторингу — один постачальник для всіх стадій.
+
+Діалог спершу показує зведення по артикулах (один згрупований запит:
+партій, к-сть, брак, хороші), а окремі партії артикула підвантажуються
+лише на вимогу — сторінками по PAGE_SIZE записів. Так деталі великої
+заявки не будують тисячі рядків одразу.
+
+    show_stage_details(page, "casting", "1042")
+"""
+import flet as ft
+
+from database.db_manager import db_fetch
+from database.journal_archive import is_request_closed, journal_source
+from utils.logger import log
+
+GREEN = "#10B981"
+RED   = "#EF4444"
+PAGE_SIZE = 50
+
+# stage → таблиця, вирази к-сті/браку/хороших, ПІБ, станок (якщо є)
+STAGE_DETAILS: dict[str, dict] = {
+    "casting": {
+        "title": "Лиття", "table": "casting",
+        "qty": "quantity", "defect": "COALESCE(defect_quantity,0)",
+        "good": "quantity - COALESCE(defect_quantity,0)",
+        "person": "operator_name", "person_label": "Робітник", "machine": "machine_number",
+        "qty_label": "К-сть",
+    },
+    "drying": {
+        "title": "Сушка", "table": "drying",
+        "qty": "qty", "defect": "0", "good": "qty",
+        "person": "operator_name", "person_label": "Робітник", "machine": None,
+        "qty_label": "К-сть",
+    },
+    "casting_quality": {
+        "title": "КЯ лиття", "table": "casting_quality",
+        "qty": "checked_quantity", "defect": "GREATEST(checked_quantity - accepted_quantity, 0)",
+        "good": "accepted_quantity",
+        "person": "controller_name", "person_label": "Контролер", "machine": None,
+        "qty_label": "Перевірено",
+    },
+    "trimming": {
+        "title": "Обрізка", "table": "trimming",
+        "qty": "processed_quantity", "defect": "COALESCE(defect_quantity,0)",
+        "good": "GREATEST(processed_quantity - COALESCE(defect_quantity,0), 0)",
+        "person": "operator_name", "person_label": "Робітник", "machine": None,
+        "qty_label": "К-сть",
+    },
+    "cutting": {
+        "title": "Різка", "table": "cutting",
+        "qty": "processed_quantity", "defect": "COALESCE(defect_quantity,0)",
+        "good": "GREATEST(processed_quantity - COALESCE(defect_quantity,0), 0)",
+        "person": "operator_name", "person_label": "Робітник", "machine": None,
+        "qty_label": "К-сть",
+    },
+    "cleaning": {
+        "title": "Зачистка", "table": "cleaning",
+        "qty": "processed_quantity", "defect": "COALESCE(defect_quantity,0)",
+        "good": "GREATEST(processed_quantity - COALESCE(defect_quantity,0), 0)",
+        "person": "operator_name", "person_label": "Робітник", "machine": None,
+        "qty_label": "К-сть",
+    },
+    "final_quality": {
+        "title": "Фінальний КЯ", "table": "final_quality",
+        "qty": "checked_quantity", "defect": "GREATEST(checked_quantity - accepted_quantity, 0)",
+        "good": "accepted_quantity",
+        "person": "inspector_name", "person_label": "Інспектор", "machine": None,
+        "qty_label": "Перевірено",
+    },
+}
+
+
+# ───────────────────────── дані ─────────────────────────
+def stage_summary(stage: str, request_number: str, history: bool = False) -> list[dict]:
+    """
+    Зведення по артикулах заявки: article_code, product_name, batches, qty, defect, good.
+    history=True — разом з архівом (закрита заявка).
+    """
+    s = STAGE_DETAILS[stage]
+    return db_fetch(
+        f"""
+        SELECT article_code,
+               MAX(product_name)            AS product_name,
+               COUNT(*)                     AS batches,
+               COALESCE(SUM({s['qty']}),0)    AS qty,
+               COALESCE(SUM({s['defect']}),0) AS defect,
+               COALESCE(SUM({s['good']}),0)   AS good
+          FROM {journal_source(s['table'], include_archive=history)}
+         WHERE request_number = %s
+         GROUP BY article_code
+         ORDER BY article_code
+        """,
+        (request_number,),
+    )
+
+
+def stage_batches(stage: str, request_number: str, article_code: str,
+                  limit: int = PAGE_SIZE, offset: int = 0, history: bool = False) -> tuple[list[dict], bool]:
+    """Сторінка окремих записів артикула (від старіших до новіших) і чи є наступна."""
+    s = STAGE_DETAILS[stage]
+    machine = f"{s['machine']} AS machine" if s["machine"] else "NULL AS machine"
+    rows = db_fetch(
+        f"""
+        SELECT id, {s['qty']} AS qty, {s['defect']} AS defect, {s['good']} AS good,
+               {s['person']} AS person, {machine}, created_at
+          FROM {journal_source(s['table'], include_archive=history)}
+         WHERE request_number = %s AND article_code = %s
+         ORDER BY id
+         LIMIT %s OFFSET %s
+        """,
+        (request_number, article_code, int(limit) + 1, int(offset)),
+    )
+    return rows[:limit], len(rows) > limit
+
+
+# ───────────────────────── UI ─────────────────────────
+def _pct(defect: int, qty: int) -> str:
+    return f"{round(defect / qty * 100) if qty else 0} %"
+
+
+def _summary_rows(stage: str, rows: list[dict], on_open) -> list[ft.Control]:
+    s = STAGE_DETAILS[stage]
+    header = ft.Row(
+        [
+            ft.Text("Артикул", weight="bold", expand=2),
+            ft.Text("Найменування", weight="bold", expand=3),
+            ft.Text("Партій", weight="bold", expand=1),
+            ft.Text(s["qty_label"], weight="bold", expand=1),
+            ft.Text("Брак", weight="bold", expand=1),
+            ft.Text("% Браку", weight="bold", expand=1),
+            ft.Text("Хороші", weight="bold", expand=1),
+            ft.Text("", expand=1),
+        ],
+        spacing=12,
+    )
+    items: list[ft.Control] = [header]
+    for r in rows:
+        qty, defect, good = int(r["qty"] or 0), int(r["defect"] or 0), int(r["good"] or 0)
+        items.append(
+            ft.Row(
+                [
+                    ft.Text(r["article_code"], expand=2),
+                    ft.Text(r["product_name"] or "—", expand=3),
+                    ft.Text(str(r["batches"]), expand=1),
+                    ft.Text(str(qty), expand=1),
+                    ft.Text(str(defect), expand=1, color=RED),
+                    ft.Text(_pct(defect, qty), expand=1, color=RED),
+                    ft.Text(str(good), expand=1, color=GREEN),
+                    ft.TextButton("Партії", expand=1,
+                                  on_click=lambda e, a=r["article_code"]: on_open(a)),
+                ],
+                spacing=12,
+            )
+        )
+    if not rows:
+        items.append(ft.Text("Немає даних"))
+    return items
+
+
+def _batch_rows(stage: str, rows: list[dict]) -> list[ft.Control]:
+    s = STAGE_DETAILS[stage]
+    header = ft.Row(
+        [
+            ft.Text("ID", weight="bold", expand=1),
+            ft.Text(s["qty_label"], weight="bold", expand=1),
+            ft.Text("Брак", weight="bold", expand=1),
+            ft.Text("% Браку", weight="bold", expand=1),
+            ft.Text("Хороші", weight="bold", expand=1),
+            ft.Text(s["person_label"], weight="bold", expand=2),
+            ft.Text("Станок", weight="bold", expand=1),
+            ft.Text("Створено", weight="bold", expand=2),
+        ],
+        spacing=12,
+    )
+    items: list[ft.Control] = [header]
+    for r in rows:
+        qty, defect, good = int(r["qty"] or 0), int(r["defect"] or 0), int(r["good"] or 0)
+        created = r.get("created_at")
+        items.append(
+            ft.Row(
+                [
+                    ft.Text(str(r["id"]), expand=1),
+                    ft.Text(str(qty), expand=1),
+                    ft.Text(str(defect), expand=1, color=RED),
+                    ft.Text(_pct(defect, qty), expand=1, color=RED),
+                    ft.Text(str(good), expand=1, color=GREEN),
+                    ft.Text(r.get("person") or "—", expand=2),
+                    ft.Text(r.get("machine") or "—", expand=1),
+                    ft.Text(created.strftime("%d.%m.%Y %H:%M") if created else "—", expand=2),
+                ],
+                spacing=12,
+            )
+        )
+    if not rows:
+        items.append(ft.Text("Немає даних"))
+    return items
+
+
+def show_stage_details(page: ft.Page, stage: str, request_number: str) -> None:
+    s = STAGE_DETAILS[stage]
+    log(f"[{stage}_details] Open details for {request_number}", tag="monitoring_cards")
+
+    title = ft.Text(f"{s['title']} — Деталі заявки №{request_number}")
+    body = ft.Column(tight=True, scroll=ft.ScrollMode.AUTO)
+    nav = ft.Row(alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
+    state = {"article": None, "offset": 0}
+    # журнали закритої заявки могли вже переїхати в архів
+    history = is_request_closed(request_number)
+
+    def show_summary(_=None):
+        state.update(article=None, offset=0)
+        title.value = f"{s['title']} — Деталі заявки №{request_number}"
+        body.controls = _summary_rows(stage, stage_summary(stage, request_number, history), open_article)
+        nav.controls = []
+        page.update()
+
+    def open_article(article_code: str, offset: int = 0):
+        state.update(article=article_code, offset=offset)
+        rows, has_more = stage_batches(stage, request_number, article_code, PAGE_SIZE, offset, history)
+        title.value = f"{s['title']} — №{request_number}, {article_code}"
+        body.controls = _batch_rows(stage, rows)
+        first = offset + 1 if rows else 0
+        nav.controls = [
+            ft.TextButton("← До зведення", on_click=show_summary),
+            ft.Row(
+                [
+                    ft.IconButton(ft.icons.CHEVRON_LEFT, disabled=offset == 0,
+                                  on_click=lambda e: open_article(article_code, max(0, offset - PAGE_SIZE))),
+                    ft.Text(f"{first}–{offset + len(rows)}"),
+                    ft.IconButton(ft.icons.CHEVRON_RIGHT, disabled=not has_more,
+                                  on_click=lambda e: open_article(article_code, offset + PAGE_SIZE)),
+                ],
+                spacing=4,
+            ),
+        ]
+        page.update()
+
+    dlg = ft.AlertDialog(
+        modal=True,
+        title=title,
+        content=ft.Container(ft.Column([nav, body], tight=True), width=850, height=520, padding=16),
+        actions=[ft.TextButton("Закрити", on_click=lambda e: _close(page, dlg))],
+        actions_alignment="end",
+    )
+    page.dialog = dlg
+    if dlg not in page.overlay:
+        page.overlay.append(dlg)
+    dlg.open = True
+    show_summary()
+
+
+def _close(page: ft.Page, dlg: ft.AlertDialog) -> None:
+    dlg.open = False
+    page.update()
@@ -2,11 +2,16 @@
 # -*- coding: utf-8 -*-
 
 import asyncio, threading
+from concurrent.futures import Future
 import flet as ft
 from typing import List, Optional
 
 from database.db_manager import db_fetch
+from database.journal_archive import journal_source
+from database.result_cache import memoize
+from monitoring_cards import SNAPSHOT_SOURCES, load_request_snapshot
 from utils.logger import log
+from utils.ui_updates import schedule_update
 
 # Деталі по етапах
 from monitoring_cards.details.casting_details import show_casting_details
@@ -28,6 +33,10 @@ STAGES = [
     ("Фінальний К/Я", "final_quality",   "final_quality",   "accepted_quantity",   None,                 "final_quality-icons.png"),
 ]
 
+# агрегати моніторингу спільні для всіх сесій (database/result_cache):
+# скидаються записом у будь-яку з цих таблиць або через RESULT_CACHE_TTL
+AGGREGATE_TABLES = ("casting_requests", "product_base", *(table for _, _, table, _, _, _ in STAGES))
+
 # лишено для сумісності (не використовуємо «Брак» у відображенні)
 DEFECT_COLS = {
     "casting":         "defect_quantity",
@@ -54,6 +63,10 @@ class _NullPage:
             return None
         return _noop
 
+def _src(table: str, history: bool = False) -> str:
+    """Журнал стадії; з history — разом з архівом (лише для закритих заявок)."""
+    return journal_source(table, include_archive=history)
+
 def _safe_sum(sql: str, params: tuple) -> int:
     try:
         row = db_fetch(sql, params)[0]
@@ -92,34 +105,26 @@ def _metric_col(label: str, value: str, color_value: str) -> ft.Column:
         ],
     )
 
-def _articles_for_stage(request_number: str, flag: Optional[str]) -> list[dict]:
-    """Повертає список виробів у заявці для даного етапу (лише код+назва, без кількостей)."""
-    if flag:
-        return db_fetch(
-            """
-            SELECT DISTINCT cr.article_code AS code, COALESCE(pb.name,'') AS name
-              FROM casting_requests cr
-              JOIN product_base pb ON pb.article_code = cr.article_code
-             WHERE cr.request_number=%s AND pb.""" + flag + """=1
-             ORDER BY code
-            """,
-            (request_number,),
-        )
-    else:
-        return db_fetch(
-            """
-            SELECT DISTINCT cr.article_code AS code, COALESCE(pb.name,'') AS name
-              FROM casting_requests cr
-              LEFT JOIN product_base pb ON pb.article_code = cr.article_code
-             WHERE cr.request_number=%s
-             ORDER BY code
-            """,
-            (request_number,),
-        )
+def _request_items(request_number: str) -> list[dict]:
+    """Позиції заявки з назвою, прапорцями стадій і is_closed — один запит на всі картки."""
+    flags = "".join(f", pb.{flag} AS `{flag}`" for _, _, _, _, flag, _ in STAGES if flag)
+    return db_fetch(
+        f"""
+        SELECT cr.article_code AS code, cr.quantity, cr.is_closed, COALESCE(pb.name,'') AS name{flags}
+          FROM casting_requests cr
+          LEFT JOIN product_base pb ON pb.article_code = cr.article_code
+         WHERE cr.request_number=%s
+         ORDER BY cr.article_code
+        """,
+        (request_number,),
+    )
 
-def _plain_articles_block(request_number: str, flag: Optional[str]) -> ft.Column:
+def _fact_col(key: str, expr: str) -> str:
+    """Колонка знімка (q1/q2), у яку load_request_snapshot кладе вираз «факту» стадії."""
+    return "q1" if SNAPSHOT_SOURCES[key][1] == expr else "q2"
+
+def _plain_articles_block(items: list[dict]) -> ft.Column:
     """Текстовий список під заголовком 'Артикул\\Найменування' — без підв’язок і кількостей."""
-    items = _articles_for_stage(request_number, flag)
     rows: List[ft.Control] = [
         ft.Text("Артикул\\Найменування", size=12, color="#A0A0B0", no_wrap=True),
     ]
@@ -151,11 +156,31 @@ def _ensure_async_loop():
     threading.Thread(target=ASYNC_LOOP.run_forever, daemon=True).start()
     return ASYNC_LOOP
 
+DRYING_LEFT_SQL = (
+    "SELECT MIN(TIMESTAMPDIFF(MINUTE,NOW(),end_time)) AS m "
+    "FROM drying WHERE end_time IS NOT NULL AND NOW() < end_time"
+)
+
+# один таймер на сесію: перебудова деталей (зміни даних) або вихід з них зупиняє попередній
+_TIMERS: dict[int, Future] = {}
+_TIMERS_LOCK = threading.Lock()
+
+def stop_drying_timer(page) -> None:
+    """Зупинити таймер «Сушка» у деталях заявки цієї сесії."""
+    with _TIMERS_LOCK:
+        fut = _TIMERS.pop(id(page), None)
+    if fut is not None:
+        fut.cancel()
+
+def _start_drying_timer(page, coro) -> None:
+    stop_drying_timer(page)
+    fut = asyncio.run_coroutine_threadsafe(coro, _ensure_async_loop())
+    with _TIMERS_LOCK:
+        _TIMERS[id(page)] = fut
+
+@memoize(tables=("drying",))
 def _drying_min_remaining_minutes() -> Optional[int]:
-    row = db_fetch(
-        "SELECT MIN(TIMESTAMPDIFF(MINUTE,NOW(),end_time)) AS m "
-        "FROM drying WHERE end_time IS NOT NULL AND NOW() < end_time"
-    )
+    row = db_fetch(DRYING_LEFT_SQL)
     return row[0]["m"] if row and row[0]["m"] is not None else None
 
 def _fmt_left(mins: Optional[int]) -> str:
@@ -167,14 +192,16 @@ def _fmt_left(mins: Optional[int]) -> str:
 
 
 # ───── public API ─────
-def calculate_progress(request_number: str) -> int:
+@memoize(tables=AGGREGATE_TABLES)
+def calculate_progress(request_number: str, history: bool = False) -> int:
     total = _safe_sum("SELECT SUM(quantity) AS v FROM casting_requests WHERE request_number=%s", (request_number,))
     if total == 0:
         return 0
-    accepted = _safe_sum("SELECT SUM(accepted_quantity) AS v FROM final_quality WHERE request_number=%s", (request_number,))
+    accepted = _safe_sum(f"SELECT SUM(accepted_quantity) AS v FROM {_src('final_quality', history)} WHERE request_number=%s", (request_number,))
     return min(int(accepted / total * 100), 100)
 
-def get_active_stages(request_number: str) -> list[str]:
+@memoize(tables=AGGREGATE_TABLES)
+def get_active_stages(request_number: str, history: bool = False) -> list[str]:
     active: list[str] = []
     for name, key, table, expr, flag, _ in STAGES:
         if flag:
@@ -189,12 +216,73 @@ def get_active_stages(request_number: str) -> list[str]:
             )
         else:
             need = _safe_sum("SELECT SUM(quantity) AS v FROM casting_requests WHERE request_number=%s", (request_number,))
-        good = _safe_sum(f"SELECT SUM({expr}) AS v FROM {table} WHERE request_number=%s", (request_number,))
+        good = _safe_sum(f"SELECT SUM({expr}) AS v FROM {_src(table, history)} WHERE request_number=%s", (request_number,))
         if need > 0 and good < need:
             active.append(name)
     return active
 
 
+@memoize(tables=AGGREGATE_TABLES)
+def requests_overview(request_numbers: tuple[str, ...] | None = None, *, closed: bool = False) -> list[dict]:
+    """
+    calculate_progress() + get_active_stages() для всіх заявок двома запитами
+    (замість ~15 запитів на кожну заявку). Порядок — request_number DESC.
+    request_numbers — лише ці заявки (оновлення після зміни, database/changes).
+    closed=False — незакриті заявки, факт лише з робочих журналів;
+    closed=True  — закриті (усі позиції is_closed=1), факт разом з архівом.
+    Рядок: request_number, pct, stages. Результат кешується для всіх сесій — не змінювати.
+    """
+    flag_cols = [flag for _, _, _, _, flag, _ in STAGES if flag]
+    only, params = "", ()
+    if request_numbers:
+        only = " WHERE request_number IN (" + ",".join(["%s"] * len(request_numbers)) + ")"
+        params = tuple(request_numbers)
+    good_only = only
+    if closed and not request_numbers:
+        # архів читаємо лише для закритих заявок
+        good_only = (" WHERE request_number IN (SELECT request_number FROM casting_requests"
+                     " GROUP BY request_number HAVING MIN(is_closed) = 1)")
+    need_rows = db_fetch(
+        "SELECT cr.request_number AS rn, SUM(cr.quantity) AS total"
+        + "".join(
+            f", SUM(CASE WHEN pb.{flag}=1 THEN cr.quantity ELSE 0 END) AS `{flag}`" for flag in flag_cols
+        )
+        + """
+          FROM casting_requests cr
+          LEFT JOIN product_base pb ON pb.article_code = cr.article_code
+        """
+        + only.replace("request_number", "cr.request_number")
+        + """
+         GROUP BY cr.request_number
+        HAVING MIN(cr.is_closed) = %s
+         ORDER BY cr.request_number DESC
+        """,
+        params + (int(closed),),
+    )
+    good_rows = db_fetch(
+        " UNION ALL ".join(
+            f"SELECT '{key}' AS k, request_number AS rn, SUM({expr}) AS v FROM {_src(table, closed)}{good_only} GROUP BY request_number"
+            for _, key, table, expr, _, _ in STAGES
+        ),
+        params * len(STAGES),
+    )
+    good: dict[tuple[str, str], int] = {(r["k"], r["rn"]): int(r["v"] or 0) for r in good_rows}
+
+    out: list[dict] = []
+    for r in need_rows:
+        rn = r["rn"]
+        total = int(r["total"] or 0)
+        accepted = good.get(("final_quality", rn), 0)
+        pct = min(int(accepted / total * 100), 100) if total else 0
+        stages = []
+        for name, key, _, _, flag, _ in STAGES:
+            need = int((r[flag] if flag else r["total"]) or 0)
+            if need > 0 and good.get((key, rn), 0) < need:
+                stages.append(name)
+        out.append({"request_number": rn, "pct": pct, "stages": stages})
+    return out
+
+
 def build_all_stage_cards(request_number: Optional[str] = None, page: Optional[ft.Page] = None) -> List[ft.Container]:
     req = (request_number or "").strip()
     pg: ft.Page = page if page is not None else _NullPage()
@@ -203,31 +291,31 @@ def build_all_stage_cards(request_number: Optional[str] = None, page: Optional[f
 
     log(f"[monitoring_cards] Building stage cards for {req}")
     cards: List[ft.Container] = []
+    if page is not None:
+        stop_drying_timer(page)
+
+    # потреба і вироби — з позицій заявки, факт — зі знімка всіх стадій (UNION ALL):
+    # два запити на всі картки замість трьох на кожну
+    items = _request_items(req)
+    # архів — лише для закритої заявки (її журнали могли вже туди переїхати)
+    history = bool(items) and all(r["is_closed"] for r in items)
+    snapshot = load_request_snapshot(req, history=history) if items else {}
 
     for name, key, table, expr, flag, icon in STAGES:
         # потреба
-        if flag:
-            need = _safe_sum(
-                f"""
-                SELECT SUM(cr.quantity) AS v
-                FROM casting_requests cr
-                JOIN product_base pb ON pb.article_code = cr.article_code
-                WHERE cr.request_number=%s AND pb.{flag}=1
-                """,
-                (req,),
-            )
-        else:
-            need = _safe_sum("SELECT SUM(quantity) AS v FROM casting_requests WHERE request_number=%s", (req,))
+        stage_items = [r for r in items if not flag or r[flag] == 1]
+        need = sum(int(r["quantity"] or 0) for r in stage_items)
         if need == 0:
             continue
 
         # факт
-        good = _safe_sum(f"SELECT SUM({expr}) AS v FROM {table} WHERE request_number=%s", (req,))
+        col = _fact_col(key, expr)
+        good = sum(int(r[col] or 0) for r in snapshot.get(key, ()))
         pct = min(int((good / need) * 100), 100) if need else 0
         bar_color = "#10B981" if pct >= 80 else "#F59E0B" if pct >= 50 else "#EF4444"
 
         # блоки: простий список виробів + метрики
-        products_col = _plain_articles_block(req, flag)
+        products_col = _plain_articles_block(list({r["code"]: r for r in stage_items}.values()))
         metrics_col  = _metric_col("Потрібно\\Факт", f"{need}\\{good}", "#22D3EE")
 
         # таймер для «Сушка»
@@ -242,17 +330,16 @@ def build_all_stage_cards(request_number: Optional[str] = None, page: Optional[f
                 while True:
                     mm = _drying_min_remaining_minutes()
                     tv = _fmt_left(mm)
-                    timer_lbl.value = tv
-                    timer_lbl.color = "#10B981" if tv == "Готово" else "#F59E0B"
-                    try:
-                        pg.update()
-                    except Exception:
-                        pass
+                    if tv != timer_lbl.value:
+                        timer_lbl.value = tv
+                        timer_lbl.color = "#10B981" if tv == "Готово" else "#F59E0B"
+                        schedule_update(pg, timer_lbl)
                     if tv == "Готово":
                         return
                     await asyncio.sleep(60)
 
-            asyncio.run_coroutine_threadsafe(_tick(), _ensure_async_loop())
+            if page is not None:
+                _start_drying_timer(page, _tick())
             timer_area = ft.Container(content=timer_lbl, padding=ft.padding.only(bottom=6))
 
         # картка
@@ -1,8 +1,12 @@
 # pages/casting.py
 import flet as ft
 import datetime, sys
-from database.db_manager import connect_db
+from database import changes
+from database.db_manager import connect_db, db_insert_batches
+from database.db_manager import db_exec_many as db_exec    # executemany: db_exec(sql, [params, ...])
 import compat
+from components.journal_table import JournalTable
+from utils.ui_updates import schedule_update
 
 
 def log(m):
@@ -24,11 +28,23 @@ def db_fetch(sql, p=None):
         return cu.fetchall()
 
 
-def db_exec(sql, seq):
-    with connect_db() as cn:
-        cu = cn.cursor()
-        cu.executemany(sql, seq)
-        cn.commit()
+# «потрібно / виготовлено» по всіх позиціях заявки (план перевіряє tests/test_explain.py)
+NEED_SQL = """
+            SELECT cr.article_code,
+                   IFNULL(pb.name,'') AS name,
+                   cr.quantity AS need_qty,
+                   COALESCE(m.made, 0) AS made
+              FROM casting_requests cr
+         LEFT JOIN product_base pb ON pb.article_code=cr.article_code
+         LEFT JOIN (
+                   SELECT article_code, SUM(quantity) AS made
+                     FROM casting
+                    WHERE request_number=%s
+                 GROUP BY article_code
+                   ) m ON m.article_code=cr.article_code
+             WHERE cr.request_number=%s
+          ORDER BY cr.id
+            """
 
 
 # ─────────────────────────── View ─────────────────
@@ -79,7 +95,32 @@ def view(page: ft.Page, request_no: str = ""):
     )
     btn_save = ft.ElevatedButton("Зберегти", disabled=True)
 
+    # ─── пакетне введення: рядки накопичуються локально і пишуться одним INSERT
+    sw_batch = ft.Switch(label="Пакетне введення", value=False)
+    staged = []  # dict(table, request_number, article_code, machine_number, quantity, defect_quantity, operator_name)
+    staged_table = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("Заявка")),
+            ft.DataColumn(ft.Text("Артикул")),
+            ft.DataColumn(ft.Text("Станок")),
+            ft.DataColumn(ft.Text("Цикли")),
+            ft.DataColumn(ft.Text("Брак")),
+            ft.DataColumn(ft.Text("Робітник")),
+            ft.DataColumn(ft.Text("")),
+        ],
+        rows=[],
+    )
+    btn_commit = ft.ElevatedButton("Записати пакет", icon=ft.icons.SAVE, disabled=True)
+    btn_clear = ft.TextButton("Очистити", disabled=True)
+    batch_box = ft.Column(
+        [staged_table, ft.Row([btn_commit, btn_clear], spacing=10)],
+        visible=False,
+        spacing=4,
+    )
+
     editing_id = None
+    # quantity of the record being edited (to correct the made/need cache)
+    editing_qty = {"value": 0}
     # when editing, record which table to update ('casting','casting_test','casting_no_request')
     editing_table = {"value": "casting"}
     confirm_dlg = ft.AlertDialog(modal=True)
@@ -156,6 +197,68 @@ def view(page: ft.Page, request_no: str = ""):
         refresh_table()
         page.update()
 
+    # ─── «виготовлено / потрібно» по заявці ───────────
+    # Один згрупований запит на всю заявку; після збереження/видалення
+    # кеш коригується на різницю кількостей, без повторного запиту.
+    # Лиття цієї заявки з інших сесій / робочих місць (database/changes)
+    # перечитує кеш тим самим запитом; свої записи (own_writes) — ні.
+    need_cache = {"req": None, "rows": {}}
+
+    def own_writes(fn):
+        """Обробник, чиї записи вже враховані в need_cache (adjust_made)."""
+        def _wrapped(*a, **k):
+            with changes.written_by(page):
+                return fn(*a, **k)
+        return _wrapped
+
+    def _on_need_changes(batch):
+        req_no = need_cache["req"]
+        if mode["value"] != "req" or not req_no or dd_req.value != req_no:
+            return
+        rows = db_fetch(NEED_SQL, (req_no, req_no))     # у потоці watcher-а
+
+        async def _apply():
+            # контроли змінюємо лише в циклі сторінки; заявку могли вже перемкнути
+            if need_cache["req"] != req_no or dd_req.value != req_no:
+                return
+            _set_need(req_no, rows)
+            fill_articles()
+            schedule_update(page, dd_art)
+
+        page.run_task(_apply)
+
+    def _set_need(req_no, rows):
+        need_cache["req"] = req_no
+        need_cache["rows"] = {}
+        for r in rows:
+            r["made"] = int(r["made"] or 0)
+            need_cache["rows"].setdefault(r["article_code"], r)
+        return need_cache["rows"]
+
+    def load_need(req_no):
+        rows = db_fetch(NEED_SQL, (req_no, req_no))
+        if need_cache["req"] != req_no:
+            changes.watch(page, "casting.need", _on_need_changes, skip_own=True,
+                          tables=("casting", "casting_requests"), request_number=req_no)
+        return _set_need(req_no, rows)
+
+    def adjust_made(req_no, art, delta):
+        """Врахувати зміну кількості лиття у кеші (якщо він про цю заявку)."""
+        if need_cache["req"] != req_no:
+            return
+        r = need_cache["rows"].get(art)
+        if r is not None:
+            r["made"] += delta
+
+    def fill_articles():
+        rows = [r for r in need_cache["rows"].values() if r["made"] < r["need_qty"]]
+        options = [ft.dropdown.Option(f"{r['article_code']} ({r['name']})") for r in rows]
+        # вибраний (редагований) артикул лишається, навіть якщо план по ньому вже виконано
+        if dd_art.value and not any(o.value == dd_art.value for o in options):
+            options.append(ft.dropdown.Option(dd_art.value))
+        dd_art.options = options
+        dd_art.disabled = not bool(options)
+
     # ─── обробка зміни заявки ─────────────────────────
     def on_req_change(e):
         reset_form(full=True)
@@ -166,29 +269,8 @@ def view(page: ft.Page, request_no: str = ""):
             page.update()
             return
 
-        rows = db_fetch(
-            """
-            SELECT cr.article_code,
-                   IFNULL(pb.name,'') AS name,
-                   cr.quantity AS need_qty,
-                   COALESCE(
-                     (SELECT SUM(quantity)
-                        FROM casting c
-                       WHERE c.request_number=cr.request_number
-                         AND c.article_code=cr.article_code),
-                     0
-                   ) AS made
-              FROM casting_requests cr
-         LEFT JOIN product_base pb ON pb.article_code=cr.article_code
-             WHERE cr.request_number=%s
-         HAVING made < need_qty
-            """,
-            (dd_req.value,),
-        )
-        dd_art.options = [
-            ft.dropdown.Option(f"{r['article_code']} ({r['name']})") for r in rows
-        ]
-        dd_art.disabled = not bool(rows)
+        load_need(dd_req.value)
+        fill_articles()
 
         # відображаємо таблицю по вибраній заявці
         refresh_table()
@@ -207,18 +289,14 @@ def view(page: ft.Page, request_no: str = ""):
 
         art = dd_art.value.split(" ", 1)[0]
         if mode["value"] == "req":
-            # fetch remaining quantity for request-based casting
-            info = db_fetch(
-                """
-                SELECT cr.quantity AS need_qty,
-                       COALESCE((SELECT SUM(quantity) FROM casting
-                                 WHERE request_number=%s AND article_code=%s),0) AS made
-                FROM casting_requests cr
-                WHERE cr.request_number=%s AND cr.article_code=%s
-                LIMIT 1
-                """,
-                (dd_req.value, art, dd_req.value, art),
-            )[0]
+            # remaining quantity comes from the per-request aggregate
+            if need_cache["req"] != dd_req.value:
+                load_need(dd_req.value)
+            info = need_cache["rows"].get(art)
+            if info is None:
+                tf_need.value = ""
+                page.update()
+                return
             tf_need.value = f"{info['need_qty']}  (вже виготовлено: {info['made']})"
         else:
             # in test/no_request modes there is no planned quantity
@@ -250,6 +328,7 @@ def view(page: ft.Page, request_no: str = ""):
         btn_save.disabled = True
 
     # ─── save record ────────────────────────────────
+    @own_writes
     def save_record(e):
         """
         Save a casting record.  Behaviour depends on the selected mode:
@@ -279,7 +358,12 @@ def view(page: ft.Page, request_no: str = ""):
             if mode["value"] == "req"
             else ("casting_test" if mode["value"] == "test" else "casting_no_request")
         )
+        if sw_batch.value and not editing_id:
+            stage_row(target_table, art, cycles, defect)
+            return
+        saved_id = None
         if editing_id and editing_table["value"] == target_table:
+            saved_id = editing_id
             # update existing record in appropriate table
             if target_table == "casting":
                 db_exec(
@@ -291,6 +375,7 @@ def view(page: ft.Page, request_no: str = ""):
                     """,
                     [(tf_worker.value, tf_machine.value, cycles, defect, editing_id)],
                 )
+                adjust_made(dd_req.value, art, cycles - editing_qty["value"])
             else:
                 # editing for test/no_request tables
                 db_exec(
@@ -305,7 +390,7 @@ def view(page: ft.Page, request_no: str = ""):
         else:
             # insert new record
             if target_table == "casting":
-                db_exec(
+                saved_id = db_exec(
                     """
                     INSERT INTO casting
                         (request_number, article_code, product_name,
@@ -325,9 +410,10 @@ def view(page: ft.Page, request_no: str = ""):
                         )
                     ],
                 )
+                adjust_made(dd_req.value, art, cycles)
             else:
                 # test or no_request: request_number is not stored
-                db_exec(
+                saved_id = db_exec(
                     f"""
                     INSERT INTO {target_table}
                         (article_code, product_name, quantity, defect_quantity, operator_name, machine_number)
@@ -343,18 +429,145 @@ def view(page: ft.Page, request_no: str = ""):
                     )],
                 )
         reset_form(full=True)
-        # refresh dropdowns or tables
+        # refresh dropdowns; the journal only re-reads the saved row
         if mode["value"] == "req":
-            on_req_change(None)
+            fill_articles()
         else:
             # reload article list for non-request modes
             load_products()
-            refresh_table()
+        if saved_id and target_table == current_table():
+            journal.refresh_one(saved_id)
+        else:
+            journal.reload()
         page.snack_bar = ft.SnackBar(ft.Text("Збережено"), open=True)
         page.update()
 
     btn_save.on_click = save_record
 
+    # ─── пакетне введення ────────────────────────────
+    def stage_row(target_table, art, cycles, defect):
+        """Додати рядок у локальний пакет; робітник/станок лишаються для наступного циклу."""
+        staged.append(
+            {
+                "table": target_table,
+                "request_number": dd_req.value if target_table == "casting" else None,
+                "article_code": art,
+                "machine_number": tf_machine.value,
+                "quantity": cycles,
+                "defect_quantity": defect,
+                "operator_name": tf_worker.value,
+            }
+        )
+        tf_cycles.value = ""
+        tf_defect.value = ""
+        render_staged()
+        page.update()
+
+    def render_staged():
+        staged_table.rows = [
+            ft.DataRow(
+                cells=[
+                    ft.DataCell(ft.Text(r["request_number"] or "—")),
+                    ft.DataCell(ft.Text(r["article_code"])),
+                    ft.DataCell(ft.Text(r["machine_number"] or "—")),
+                    ft.DataCell(ft.Text(str(r["quantity"]))),
+                    ft.DataCell(ft.Text(str(r["defect_quantity"]))),
+                    ft.DataCell(ft.Text(r["operator_name"] or "—")),
+                    ft.DataCell(
+                        ft.IconButton(
+                            ft.icons.CLOSE,
+                            tooltip="Прибрати з пакета",
+                            on_click=lambda e, i=i: unstage_row(i),
+                        )
+                    ),
+                ]
+            )
+            for i, r in enumerate(staged)
+        ]
+        btn_commit.text = f"Записати пакет ({len(staged)})" if staged else "Записати пакет"
+        btn_commit.disabled = not staged
+        btn_clear.disabled = not staged
+
+    def unstage_row(i):
+        if 0 <= i < len(staged):
+            staged.pop(i)
+        render_staged()
+        page.update()
+
+    def clear_staged(e=None):
+        staged.clear()
+        render_staged()
+        page.update()
+
+    def product_names(arts):
+        """Назви виробів одним запитом (замість підзапиту в кожному INSERT)."""
+        arts = sorted(set(arts))
+        if not arts:
+            return {}
+        rows = db_fetch(
+            f"SELECT article_code, name FROM product_base WHERE article_code IN ({','.join(['%s'] * len(arts))})",
+            tuple(arts),
+        )
+        names = {}
+        for r in rows:
+            names.setdefault(r["article_code"], r["name"])
+        return names
+
+    @own_writes
+    def commit_staged(e):
+        if not staged:
+            return
+        names = product_names(r["article_code"] for r in staged)
+        for r in staged:
+            r["product_name"] = names.get(r["article_code"])
+        by_table = {}
+        for r in staged:
+            by_table.setdefault(r["table"], []).append(r)
+        batches = []
+        for tbl, recs in by_table.items():
+            cols = ["article_code", "product_name", "quantity", "defect_quantity",
+                    "operator_name", "machine_number"]
+            if tbl == "casting":
+                cols = ["request_number"] + cols
+            batches.append((tbl, cols, [tuple(r[c] for c in cols) for r in recs]))
+        try:
+            # усі таблиці пакета — одна транзакція: або записано все, або нічого
+            for recs, ids in zip(by_table.values(), db_insert_batches(batches)):
+                for r, rid in zip(recs, ids):
+                    r["id"] = rid
+        except Exception as ex:
+            log(f"batch insert failed: {ex}")
+            page.snack_bar = ft.SnackBar(ft.Text(f"Пакет не записано: {ex}"), open=True)
+            page.update()
+            return
+
+        # журнал доповнюємо рядками з отриманими id — без повторного SELECT
+        for r in staged:
+            if not r.get("id"):
+                continue
+            if r["table"] == "casting":
+                adjust_made(r["request_number"], r["article_code"], r["quantity"])
+            if r["table"] == current_table() and (
+                r["table"] != "casting" or not dd_req.value or r["request_number"] == dd_req.value
+            ):
+                journal.upsert(r)
+        n = len(staged)
+        staged.clear()
+        render_staged()
+        if mode["value"] == "req":
+            fill_articles()
+        page.snack_bar = ft.SnackBar(ft.Text(f"Збережено записів: {n}"), open=True)
+        page.update()
+
+    def on_batch_toggle(e):
+        batch_box.visible = bool(sw_batch.value)
+        btn_save.text = "Додати в пакет" if sw_batch.value else "Зберегти"
+        page.update()
+
+    sw_batch.on_change = on_batch_toggle
+    btn_commit.on_click = commit_staged
+    btn_clear.on_click = clear_staged
+
     # ─── DataTable ───────────────────────────────────
     table = ft.DataTable(
         expand=True,
@@ -374,72 +587,85 @@ def view(page: ft.Page, request_no: str = ""):
         rows=[],
     )
 
-    def refresh_table():
-        table.rows.clear()
-        rows = []
+    def current_table():
+        return (
+            "casting"
+            if mode["value"] == "req"
+            else ("casting_test" if mode["value"] == "test" else "casting_no_request")
+        )
+
+    def make_row(r):
+        good = r["quantity"] - (r.get("defect_quantity") or 0)
+        perc = (
+            f"{(r.get('defect_quantity') or 0) * 100 / r['quantity']:.1f} %"
+            if r["quantity"]
+            else "0 %"
+        )
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(str(r["id"]))),
+                ft.DataCell(ft.Text(r.get("request_number", "—") or "—")),
+                ft.DataCell(ft.Text(r["article_code"])),
+                ft.DataCell(ft.Text(r.get("product_name", "—"))),
+                ft.DataCell(ft.Text(r.get("machine_number", "—"))),
+                ft.DataCell(ft.Text(str(r["quantity"]))),
+                ft.DataCell(ft.Text(str(r.get("defect_quantity") or 0))),
+                ft.DataCell(ft.Text(str(good))),
+                ft.DataCell(ft.Text(perc)),
+                ft.DataCell(ft.Text(r.get("operator_name", "—"))),
+                ft.DataCell(
+                    ft.Row(
+                        [
+                            ft.IconButton(
+                                ft.icons.EDIT,
+                                tooltip="Редагувати",
+                                on_click=lambda e, rec=r: start_edit(rec),
+                            ),
+                            ft.IconButton(
+                                ft.icons.DELETE,
+                                tooltip="Видалити",
+                                on_click=lambda e, rec=r: ask_delete(rec["id"], rec),
+                            ),
+                        ],
+                        spacing=4,
+                    )
+                ),
+            ]
+        )
+
+    def load_journal_rows():
         if mode["value"] == "req":
             # filter by request if provided, otherwise show latest 50
             if dd_req.value:
-                rows = db_fetch(
+                return db_fetch(
                     "SELECT * FROM casting WHERE request_number=%s ORDER BY id DESC",
                     (dd_req.value,),
                 )
-            else:
-                rows = db_fetch("SELECT * FROM casting ORDER BY id DESC LIMIT 50")
+            return db_fetch("SELECT * FROM casting ORDER BY id DESC LIMIT 50")
         elif mode["value"] == "test":
-            rows = db_fetch(
+            return db_fetch(
                 "SELECT *, NULL as request_number FROM casting_test ORDER BY id DESC LIMIT 50"
             )
-        else:
-            rows = db_fetch(
-                "SELECT *, NULL as request_number FROM casting_no_request ORDER BY id DESC LIMIT 50"
-            )
-        for r in rows:
-            good = r["quantity"] - (r.get("defect_quantity") or 0)
-            perc = (
-                f"{(r.get('defect_quantity') or 0) * 100 / r['quantity']:.1f} %"
-                if r["quantity"]
-                else "0 %"
-            )
-            table.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(str(r["id"]))),
-                        ft.DataCell(ft.Text(r.get("request_number", "—") or "—")),
-                        ft.DataCell(ft.Text(r["article_code"])),
-                        ft.DataCell(ft.Text(r.get("product_name", "—"))),
-                        ft.DataCell(ft.Text(r.get("machine_number", "—"))),
-                        ft.DataCell(ft.Text(str(r["quantity"]))),
-                        ft.DataCell(ft.Text(str(r.get("defect_quantity") or 0))),
-                        ft.DataCell(ft.Text(str(good))),
-                        ft.DataCell(ft.Text(perc)),
-                        ft.DataCell(ft.Text(r.get("operator_name", "—"))),
-                        ft.DataCell(
-                            ft.Row(
-                                [
-                                    ft.IconButton(
-                                        ft.icons.EDIT,
-                                        tooltip="Редагувати",
-                                        on_click=lambda e, rec=r: start_edit(rec),
-                                    ),
-                                    ft.IconButton(
-                                        ft.icons.DELETE,
-                                        tooltip="Видалити",
-                                        on_click=lambda e, rid=r["id"]: ask_delete(rid),
-                                    ),
-                                ],
-                                spacing=4,
-                            )
-                        ),
-                    ]
-                )
-            )
+        return db_fetch(
+            "SELECT *, NULL as request_number FROM casting_no_request ORDER BY id DESC LIMIT 50"
+        )
+
+    def load_journal_row(rid):
+        extra = "" if current_table() == "casting" else ", NULL as request_number"
+        rows = db_fetch(f"SELECT *{extra} FROM {current_table()} WHERE id=%s", (rid,))
+        return rows[0] if rows else None
+
+    journal = JournalTable(table, make_row, load_rows=load_journal_rows, load_one=load_journal_row)
+
+    def refresh_table():
+        journal.reload()
         page.update()
 
     # ---- edit from table ----
     def start_edit(rec):
         nonlocal editing_id
         editing_id = rec["id"]
+        editing_qty["value"] = int(rec["quantity"] or 0)
         # record which table the record comes from for update
         if mode["value"] == "req":
             editing_table["value"] = "casting"
@@ -455,7 +681,10 @@ def view(page: ft.Page, request_no: str = ""):
         dd_req.value = rec["request_number"]
         # update article dropdown depending on mode
         if mode["value"] == "req":
-            on_req_change(None)
+            # без on_req_change: він скидає форму, яку ми щойно заповнили
+            if need_cache["req"] != dd_req.value:
+                load_need(dd_req.value)
+            fill_articles()
             art_opt = f"{rec['article_code']} ({rec.get('product_name','')})"
             if not any(o.value == art_opt for o in dd_art.options):
                 dd_art.options.append(ft.dropdown.Option(art_opt))
@@ -470,10 +699,11 @@ def view(page: ft.Page, request_no: str = ""):
         page.update()
 
     # ---- delete row ----
-    record_to_del = {"id": None}
+    record_to_del = {"id": None, "rec": None}
 
-    def ask_delete(rid):
+    def ask_delete(rid, rec=None):
         record_to_del["id"] = rid
+        record_to_del["rec"] = rec
         confirm_dlg.title = ft.Text("Підтвердити видалення")
         confirm_dlg.content = ft.Text(f"Видалити запис id {rid}?")
         confirm_dlg.actions = [
@@ -490,6 +720,7 @@ def view(page: ft.Page, request_no: str = ""):
         confirm_dlg.open = True
         page.update()
 
+    @own_writes
     def close_confirm(ok):
         confirm_dlg.open = False
         page.update()
@@ -498,17 +729,22 @@ def view(page: ft.Page, request_no: str = ""):
             # delete from appropriate table based on mode
             if mode["value"] == "req":
                 db_exec("DELETE FROM casting WHERE id=%s", [(rid,)])
+                rec = record_to_del["rec"]
+                if rec:
+                    adjust_made(rec["request_number"], rec["article_code"], -int(rec["quantity"] or 0))
             elif mode["value"] == "test":
                 db_exec("DELETE FROM casting_test WHERE id=%s", [(rid,)])
             else:
                 db_exec("DELETE FROM casting_no_request WHERE id=%s", [(rid,)])
             record_to_del["id"] = None
+            record_to_del["rec"] = None
             reset_form(full=True)
             if mode["value"] == "req":
-                on_req_change(None)
+                fill_articles()
             else:
                 load_products()
-            refresh_table()
+            journal.remove(rid)
+            page.update()
 
     # ─── init ────────────────────────────────────────
     load_requests()
@@ -527,9 +763,10 @@ def view(page: ft.Page, request_no: str = ""):
             ft.Column(
                 [
             # include casting type selector before request and article selectors
-            ft.Row([dd_type, dd_req, dd_art], spacing=16),
+            ft.Row([dd_type, dd_req, dd_art, sw_batch], spacing=16),
                     ft.Divider(),
                     ft.Row([tf_worker, tf_machine, tf_need, tf_cycles, tf_defect, btn_save], spacing=10),
+                    batch_box,
                     ft.Divider(thickness=2),
                     ft.Text("Збережені записи лиття", style="titleMedium"),
                     ft.Row([table], expand=True),
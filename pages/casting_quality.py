@@ -1,8 +1,9 @@
 # pages/casting_quality.py
 import math
 import flet as ft
-from database.db_manager import connect_db
+from database.db_manager import connect_db, db_exec
 import compat
+from components.journal_table import JournalTable
 
 # ── Flet 0.28 сумісність ───────────────────────────────────
 if not hasattr(ft, "icons") and hasattr(ft, "Icons"):
@@ -17,18 +18,7 @@ def db_fetch(sql, p=None):
         cu.execute(sql, p or ())
         return cu.fetchall()
 
-def db_exec(sql, p=None):
-    with connect_db() as cn:
-        cu = cn.cursor()
-        cu.execute(sql, p or ())
-        cn.commit()
-
-# ── ensure needed columns ──────────────────────────────────
-for col in ("drying_id INT NULL", "casting_id INT NULL"):
-    try:
-        db_exec(f"ALTER TABLE casting_quality ADD COLUMN {col}")
-    except Exception:
-        pass
+# колонки drying_id/casting_id гарантує database/bootstrap
 
 # ── helpers ────────────────────────────────────────────────
 def produced_cast(cid: int) -> int:
@@ -56,6 +46,58 @@ def need_sample(total: int) -> int:
     """Не менше 1 шт або 10% від загального обсягу."""
     return max(1, math.ceil(total * 0.10))
 
+def plan_parts(req_no: str) -> list[dict]:
+    """
+    Партії заявки для К/Я лиття з уже перевіреною кількістю — двома запитами
+    (замість produced_*/checked_qty на кожну партію).
+
+    ❶ З лиття БЕЗ сушки: у product_base прапорець `drying_needed`
+       (1 — сушка потрібна, 0 — ні); беремо відливки з drying_needed = 0.
+    ❷ Після сушки — тільки завершені сушіння.
+
+    Рядок: prefix ("C"/"D"), id, article_code, n, total, done.
+    """
+    cast = db_fetch(
+        """
+        SELECT 'C' AS prefix, c.id, c.article_code,
+               IFNULL(c.product_name,pb.name) AS n,
+               GREATEST(0, c.quantity - COALESCE(c.defect_quantity,0)) AS total,
+               COALESCE(q.done, 0) AS done
+          FROM casting c
+          JOIN product_base pb ON pb.article_code = c.article_code
+          LEFT JOIN (
+                SELECT casting_id, SUM(checked_quantity) AS done
+                  FROM casting_quality
+                 WHERE casting_id IN (SELECT id FROM casting WHERE request_number=%s)
+                 GROUP BY casting_id
+          ) q ON q.casting_id = c.id
+         WHERE c.request_number=%s
+           AND pb.drying_needed = 0
+        """,
+        (req_no, req_no),
+    )
+    dry = db_fetch(
+        """
+        SELECT 'D' AS prefix, d.id, d.article_code, d.product_name AS n,
+               d.qty AS total, COALESCE(q.done, 0) AS done
+          FROM drying d
+          LEFT JOIN (
+                SELECT drying_id, SUM(checked_quantity) AS done
+                  FROM casting_quality
+                 WHERE drying_id IN (SELECT id FROM drying WHERE request_number=%s)
+                 GROUP BY drying_id
+          ) q ON q.drying_id = d.id
+         WHERE d.request_number=%s
+           AND d.end_time IS NOT NULL
+        """,
+        (req_no, req_no),
+    )
+    rows = cast + dry
+    for r in rows:
+        r["total"] = int(r["total"] or 0)
+        r["done"] = int(r["done"] or 0)
+    return rows
+
 # ────────────────────────────── View ───────────────────────
 def view(page: ft.Page, request_no: str = ""):
     page.scroll = ft.ScrollMode.AUTO
@@ -107,51 +149,12 @@ def view(page: ft.Page, request_no: str = ""):
             page.update()
             return
 
-        # ❶ З лиття БЕЗ сушки (ключовий фільтр)
-        # У product_base більше немає колонки `drying`; замість цього
-        # використовується прапорець `drying_needed` (1 — сушка потрібна,
-        # 0 — сушка не потрібна). Вибираємо ті відливки, для яких сушіння
-        # не потрібно (drying_needed = 0).
-        for r in db_fetch(
-            """
-            SELECT c.id, c.article_code,
-                   IFNULL(c.product_name,pb.name) AS n
-              FROM casting c
-              JOIN product_base pb ON pb.article_code = c.article_code
-             WHERE c.request_number=%s
-               AND pb.drying_needed = 0
-            """,
-            (dd_req.value,),
-        ):
-            rid   = r["id"]
-            total = produced_cast(rid)
-            done  = checked_qty(rid, False)
-            need  = need_sample(total)
-            if done < need:
-                dd_part.options.append(
-                    ft.dropdown.Option(
-                        f"#C{rid}  {r['article_code']} ({r['n']}) | Перевірити ≥{need - done} шт."
-                    )
-                )
-
-        # ❷ Після сушки — тільки завершені сушіння
-        for r in db_fetch(
-            """
-            SELECT d.id, d.article_code, d.product_name AS n
-              FROM drying d
-             WHERE d.request_number=%s
-               AND d.end_time IS NOT NULL
-            """,
-            (dd_req.value,),
-        ):
-            rid   = r["id"]
-            total = produced_dry(rid)
-            done  = checked_qty(rid, True)
-            need  = need_sample(total)
-            if done < need:
+        for p in plan_parts(dd_req.value):
+            need = need_sample(p["total"])
+            if p["done"] < need:
                 dd_part.options.append(
                     ft.dropdown.Option(
-                        f"#D{rid}  {r['article_code']} ({r['n']}) | Перевірити ≥{need - done} шт."
+                        f"#{p['prefix']}{p['id']}  {p['article_code']} ({p['n']}) | Перевірити ≥{need - p['done']} шт."
                     )
                 )
 
@@ -203,6 +206,7 @@ def view(page: ft.Page, request_no: str = ""):
         artrec = db_fetch(sql_sel, (rid,))[0]
         art, name = artrec["article_code"], artrec["n"]
 
+        saved_id = editing_id["id"]
         if editing_id["id"]:
             db_exec(
                 """UPDATE casting_quality
@@ -222,7 +226,7 @@ def view(page: ft.Page, request_no: str = ""):
                 ),
             )
         else:
-            db_exec(
+            saved_id = db_exec(
                 """INSERT INTO casting_quality
                       (request_number, article_code, product_name,
                        controller_name, checked_quantity,
@@ -244,7 +248,7 @@ def view(page: ft.Page, request_no: str = ""):
             )
 
         reset()
-        refresh()
+        journal.refresh_one(saved_id)
         reload_parts()
 
     btn_save.on_click   = save
@@ -273,7 +277,7 @@ def view(page: ft.Page, request_no: str = ""):
         page.update()
         if ok and pend["id"]:
             db_exec("DELETE FROM casting_quality WHERE id=%s", (pend["id"],))
-            refresh()
+            journal.remove(pend["id"])
             reload_parts()
         pend["id"] = None
 
@@ -287,48 +291,56 @@ def view(page: ft.Page, request_no: str = ""):
         rows=[],
     )
 
+    def make_row(r):
+        is_dry = bool(r["drying_id"])
+        rid    = r["drying_id"] or r["casting_id"]
+        defect = r["defect_quantity"] or 0
+
+        def mk_edit(rec):
+            def _e(ev):
+                editing_id["id"] = rec["id"]
+                dd_req.value    = rec["request_number"]; dd_req.disabled = True
+                tag = ("#D" if rec["drying_id"] else "#C") + str(rid)
+                dd_part.options = [ft.dropdown.Option(tag)]
+                dd_part.value   = tag; dd_part.disabled = True
+                current.update(row=rid, is_dry=is_dry)
+                tf_ctrl.value = rec["controller_name"] or ""
+                tf_chk.value  = str(rec["checked_quantity"])
+                tf_def.value  = str(rec["defect_quantity"])
+                tf_rs.value   = rec["reason"] or ""
+                total_lbl.value = ""
+                btn_save.disabled = False
+                btn_cancel.visible = True
+                page.update()
+            return _e
+
+        return ft.DataRow(cells=[
+            ft.DataCell(ft.Text(str(r["id"]))),
+            ft.DataCell(ft.Text(r["request_number"])),
+            ft.DataCell(ft.Text(r["drying_id"] or "—")),
+            ft.DataCell(ft.Text(r["casting_id"] or "—")),
+            ft.DataCell(ft.Text(r["article_code"])),
+            ft.DataCell(ft.Text(r["product_name"])),
+            ft.DataCell(ft.Text(str(r["checked_quantity"]))),
+            ft.DataCell(ft.Text(str(r["accepted_quantity"]))),
+            ft.DataCell(ft.Text(str(defect))),
+            ft.DataCell(ft.Text(r["controller_name"] or "—")),
+            ft.DataCell(ft.Row([
+                ft.IconButton(ft.icons.EDIT, tooltip="Редагувати", on_click=mk_edit(r)),
+                ft.IconButton(ft.icons.DELETE, tooltip="Видалити", icon_color=ft.colors.RED,
+                              on_click=lambda ev, rid=r["id"]: ask_del(rid)),
+            ], spacing=4)),
+        ])
+
+    journal = JournalTable(
+        table, make_row,
+        load_rows=lambda: db_fetch("SELECT * FROM casting_quality ORDER BY id DESC LIMIT 60"),
+        load_one=lambda rid: (db_fetch("SELECT * FROM casting_quality WHERE id=%s", (rid,)) or [None])[0],
+        limit=60,
+    )
+
     def refresh():
-        table.rows.clear()
-        for r in db_fetch("SELECT * FROM casting_quality ORDER BY id DESC LIMIT 60"):
-            is_dry = bool(r["drying_id"])
-            rid    = r["drying_id"] or r["casting_id"]
-            defect = r["defect_quantity"] or 0
-
-            def mk_edit(rec):
-                def _e(ev):
-                    editing_id["id"] = rec["id"]
-                    dd_req.value    = rec["request_number"]; dd_req.disabled = True
-                    tag = ("#D" if rec["drying_id"] else "#C") + str(rid)
-                    dd_part.options = [ft.dropdown.Option(tag)]
-                    dd_part.value   = tag; dd_part.disabled = True
-                    current.update(row=rid, is_dry=is_dry)
-                    tf_ctrl.value = rec["controller_name"] or ""
-                    tf_chk.value  = str(rec["checked_quantity"])
-                    tf_def.value  = str(rec["defect_quantity"])
-                    tf_rs.value   = rec["reason"] or ""
-                    total_lbl.value = ""
-                    btn_save.disabled = False
-                    btn_cancel.visible = True
-                    page.update()
-                return _e
-
-            table.rows.append(ft.DataRow(cells=[
-                ft.DataCell(ft.Text(str(r["id"]))),
-                ft.DataCell(ft.Text(r["request_number"])),
-                ft.DataCell(ft.Text(r["drying_id"] or "—")),
-                ft.DataCell(ft.Text(r["casting_id"] or "—")),
-                ft.DataCell(ft.Text(r["article_code"])),
-                ft.DataCell(ft.Text(r["product_name"])),
-                ft.DataCell(ft.Text(str(r["checked_quantity"]))),
-                ft.DataCell(ft.Text(str(r["accepted_quantity"]))),
-                ft.DataCell(ft.Text(str(defect))),
-                ft.DataCell(ft.Text(r["controller_name"] or "—")),
-                ft.DataCell(ft.Row([
-                    ft.IconButton(ft.icons.EDIT, tooltip="Редагувати", on_click=mk_edit(r)),
-                    ft.IconButton(ft.icons.DELETE, tooltip="Видалити", icon_color=ft.colors.RED,
-                                  on_click=lambda ev, rid=r["id"]: ask_del(rid)),
-                ], spacing=4)),
-            ]))
+        journal.reload()
         page.update()
 
     refresh()
@@ -1,7 +1,8 @@
 # pages/casting_request.py
 import flet as ft
 from datetime import date
-from database.db_manager import connect_db
+from database.db_manager import connect_db, db_exec
+from database.journal_archive import journal_source
 
 # ------------------------------ styles ------------------------------
 CARD_GRADIENT = ft.LinearGradient(
@@ -18,24 +19,42 @@ def db_fetch(sql, p=None):
         cu.execute(sql, p or ())
         return cu.fetchall()
 
-def db_exec(sql, p=None):
-    with connect_db() as cn:
-        cu = cn.cursor()
-        cu.execute(sql, p or ())
-        cn.commit()
-
 def get_name(code):
     r = db_fetch("SELECT name FROM product_base WHERE article_code=%s", (code,))
     return r[0]["name"] if r else "—"
 
-def fact_qty(req, code):
+def fact_qty(req, code, include_archive=False):
+    # журнали закритих заявок переносяться в архів — для історії читаємо і його
+    src = journal_source("casting", include_archive=include_archive)
     r = db_fetch(
-        "SELECT COALESCE(SUM(quantity),0) q FROM casting "
+        f"SELECT COALESCE(SUM(quantity),0) q FROM {src} "
         "WHERE request_number=%s AND article_code=%s",
         (req, code),
     )
     return r[0]["q"]
 
+def request_items(closed, like=None):
+    """
+    Позиції (артикул, к-сть, назва) усіх активних/закритих заявок одним запитом:
+    {request_number: [ {article_code, quantity, name}, ... ]} у порядку id.
+    """
+    sql = """
+        SELECT cr.request_number, cr.article_code, cr.quantity, COALESCE(pb.name, '—') AS name
+          FROM casting_requests cr
+          LEFT JOIN product_base pb ON pb.article_code = cr.article_code
+         WHERE cr.request_number IN (
+               SELECT request_number FROM casting_requests WHERE is_closed=%s
+         )
+    """
+    params = [1 if closed else 0]
+    if like:
+        sql += " AND cr.request_number LIKE %s"
+        params.append(like)
+    out = {}
+    for r in db_fetch(sql + " ORDER BY cr.id", params):
+        out.setdefault(r["request_number"], []).append(r)
+    return out
+
 # --------------------------- VIEW ---------------------------
 def view(page: ft.Page):
     # Note: The original view included a single list of requests.  This has been
@@ -118,6 +137,8 @@ def view(page: ft.Page):
     def load_active():
         active_cards.controls.clear()
         grid = ft.ResponsiveRow(run_spacing=12, spacing=12)
+        # позиції всіх карток — одним запитом, а не по запиту на заявку і артикул
+        all_items = request_items(closed=False)
         for rec in db_fetch(
             """
             SELECT request_number, MAX(client) c, MAX(reason) r, MAX(id) mid
@@ -128,15 +149,12 @@ def view(page: ft.Page):
             """
         ):
             req_num = rec["request_number"]
-            items = db_fetch(
-                "SELECT article_code, quantity FROM casting_requests WHERE request_number=%s",
-                (req_num,),
-            )
+            items = all_items.get(req_num, [])
             preview = [
                 ft.Row(
                     [
                         ft.Text(i["article_code"], expand=1),
-                        ft.Text(get_name(i["article_code"]), expand=2),
+                        ft.Text(i["name"], expand=2),
                         ft.Text(i["quantity"], expand=1),
                     ]
                 )
@@ -313,17 +331,15 @@ def view(page: ft.Page):
         query.append(" GROUP BY request_number ORDER BY mid DESC")
         rows = db_fetch("\n".join(query), params if params else None)
         grid = ft.ResponsiveRow(run_spacing=12, spacing=12)
+        all_items = request_items(closed=True, like=f"%{search_val}%" if search_val else None)
         for rec in rows:
             req_num = rec["request_number"]
-            items = db_fetch(
-                "SELECT article_code, quantity FROM casting_requests WHERE request_number=%s",
-                (req_num,),
-            )
+            items = all_items.get(req_num, [])
             preview = [
                 ft.Row(
                     [
                         ft.Text(i["article_code"], expand=1),
-                        ft.Text(get_name(i["article_code"]), expand=2),
+                        ft.Text(i["name"], expand=2),
                         ft.Text(i["quantity"], expand=1),
                     ]
                 )
@@ -354,7 +370,7 @@ def view(page: ft.Page):
                                 ft.Text(code_i, expand=1),
                                 ft.Text(get_name(code_i), expand=2),
                                 ft.Text(qty_i, width=70),
-                                ft.Text(fact_qty(num, code_i), width=70),
+                                ft.Text(fact_qty(num, code_i, include_archive=True), width=70),
                             ],
                             spacing=8,
                         )
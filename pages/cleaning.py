@@ -3,8 +3,10 @@
 # На етап переходить «гарна» кількість: processed_quantity − defect_quantity (у cutting)
 
 import flet as ft
-from database.db_manager import connect_db
+from database.db_manager import connect_db, db_exec
+from database.batch_availability import batch_availability, batch_row
 import compat
+from components.journal_table import JournalTable
 
 # ────────── Flet 0.28.3 compatibility ──────────
 if not hasattr(ft, "icons") and hasattr(ft, "Icons"):
@@ -19,47 +21,8 @@ def db_fetch(sql, p=None):
         cu.execute(sql, p or ())
         return cu.fetchall()
 
-def db_exec(sql, p=None):
-    with connect_db() as cn:
-        cu = cn.cursor()
-        cu.execute(sql, p or ())
-        cn.commit()
-
-# ────────── ensure columns ──────────
-def ensure_columns():
-    try:
-        db_exec("ALTER TABLE cleaning ADD COLUMN cutting_id INT NULL")
-    except Exception:
-        pass
-    try:
-        db_exec(
-            "ALTER TABLE cleaning "
-            "ADD COLUMN created_at DATETIME NULL DEFAULT NOW()"
-        )
-    except Exception:
-        pass
-
-ensure_columns()
-
 # ────────── helpers for batch (cutting_id) ──────────
-def good_after_cut_row(cut_id: int) -> int:
-    """Processed − defect for a row in cutting."""
-    row = db_fetch(
-        "SELECT processed_quantity, COALESCE(defect_quantity,0) AS d "
-        "FROM cutting WHERE id=%s LIMIT 1",
-        (cut_id,),
-    )
-    if not row:
-        return 0
-    return max(0, row[0]["processed_quantity"] - row[0]["d"])
-
-def already_cleaned_row(cut_id: int) -> int:
-    row = db_fetch(
-        "SELECT COALESCE(SUM(processed_quantity),0) AS q "
-        "FROM cleaning WHERE cutting_id=%s",
-        (cut_id,),
-    )
-    return int(row[0]["q"]) if row else 0
+# залишок по партіях різки (оброблено − брак − вже зачищено) — database/batch_availability
 
 def get_product_info(cut_id: int):
     row = db_fetch(
@@ -139,27 +102,13 @@ def view(page: ft.Page, request_no: str = ""):
             page.update()
             return
 
-        rows = db_fetch(
-            """
-            SELECT c.id, c.article_code, c.product_name
-              FROM cutting c
-              JOIN product_base pb ON pb.article_code = c.article_code
-             WHERE c.request_number = %s
-               AND pb.cleaning_needed = 1
-             ORDER BY c.id
-            """,
-            (dd_request.value,),
-        )
-        for r in rows:
-            cut_id = r["id"]
-            total  = good_after_cut_row(cut_id)
-            done   = already_cleaned_row(cut_id)
-            if done < total:
-                txt = (
-                    f"#{cut_id}  {r['article_code']} "
-                    f"({r['product_name']}) | лишилось: {total - done}"
-                )
-                dd_batch.options.append(ft.dropdown.Option(txt))
+        # одна вибірка на всю заявку: лише партії із залишком
+        for r in batch_availability("cleaning", dd_request.value):
+            txt = (
+                f"#{r['id']}  {r['article_code']} "
+                f"({r['product_name']}) | лишилось: {r['left']}"
+            )
+            dd_batch.options.append(ft.dropdown.Option(txt))
 
         dd_batch.disabled = not bool(dd_batch.options)
         page.update()
@@ -173,9 +122,8 @@ def view(page: ft.Page, request_no: str = ""):
         cut_id = int(dd_batch.value.split()[0][1:])
         current_cut_id["id"] = cut_id
 
-        total = good_after_cut_row(cut_id)
-        done  = already_cleaned_row(cut_id)
-        qty_left_lbl.value = f"Залишилось: {total - done}"
+        b = batch_row("cleaning", cut_id)
+        qty_left_lbl.value = f"Залишилось: {b['left'] if b else 0}"
         for f in (tf_operator, tf_qty, tf_defect):
             f.disabled = False
         btn_save.disabled = False
@@ -199,6 +147,7 @@ def view(page: ft.Page, request_no: str = ""):
         cut_id = current_cut_id["id"]
         info   = get_product_info(cut_id)
 
+        saved_id = editing_id["id"]
         if editing_id["id"]:
             db_exec(
                 """
@@ -211,7 +160,7 @@ def view(page: ft.Page, request_no: str = ""):
                 (tf_operator.value, qty, defect, editing_id["id"]),
             )
         else:
-            db_exec(
+            saved_id = db_exec(
                 """
                 INSERT INTO cleaning
                 (request_number, article_code, product_name,
@@ -231,7 +180,7 @@ def view(page: ft.Page, request_no: str = ""):
             )
 
         reset_form()
-        refresh_table()
+        journal.refresh_one(saved_id)
         on_request_change(None)
 
     btn_save.on_click   = save_record
@@ -262,7 +211,7 @@ def view(page: ft.Page, request_no: str = ""):
         page.update()
         if ok and record_to_delete["id"]:
             db_exec("DELETE FROM cleaning WHERE id=%s", (record_to_delete["id"],))
-            refresh_table()
+            journal.remove(record_to_delete["id"])
             on_request_change(None)
         record_to_delete["id"] = None
 
@@ -279,70 +228,74 @@ def view(page: ft.Page, request_no: str = ""):
         rows=[],
     )
 
+    def make_row(r):
+        total  = r["processed_quantity"]
+        defect = r["defect_quantity"] or 0
+        perc   = f"{defect * 100 / total:.1f} %" if total else "0 %"
+        date_s = (
+            r["created_at"].strftime("%d.%m.%Y %H:%M")
+            if r.get("created_at") else "—"
+        )
+        cut_id = r.get("cutting_id") or "—"
+
+        def mk_edit(rec: dict):
+            def _edit(_e):
+                editing_id["id"]       = rec["id"]
+                current_cut_id["id"]   = rec["cutting_id"]
+                dd_request.value       = rec["request_number"]
+                dd_request.disabled    = True
+
+                b     = batch_row("cleaning", rec["cutting_id"]) if rec["cutting_id"] else None
+                disp  = (f"#{rec['cutting_id']}  {rec['article_code']} | "
+                         f"лишилось: {b['left'] if b else 0}")
+                dd_batch.options      = [ft.dropdown.Option(disp)]
+                dd_batch.value        = disp
+                dd_batch.disabled     = True
+
+                tf_operator.value     = rec["operator_name"] or ""
+                tf_qty.value          = str(rec["processed_quantity"])
+                tf_defect.value       = str(rec["defect_quantity"] or 0)
+                for f in (tf_operator, tf_qty, tf_defect):
+                    f.disabled = False
+                qty_left_lbl.value    = ""
+                btn_save.disabled     = False
+                btn_cancel.visible    = True
+                page.update()
+            return _edit
+
+        return ft.DataRow(cells=[
+            ft.DataCell(ft.Text(str(r["id"]))),
+            ft.DataCell(ft.Text(r["request_number"])),
+            ft.DataCell(ft.Text(str(cut_id))),
+            ft.DataCell(ft.Text(r["article_code"])),
+            ft.DataCell(ft.Text(r["product_name"])),
+            ft.DataCell(ft.Text(r["operator_name"] or "—")),
+            ft.DataCell(ft.Text(str(total))),
+            ft.DataCell(ft.Text(str(defect))),
+            ft.DataCell(ft.Text(perc)),
+            ft.DataCell(ft.Text(date_s)),
+            ft.DataCell(
+                ft.Row([
+                    ft.IconButton(ft.icons.EDIT,
+                                  tooltip="Редагувати",
+                                  on_click=mk_edit(r)),
+                    ft.IconButton(ft.icons.DELETE,
+                                  tooltip="Видалити",
+                                  icon_color=ft.colors.RED,
+                                  on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid)),
+                ], spacing=4)
+            ),
+        ])
+
+    journal = JournalTable(
+        table, make_row,
+        load_rows=lambda: db_fetch("SELECT * FROM cleaning ORDER BY id DESC LIMIT 50"),
+        load_one=lambda rid: (db_fetch("SELECT * FROM cleaning WHERE id=%s", (rid,)) or [None])[0],
+        limit=50,
+    )
+
     def refresh_table():
-        table.rows.clear()
-        rows = db_fetch("SELECT * FROM cleaning ORDER BY id DESC LIMIT 50")
-        for r in rows:
-            total  = r["processed_quantity"]
-            defect = r["defect_quantity"] or 0
-            perc   = f"{defect * 100 / total:.1f} %" if total else "0 %"
-            date_s = (
-                r["created_at"].strftime("%d.%m.%Y %H:%M")
-                if r.get("created_at") else "—"
-            )
-            cut_id = r.get("cutting_id") or "—"
-
-            def mk_edit(rec: dict):
-                def _edit(_e):
-                    editing_id["id"]       = rec["id"]
-                    current_cut_id["id"]   = rec["cutting_id"]
-                    dd_request.value       = rec["request_number"]
-                    dd_request.disabled    = True
-
-                    total = good_after_cut_row(rec["cutting_id"])
-                    done  = already_cleaned_row(rec["cutting_id"])
-                    disp  = (f"#{rec['cutting_id']}  {rec['article_code']} | "
-                             f"лишилось: {total - done}")
-                    dd_batch.options      = [ft.dropdown.Option(disp)]
-                    dd_batch.value        = disp
-                    dd_batch.disabled     = True
-
-                    tf_operator.value     = rec["operator_name"] or ""
-                    tf_qty.value          = str(rec["processed_quantity"])
-                    tf_defect.value       = str(rec["defect_quantity"] or 0)
-                    for f in (tf_operator, tf_qty, tf_defect):
-                        f.disabled = False
-                    qty_left_lbl.value    = ""
-                    btn_save.disabled     = False
-                    btn_cancel.visible    = True
-                    page.update()
-                return _edit
-
-            table.rows.append(
-                ft.DataRow(cells=[
-                    ft.DataCell(ft.Text(str(r["id"]))),
-                    ft.DataCell(ft.Text(r["request_number"])),
-                    ft.DataCell(ft.Text(str(cut_id))),
-                    ft.DataCell(ft.Text(r["article_code"])),
-                    ft.DataCell(ft.Text(r["product_name"])),
-                    ft.DataCell(ft.Text(r["operator_name"] or "—")),
-                    ft.DataCell(ft.Text(str(total))),
-                    ft.DataCell(ft.Text(str(defect))),
-                    ft.DataCell(ft.Text(perc)),
-                    ft.DataCell(ft.Text(date_s)),
-                    ft.DataCell(
-                        ft.Row([
-                            ft.IconButton(ft.icons.EDIT,
-                                          tooltip="Редагувати",
-                                          on_click=mk_edit(r)),
-                            ft.IconButton(ft.icons.DELETE,
-                                          tooltip="Видалити",
-                                          icon_color=ft.colors.RED,
-                                          on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid)),
-                        ], spacing=4)
-                    ),
-                ])
-            )
+        journal.reload()
         page.update()
 
     # ─── init ─────────────────────────────────────
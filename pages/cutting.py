@@ -1,7 +1,9 @@
 # pages/cutting.py
 import flet as ft
-from database.db_manager import connect_db
+from database.db_manager import connect_db, db_exec
+from database.batch_availability import batch_availability, batch_row
 import compat
+from components.journal_table import JournalTable
 
 # ────────── Flet 0.28 compatibility ──────────
 if not hasattr(ft, "icons") and hasattr(ft, "Icons"):
@@ -16,51 +18,8 @@ def db_fetch(sql, p=None):
         cu.execute(sql, p or ())
         return cu.fetchall()
 
-def db_exec(sql, p=None):
-    with connect_db() as cn:
-        cu = cn.cursor()
-        cu.execute(sql, p or ())
-        cn.commit()
-
-# ────────── ensure columns ──────────
-def ensure_columns():
-    try:
-        db_exec("ALTER TABLE cutting ADD COLUMN casting_id INT NULL")
-    except Exception:
-        pass
-    try:
-        db_exec("ALTER TABLE cutting ADD COLUMN created_at DATETIME NULL DEFAULT NOW()")
-    except Exception:
-        pass
-
-ensure_columns()
-
 # ────────── helpers for batch calculations ──────────
-def qc_defects_row(cast_id: int) -> int:
-    row = db_fetch(
-        "SELECT COALESCE(SUM(checked_quantity - accepted_quantity),0) AS bad "
-        "FROM casting_quality WHERE casting_id=%s",
-        (cast_id,),
-    )
-    return int(row[0]["bad"]) if row else 0
-
-def good_after_qc_row(cast_id: int) -> int:
-    cast = db_fetch(
-        "SELECT quantity, COALESCE(defect_quantity,0) AS d "
-        "FROM casting WHERE id=%s LIMIT 1",
-        (cast_id,),
-    )
-    if not cast:
-        return 0
-    base_good = cast[0]["quantity"] - cast[0]["d"]
-    return max(0, base_good - qc_defects_row(cast_id))
-
-def already_cut_row(cast_id: int) -> int:
-    row = db_fetch(
-        "SELECT COALESCE(SUM(processed_quantity),0) AS q FROM cutting WHERE casting_id=%s",
-        (cast_id,),
-    )
-    return int(row[0]["q"]) if row else 0
+# залишок по партіях лиття (добре після К/Я − вже порізано) — database/batch_availability
 
 def get_product_info(cast_id: int):
     row = db_fetch(
@@ -135,27 +94,11 @@ def view(page: ft.Page, request_no: str = ""):
             page.update()
             return
 
-        rows = db_fetch(
-            """
-            SELECT c.id, c.article_code, pb.name
-              FROM casting c
-              JOIN product_base pb
-                ON pb.article_code = c.article_code
-             WHERE c.request_number=%s
-               AND pb.cutting_needed = 1
-             ORDER BY c.id
-            """,
-            (dd_request.value,),
-        )
-
-        for r in rows:
-            cid   = r["id"]
-            total = good_after_qc_row(cid)
-            done  = already_cut_row(cid)
-            if done < total:
-                txt = (f"#{cid}  {r['article_code']} ({r['name']}) | "
-                       f"лишилось: {total - done}")
-                dd_batch.options.append(ft.dropdown.Option(txt))
+        # одна вибірка на всю заявку: лише партії із залишком
+        for r in batch_availability("cutting", dd_request.value):
+            txt = (f"#{r['id']}  {r['article_code']} ({r['product_name']}) | "
+                   f"лишилось: {r['left']}")
+            dd_batch.options.append(ft.dropdown.Option(txt))
 
         dd_batch.disabled = not bool(dd_batch.options)
         page.update()
@@ -168,9 +111,8 @@ def view(page: ft.Page, request_no: str = ""):
             return
         cid = int(dd_batch.value.split()[0][1:])
         current_cast_id["id"] = cid
-        total = good_after_qc_row(cid)
-        done  = already_cut_row(cid)
-        qty_left_lbl.value = f"Залишилось: {total - done}"
+        b = batch_row("cutting", cid)
+        qty_left_lbl.value = f"Залишилось: {b['left'] if b else 0}"
         for f in (tf_operator, tf_qty, tf_defect):
             f.disabled = False
         btn_save.disabled = False
@@ -194,6 +136,7 @@ def view(page: ft.Page, request_no: str = ""):
         cid  = current_cast_id["id"]
         info = get_product_info(cid)
 
+        saved_id = editing_id["id"]
         if editing_id["id"]:
             db_exec(
                 """
@@ -206,7 +149,7 @@ def view(page: ft.Page, request_no: str = ""):
                 (tf_operator.value, qty, defect, editing_id["id"]),
             )
         else:
-            db_exec(
+            saved_id = db_exec(
                 """
                 INSERT INTO cutting
                    (request_number, article_code, product_name,
@@ -226,7 +169,7 @@ def view(page: ft.Page, request_no: str = ""):
             )
 
         reset_form()
-        refresh_table()
+        journal.refresh_one(saved_id)
         on_request_change(None)
 
     btn_save.on_click   = save_record
@@ -257,7 +200,7 @@ def view(page: ft.Page, request_no: str = ""):
         page.update()
         if ok and record_to_delete["id"]:
             db_exec("DELETE FROM cutting WHERE id=%s", (record_to_delete["id"],))
-            refresh_table()
+            journal.remove(record_to_delete["id"])
             on_request_change(None)
         record_to_delete["id"] = None
 
@@ -274,70 +217,75 @@ def view(page: ft.Page, request_no: str = ""):
         rows=[],
     )
 
+    def make_row(r):
+        total  = r["processed_quantity"]
+        defect = r["defect_quantity"] or 0
+        perc   = f"{defect * 100 / total:.1f} %" if total else "0 %"
+        date_s = (
+            r["created_at"].strftime("%d.%m.%Y %H:%M")
+            if r.get("created_at") else "—"
+        )
+        cast_id = r.get("casting_id") or "—"
+
+        def mk_edit(rec):
+            def _e(_ev):
+                editing_id["id"] = rec["id"]
+                current_cast_id["id"] = rec["casting_id"]
+
+                dd_request.value    = rec["request_number"]
+                dd_request.disabled = True
+
+                b     = batch_row("cutting", rec["casting_id"]) if rec["casting_id"] else None
+                disp  = (f"#{rec['casting_id']}  {rec['article_code']} | "
+                         f"лишилось: {b['left'] if b else 0}")
+                dd_batch.options  = [ft.dropdown.Option(disp)]
+                dd_batch.value    = disp
+                dd_batch.disabled = True
+
+                tf_operator.value = rec["operator_name"] or ""
+                tf_qty.value      = str(rec["processed_quantity"])
+                tf_defect.value   = str(rec["defect_quantity"] or 0)
+                for f in (tf_operator, tf_qty, tf_defect):
+                    f.disabled = False
+                qty_left_lbl.value = ""
+                btn_save.disabled  = False
+                btn_cancel.visible = True
+                page.update()
+            return _e
+
+        return ft.DataRow(cells=[
+            ft.DataCell(ft.Text(str(r["id"]))),
+            ft.DataCell(ft.Text(r["request_number"])),
+            ft.DataCell(ft.Text(str(cast_id))),
+            ft.DataCell(ft.Text(r["article_code"])),
+            ft.DataCell(ft.Text(r["product_name"])),
+            ft.DataCell(ft.Text(r["operator_name"] or "—")),
+            ft.DataCell(ft.Text(str(total))),
+            ft.DataCell(ft.Text(str(defect))),
+            ft.DataCell(ft.Text(perc)),
+            ft.DataCell(ft.Text(date_s)),
+            ft.DataCell(
+                ft.Row([
+                    ft.IconButton(ft.icons.EDIT,
+                                  tooltip="Редагувати",
+                                  on_click=mk_edit(r)),
+                    ft.IconButton(ft.icons.DELETE,
+                                  tooltip="Видалити",
+                                  icon_color=ft.colors.RED,
+                                  on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid)),
+                ], spacing=4)
+            ),
+        ])
+
+    journal = JournalTable(
+        table, make_row,
+        load_rows=lambda: db_fetch("SELECT * FROM cutting ORDER BY id DESC LIMIT 50"),
+        load_one=lambda rid: (db_fetch("SELECT * FROM cutting WHERE id=%s", (rid,)) or [None])[0],
+        limit=50,
+    )
+
     def refresh_table():
-        table.rows.clear()
-        for r in db_fetch("SELECT * FROM cutting ORDER BY id DESC LIMIT 50"):
-            total  = r["processed_quantity"]
-            defect = r["defect_quantity"] or 0
-            perc   = f"{defect * 100 / total:.1f} %" if total else "0 %"
-            date_s = (
-                r["created_at"].strftime("%d.%m.%Y %H:%M")
-                if r.get("created_at") else "—"
-            )
-            cast_id = r.get("casting_id") or "—"
-
-            def mk_edit(rec):
-                def _e(_ev):
-                    editing_id["id"] = rec["id"]
-                    current_cast_id["id"] = rec["casting_id"]
-
-                    dd_request.value    = rec["request_number"]
-                    dd_request.disabled = True
-
-                    total = good_after_qc_row(rec["casting_id"])
-                    done  = already_cut_row(rec["casting_id"])
-                    disp  = (f"#{rec['casting_id']}  {rec['article_code']} | "
-                             f"лишилось: {total - done}")
-                    dd_batch.options  = [ft.dropdown.Option(disp)]
-                    dd_batch.value    = disp
-                    dd_batch.disabled = True
-
-                    tf_operator.value = rec["operator_name"] or ""
-                    tf_qty.value      = str(rec["processed_quantity"])
-                    tf_defect.value   = str(rec["defect_quantity"] or 0)
-                    for f in (tf_operator, tf_qty, tf_defect):
-                        f.disabled = False
-                    qty_left_lbl.value = ""
-                    btn_save.disabled  = False
-                    btn_cancel.visible = True
-                    page.update()
-                return _e
-
-            table.rows.append(
-                ft.DataRow(cells=[
-                    ft.DataCell(ft.Text(str(r["id"]))),
-                    ft.DataCell(ft.Text(r["request_number"])),
-                    ft.DataCell(ft.Text(str(cast_id))),
-                    ft.DataCell(ft.Text(r["article_code"])),
-                    ft.DataCell(ft.Text(r["product_name"])),
-                    ft.DataCell(ft.Text(r["operator_name"] or "—")),
-                    ft.DataCell(ft.Text(str(total))),
-                    ft.DataCell(ft.Text(str(defect))),
-                    ft.DataCell(ft.Text(perc)),
-                    ft.DataCell(ft.Text(date_s)),
-                    ft.DataCell(
-                        ft.Row([
-                            ft.IconButton(ft.icons.EDIT,
-                                          tooltip="Редагувати",
-                                          on_click=mk_edit(r)),
-                            ft.IconButton(ft.icons.DELETE,
-                                          tooltip="Видалити",
-                                          icon_color=ft.colors.RED,
-                                          on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid)),
-                        ], spacing=4)
-                    ),
-                ])
-            )
+        journal.reload()
         page.update()
 
     # ─── init ─────────────────────────────────────
@@ -4,10 +4,12 @@
 #   закриваємо заявку, коли всі вироби готові.
 
 import math
+import threading
 import flet as ft
-from database.db_manager import connect_db
+from database.db_manager import connect_db, db_exec, db_write
 from utils.notifications import push, request_closed   # ← повідомлення
 import compat
+from components.journal_table import JournalTable
 
 # ────────── DB helpers ──────────
 def db_fetch(sql, p=None):
@@ -16,23 +18,7 @@ def db_fetch(sql, p=None):
         cu.execute(sql, p or ())
         return cu.fetchall()
 
-def db_exec(sql, p=None):
-    with connect_db() as cn:
-        cu = cn.cursor()
-        cu.execute(sql, p or ())
-        cn.commit()
-
-# ────────── ensure extra columns ──────────
-for col in (
-    "drying_id INT NULL",
-    "trimming_id INT NULL",
-    "cutting_id INT NULL",
-    "cleaning_id INT NULL",
-):
-    try:
-        db_exec(f"ALTER TABLE final_quality ADD COLUMN {col}")
-    except Exception:
-        pass
+# колонки drying_id/trimming_id/cutting_id/cleaning_id гарантує database/bootstrap
 
 # ────────── qty helpers ──────────
 def need_sample(total: int) -> int:
@@ -81,8 +67,10 @@ def _detect_fq_source(article_code: str) -> tuple[str, str, str]:
         "SELECT trimming_needed, cutting_needed, cleaning_needed FROM product_base WHERE article_code=%s",
         (article_code,),
     )
-    t = row[0] if row else {"trimming_needed": 0, "cutting_needed": 0, "cleaning_needed": 0}
+    return _source_from_flags(row[0] if row else {})
 
+def _source_from_flags(t: dict) -> tuple[str, str, str]:
+    """(table, fk_column, prefix) за вже вибраними прапорцями product_base."""
     if int(t.get("cleaning_needed") or 0) == 1:
         return ("cleaning", "cleaning_id", "CL")
     if int(t.get("cutting_needed") or 0) == 1:
@@ -100,25 +88,183 @@ def _ready_sum_for_article(req_no: str, article_code: str) -> int:
         sql = f"SELECT COALESCE(SUM(processed_quantity-IFNULL(defect_quantity,0)),0) v FROM {table} WHERE request_number=%s AND article_code=%s"
     return db_fetch(sql, (req_no, article_code,))[0]["v"]
 
+# ────────── план вибірки ФКЯ для всієї заявки ──────────
+# «Готова» к-сть партії за джерелом (те саме, що part_qty)
+_READY_EXPR = {
+    "drying": "s.qty",
+    "trimming": "s.processed_quantity - IFNULL(s.defect_quantity,0)",
+    "cutting": "s.processed_quantity - IFNULL(s.defect_quantity,0)",
+    "cleaning": "s.processed_quantity - IFNULL(s.defect_quantity,0)",
+}
+
+def plan_samples(req_no: str) -> list[dict]:
+    """
+    Для кожної партії заявки: готова к-сть, потрібна вибірка (10%, need_sample),
+    уже перевірено і залишок вибірки. Один запит на артикули + один запит
+    на кожну стадію-джерело (замість part_qty/already_checked на кожну партію).
+    Повертає лише партії, де вибірку ще не виконано, у порядку артикулів заявки
+    і від новіших партій до старіших.
+    """
+    articles = db_fetch(
+        "SELECT DISTINCT cr.article_code, IFNULL(pb.name,'') name, "
+        "       pb.trimming_needed, pb.cutting_needed, pb.cleaning_needed "
+        "FROM casting_requests cr LEFT JOIN product_base pb ON pb.article_code=cr.article_code "
+        "WHERE cr.request_number=%s",
+        (req_no,),
+    )
+    order: dict[str, int] = {}
+    by_source: dict[tuple[str, str, str], list[str]] = {}
+    for a in articles:
+        art = a["article_code"]
+        if art in order:
+            continue
+        order[art] = len(order)
+        by_source.setdefault(_source_from_flags(a), []).append(art)
+
+    plan: list[dict] = []
+    for (table, fk_col, prefix), arts in by_source.items():
+        ph = ",".join(["%s"] * len(arts))
+        done_where = "AND s.end_time IS NOT NULL" if table == "drying" else ""
+        rows = db_fetch(
+            f"""
+            SELECT s.id, s.article_code, s.product_name,
+                   {_READY_EXPR[table]} AS tot,
+                   COALESCE(fq.c, 0) AS done
+              FROM {table} s
+              LEFT JOIN (
+                    SELECT {fk_col} AS pid, SUM(checked_quantity) AS c
+                      FROM final_quality
+                     WHERE {fk_col} IN (SELECT id FROM {table} WHERE request_number=%s)
+                     GROUP BY {fk_col}
+              ) fq ON fq.pid = s.id
+             WHERE s.request_number=%s AND s.article_code IN ({ph}) {done_where}
+            """,
+            (req_no, req_no, *arts),
+        )
+        for r in rows:
+            tot = int(r["tot"] or 0)
+            done = int(r["done"] or 0)
+            need = need_sample(tot)
+            if done >= need:
+                continue
+            plan.append({
+                "prefix": prefix,
+                "id": r["id"],
+                "article_code": r["article_code"],
+                "product_name": r["product_name"],
+                "total": tot,
+                "done": done,
+                "need": need,
+                "left": need - done,
+            })
+
+    plan.sort(key=lambda p: (order.get(p["article_code"], 0), -p["id"]))
+    return plan
+
+# Запити завершеності по артикулах (план перевіряє tests/test_explain.py)
+def accepted_sql(n_articles: int) -> str:
+    """Прийнято на ФКЯ по n артикулах заявки: (request_number, *article_codes)."""
+    ph = ",".join(["%s"] * n_articles)
+    return (
+        "SELECT article_code, COALESCE(SUM(accepted_quantity),0) f FROM final_quality "
+        f"WHERE request_number=%s AND article_code IN ({ph}) GROUP BY article_code"
+    )
+
+def ready_sql(table: str, n_articles: int) -> str:
+    """«Готова» к-сть стадії-джерела по n артикулах заявки: (request_number, *article_codes)."""
+    ph = ",".join(["%s"] * n_articles)
+    done_where = "AND s.end_time IS NOT NULL" if table == "drying" else ""
+    return (
+        f"SELECT s.article_code, COALESCE(SUM({_READY_EXPR[table]}),0) v FROM {table} s "
+        f"WHERE s.request_number=%s AND s.article_code IN ({ph}) {done_where} GROUP BY s.article_code"
+    )
+
+def _articles_completion(req_no: str, articles: list[str] | None = None) -> dict[str, bool]:
+    """
+    {article_code: accepted >= ready} для всіх (або вказаних) артикулів заявки.
+    Запити згруповані: прапорці + прийнято + по одному на стадію-джерело.
+    """
+    sql = (
+        "SELECT DISTINCT cr.article_code, pb.trimming_needed, pb.cutting_needed, pb.cleaning_needed "
+        "FROM casting_requests cr LEFT JOIN product_base pb ON pb.article_code=cr.article_code "
+        "WHERE cr.request_number=%s"
+    )
+    params: tuple = (req_no,)
+    if articles:
+        sql += f" AND cr.article_code IN ({','.join(['%s'] * len(articles))})"
+        params += tuple(articles)
+    rows = db_fetch(sql, params)
+    if not rows:
+        return {}
+
+    by_source: dict[str, list[str]] = {}
+    for r in rows:
+        by_source.setdefault(_source_from_flags(r)[0], []).append(r["article_code"])
+    arts = [r["article_code"] for r in rows]
+
+    accepted = {
+        r["article_code"]: int(r["f"] or 0)
+        for r in db_fetch(accepted_sql(len(arts)), (req_no, *arts))
+    }
+    ready: dict[str, int] = {}
+    for table, t_arts in by_source.items():
+        for r in db_fetch(ready_sql(table, len(t_arts)), (req_no, *t_arts)):
+            ready[r["article_code"]] = int(r["v"] or 0)
+
+    return {a: accepted.get(a, 0) >= ready.get(a, 0) for a in arts}
+
 # ────────── перевірка «заявка закрита» ──────────
-def check_request_closed(req_number: str):
+# Лічильник незавершених артикулів по заявці (у межах процесу):
+# після збереження перераховується змінений артикул разом із тими, що ще
+# відкриті, — тими самими згрупованими запитами. Так артикули, які
+# завершили на інших робочих місцях, не «зависають» у лічильнику.
+# «Один раз» тримає БД: умовний UPDATE casting_requests.closed_notified_at —
+# з кількох робочих місць (і після ретеншну сповіщень) публікує лише одне.
+_open_articles: dict[str, set[str]] = {}
+_completion_lock = threading.Lock()
+
+def invalidate_completion(req_number: str):
+    """Скинути лічильник заявки (видалення записів, зміни поза цією сторінкою)."""
+    with _completion_lock:
+        _open_articles.pop(req_number, None)
+
+def _claim_closed_notice(req_number: str) -> bool:
+    """Атомарно позначити заявку як «сповіщено»; True — лише для першого, хто встиг."""
+    _, rowcount = db_write(
+        "UPDATE casting_requests SET closed_notified_at = NOW() "
+        "WHERE request_number = %s AND closed_notified_at IS NULL",
+        (req_number,),
+    )
+    return rowcount > 0
+
+def check_request_closed(req_number: str, article_code: str | None = None):
     """
     Якщо accepted по кожному артикулу заявки >= сумарної «готової» к-сті з відповідної стадії
     (визначеної за прапорцями), заявка вважається закритою.
+
+    article_code — артикул, який щойно змінився: перераховується він і відкриті
+    артикули з лічильника (одним набором запитів). Коли лічильник доходить до нуля, стан заявки
+    перевіряється повністю (верхні стадії могли додати партії), і повідомлення
+    «Заявка … завершена» публікується один раз на БД (_claim_closed_notice).
     """
-    rows = db_fetch(
-        "SELECT DISTINCT article_code FROM casting_requests WHERE request_number=%s",
-        (req_number,),
-    )
-    for r in rows:
-        code = r["article_code"]
-        ready = _ready_sum_for_article(req_number, code)
-        final = db_fetch(
-            "SELECT COALESCE(SUM(accepted_quantity),0) f FROM final_quality WHERE request_number=%s AND article_code=%s",
-            (req_number, code),
-        )[0]["f"]
-        if final < ready:
-            return
+    with _completion_lock:
+        open_set = _open_articles.get(req_number)
+    if open_set is None or article_code is None:
+        state = _articles_completion(req_number)
+        open_set = {a for a, ok in state.items() if not ok}
+    else:
+        # відкриті артикули перевіряємо наново: їх могли закрити з іншого ПК
+        state = _articles_completion(req_number, sorted(open_set | {article_code}))
+        open_set = {a for a, ok in state.items() if not ok}
+        if not open_set:
+            # підтвердження повною перевіркою лише на переході «→ 0»
+            state = _articles_completion(req_number)
+            open_set = {a for a, ok in state.items() if not ok}
+
+    with _completion_lock:
+        _open_articles[req_number] = open_set
+    if open_set or not _claim_closed_notice(req_number):
+        return
     request_closed(req_number)
 
 # ───────────────────────── View ─────────────────────────
@@ -207,6 +353,9 @@ def view(page: ft.Page, request_no: str = ""):
         dd_req.value = request_no
 
     # ---------- load parts (з урахуванням прапорців Б/В) ----------
+    # (prefix, pid) → рядок плану вибірки з останнього reload_parts
+    plan_cache: dict[tuple[str, int], dict] = {}
+
     def reload_parts():
         dd_part.options.clear()
         if not dd_req.value:
@@ -214,52 +363,38 @@ def view(page: ft.Page, request_no: str = ""):
             return
         req = dd_req.value
 
-        # по кожному артикулу заявки визначаємо джерело
-        articles = db_fetch(
-            "SELECT DISTINCT cr.article_code, IFNULL(pb.name,'') name "
-            "FROM casting_requests cr LEFT JOIN product_base pb ON pb.article_code=cr.article_code "
-            "WHERE cr.request_number=%s",
-            (req,),
-        )
-
-        for a in articles:
-            art = a["article_code"]
-            name = a["name"]
-            table, fk_col, prefix = _detect_fq_source(art)
-
-            # беремо партії з потрібної стадії
-            if table == "drying":
-                rows = db_fetch(
-                    "SELECT id, article_code, product_name FROM drying "
-                    "WHERE request_number=%s AND article_code=%s AND end_time IS NOT NULL "
-                    "ORDER BY id DESC",
-                    (req, art),
-                )
-            else:
-                rows = db_fetch(
-                    f"SELECT id, article_code, product_name, processed_quantity, defect_quantity "
-                    f"FROM {table} WHERE request_number=%s AND article_code=%s ORDER BY id DESC",
-                    (req, art),
-                )
-
-            for r in rows:
-                pid = r["id"]
-                tot = part_qty(prefix, pid)
-                done = already_checked(prefix, pid)
-                # якщо вже виконали норму перевірки — пропускаємо
-                if done >= need_sample(tot):
-                    continue
-                left = max(0, need_sample(tot) - done)
-                dd_part.options.append(
-                    ft.dropdown.Option(
-                        f"#{prefix}{pid}  {r['article_code']} ({r['product_name']}) | "
-                        f"Готово {tot - done} шт. | ▶ {left} шт."
-                    )
-                )
+        plan_cache.clear()
+        for p in plan_samples(req):
+            plan_cache[(p["prefix"], p["id"])] = p
+        render_parts()
 
+    def render_parts():
+        dd_part.options = [
+            ft.dropdown.Option(
+                f"#{p['prefix']}{p['id']}  {p['article_code']} ({p['product_name']}) | "
+                f"Готово {p['total'] - p['done']} шт. | ▶ {p['left']} шт."
+            )
+            for p in plan_cache.values()
+        ]
         dd_part.disabled = not bool(dd_part.options)
         page.update()
 
+    def patch_plan(src: str, pid: int, delta: int):
+        """
+        Врахувати зміну «перевірено» для однієї партії без повторного plan_samples.
+        Партії, якої немає в плані (вибірку вже було виконано), — повне перезавантаження.
+        """
+        p = plan_cache.get((src, pid))
+        if p is None:
+            if delta:
+                reload_parts()
+            return
+        p["done"] += delta
+        p["left"] = p["need"] - p["done"]
+        if p["left"] <= 0:
+            plan_cache.pop((src, pid), None)
+        render_parts()
+
     # ---------- part chosen ----------
     def on_part_change(e):
         nonlocal current_total
@@ -269,8 +404,12 @@ def view(page: ft.Page, request_no: str = ""):
         tag = dd_part.value.split()[0]  # "#CU17"
         editing.update(src=tag[1:3], pid=int(tag[3:]))
 
-        current_total = part_qty(editing["src"], editing["pid"])
-        done = already_checked(editing["src"], editing["pid"])
+        planned = plan_cache.get((editing["src"], editing["pid"]))
+        if planned:
+            current_total, done = planned["total"], planned["done"]
+        else:
+            current_total = part_qty(editing["src"], editing["pid"])
+            done = already_checked(editing["src"], editing["pid"])
         total_lbl.value = f"Загальна к-сть партії: {current_total} шт."
         left_lbl.value = f"Ще потрібно перевірити: {max(0, need_sample(current_total) - done)} шт."
 
@@ -299,6 +438,9 @@ def view(page: ft.Page, request_no: str = ""):
             return
 
         if editing["id"] is not None:  # UPDATE
+            saved_id = editing["id"]
+            old = journal.get(saved_id)
+            delta = chk - int(old["checked_quantity"] or 0) if old else None
             db_exec(
                 """
                 UPDATE final_quality
@@ -309,7 +451,9 @@ def view(page: ft.Page, request_no: str = ""):
                 """,
                 (tf_insp.value, chk, acc, editing["id"]),
             )
-            art = db_fetch("SELECT article_code FROM final_quality WHERE id=%s", (editing["id"],))[0]["article_code"]
+            art = old["article_code"] if old else db_fetch(
+                "SELECT article_code FROM final_quality WHERE id=%s", (editing["id"],)
+            )[0]["article_code"]
             src, pid = editing["src"], editing["pid"]
         else:  # INSERT
             src, pid = editing["src"], editing["pid"]
@@ -325,7 +469,8 @@ def view(page: ft.Page, request_no: str = ""):
             )[0].values()
             ids = {"drying_id": None, "trimming_id": None, "cutting_id": None, "cleaning_id": None}
             ids[{"DR": "drying_id", "TR": "trimming_id", "CU": "cutting_id", "CL": "cleaning_id"}[src]] = pid
-            db_exec(
+            delta = chk
+            saved_id = db_exec(
                 """
                 INSERT INTO final_quality
                 (request_number,article_code,product_name,
@@ -354,11 +499,14 @@ def view(page: ft.Page, request_no: str = ""):
             push(f"Партія {pid} ({art}) заявки №{dd_req.value} пройшла ФКЯ та готова до передачі на склад")
 
         # ---------- check close ----------
-        check_request_closed(dd_req.value)
+        check_request_closed(dd_req.value, art)
 
         reset()
-        refresh_table()
-        reload_parts()
+        journal.refresh_one(saved_id)
+        if delta is None:
+            reload_parts()
+        else:
+            patch_plan(src, pid, delta)
 
     btn_save.on_click = save_record
     btn_cancel.on_click = lambda e: reset(full=False)
@@ -379,82 +527,87 @@ def view(page: ft.Page, request_no: str = ""):
             return "CU", rec["cutting_id"]
         return "CL", rec["cleaning_id"]
 
-    def refresh_table():
-        table.rows.clear()
-        # фільтруємо по вибраній заявці для зручності (як у trimming)
-        rows = (
-            db_fetch("SELECT * FROM final_quality WHERE request_number=%s ORDER BY id DESC", (dd_req.value,))
-            if dd_req.value
-            else db_fetch("SELECT * FROM final_quality ORDER BY id DESC LIMIT 60")
+    def make_row(r):
+        # обчислюємо К-сть партії за джерелом запису і виводимо Брак як total - accepted
+        src, pid = _row_src_pid(r)
+        tot = part_qty(src, pid)
+        defect = max(0, int(tot) - int(r["accepted_quantity"] or 0))
+
+        def make_edit_handler(rec):
+            def _edit(_e):
+                nonlocal current_total
+                editing["id"] = rec["id"]
+                # визначаємо джерело для підрахунків
+                src2, pid2 = _row_src_pid(rec)
+                editing.update(src=src2, pid=pid2)
+
+                dd_req.value = rec["request_number"]
+                reload_parts()
+                dd_part.value = ""      # змінювати партію при редагуванні заборонено
+                dd_part.disabled = True
+
+                # заповнюємо поля
+                current_total = part_qty(src2, pid2)
+                tf_insp.disabled = tf_chk.disabled = tf_def.disabled = tf_acc.disabled = False
+                tf_insp.value = rec["inspector_name"] or ""
+                tf_chk.value = str(rec["checked_quantity"])
+                # дефект = total - accepted (клацання старих записів теж коректно заповнить)
+                tf_def.value = str(max(0, current_total - int(rec["accepted_quantity"] or 0)))
+                tf_acc.read_only = True
+                recalc_accept()
+
+                btn_save.disabled = False
+                btn_cancel.visible = True
+                total_lbl.value = ""
+                left_lbl.value = ""
+                page.update()
+            return _edit
+
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(str(r["id"]))),
+                ft.DataCell(ft.Text(r["request_number"])),
+                ft.DataCell(ft.Text(r["article_code"])),
+                ft.DataCell(ft.Text(r["product_name"] or "—")),
+                ft.DataCell(ft.Text(str(r["checked_quantity"]))),
+                ft.DataCell(ft.Text(str(r["accepted_quantity"]))),
+                ft.DataCell(ft.Text(str(defect))),
+                ft.DataCell(ft.Text(r["inspector_name"] or "—")),
+                ft.DataCell(
+                    ft.Row(
+                        [
+                            ft.IconButton(
+                                ft.icons.EDIT,
+                                tooltip="Редагувати",
+                                on_click=make_edit_handler(r),
+                            ),
+                            ft.IconButton(
+                                ft.icons.DELETE,
+                                tooltip="Видалити",
+                                icon_color=ft.colors.RED,
+                                on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid),
+                            ),
+                        ],
+                        spacing=4,
+                    )
+                ),
+            ]
         )
-        for r in rows:
-            # обчислюємо К-сть партії за джерелом запису і виводимо Брак як total - accepted
-            src, pid = _row_src_pid(r)
-            tot = part_qty(src, pid)
-            defect = max(0, int(tot) - int(r["accepted_quantity"] or 0))
-
-            def make_edit_handler(rec):
-                def _edit(_e):
-                    nonlocal current_total
-                    editing["id"] = rec["id"]
-                    # визначаємо джерело для підрахунків
-                    src2, pid2 = _row_src_pid(rec)
-                    editing.update(src=src2, pid=pid2)
-
-                    dd_req.value = rec["request_number"]
-                    reload_parts()
-                    dd_part.value = ""      # змінювати партію при редагуванні заборонено
-                    dd_part.disabled = True
-
-                    # заповнюємо поля
-                    current_total = part_qty(src2, pid2)
-                    tf_insp.disabled = tf_chk.disabled = tf_def.disabled = tf_acc.disabled = False
-                    tf_insp.value = rec["inspector_name"] or ""
-                    tf_chk.value = str(rec["checked_quantity"])
-                    # дефект = total - accepted (клацання старих записів теж коректно заповнить)
-                    tf_def.value = str(max(0, current_total - int(rec["accepted_quantity"] or 0)))
-                    tf_acc.read_only = True
-                    recalc_accept()
-
-                    btn_save.disabled = False
-                    btn_cancel.visible = True
-                    total_lbl.value = ""
-                    left_lbl.value = ""
-                    page.update()
-                return _edit
-
-            table.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(str(r["id"]))),
-                        ft.DataCell(ft.Text(r["request_number"])),
-                        ft.DataCell(ft.Text(r["article_code"])),
-                        ft.DataCell(ft.Text(r["product_name"] or "—")),
-                        ft.DataCell(ft.Text(str(r["checked_quantity"]))),
-                        ft.DataCell(ft.Text(str(r["accepted_quantity"]))),
-                        ft.DataCell(ft.Text(str(defect))),
-                        ft.DataCell(ft.Text(r["inspector_name"] or "—")),
-                        ft.DataCell(
-                            ft.Row(
-                                [
-                                    ft.IconButton(
-                                        ft.icons.EDIT,
-                                        tooltip="Редагувати",
-                                        on_click=make_edit_handler(r),
-                                    ),
-                                    ft.IconButton(
-                                        ft.icons.DELETE,
-                                        tooltip="Видалити",
-                                        icon_color=ft.colors.RED,
-                                        on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid),
-                                    ),
-                                ],
-                                spacing=4,
-                            )
-                        ),
-                    ]
-                )
-            )
+
+    def load_journal_rows():
+        # фільтруємо по вибраній заявці для зручності (як у trimming)
+        if dd_req.value:
+            return db_fetch("SELECT * FROM final_quality WHERE request_number=%s ORDER BY id DESC", (dd_req.value,))
+        return db_fetch("SELECT * FROM final_quality ORDER BY id DESC LIMIT 60")
+
+    journal = JournalTable(
+        table, make_row,
+        load_rows=load_journal_rows,
+        load_one=lambda rid: (db_fetch("SELECT * FROM final_quality WHERE id=%s", (rid,)) or [None])[0],
+    )
+
+    def refresh_table():
+        journal.reload()
         page.update()
 
     # ─── видалення (як у trimming.py) ─────────────────────
@@ -483,9 +636,16 @@ def view(page: ft.Page, request_no: str = ""):
             # якщо видаляємо поточний запис у режимі редагування — скинемо форму
             if editing["id"] == record_to_delete["id"]:
                 reset(full=False)
+            rec = journal.get(record_to_delete["id"])
             db_exec("DELETE FROM final_quality WHERE id=%s", (record_to_delete["id"],))
-            refresh_table()
-            reload_parts()
+            if dd_req.value:
+                invalidate_completion(dd_req.value)
+            journal.remove(record_to_delete["id"])
+            if rec and rec["request_number"] == dd_req.value:
+                src, pid = _row_src_pid(rec)
+                patch_plan(src, pid, -int(rec["checked_quantity"] or 0))
+            else:
+                reload_parts()
         record_to_delete["id"] = None
 
     # зміни полів, що впливають на автоперерахунок/доступність Зберегти
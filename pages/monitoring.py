@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import flet as ft
+from database import changes
 from database.db_manager import db_fetch
 from utils.logger import log
+from utils.ui_updates import schedule_update
 import monitoring_cards.stage_cards as stage_cards
 # Removed warehouse-related imports and constants since the "Склад" module is deprecated.
 
@@ -67,54 +69,92 @@ def _resolve_preselected_tab(page: ft.Page) -> int:
 
 def _go_back_one(page: ft.Page):
     """Повернутися на один екран назад (для деталей заявки)."""
+    changes.unwatch(page, "monitoring.details")
+    stage_cards.stop_drying_timer(page)
     if len(page.views) > 1:
         page.views.pop()
         page.update()
 
 def _go_back_to_home(page: ft.Page):
     """Очистити стек до головного меню (залишити root + home)."""
+    for key in WATCH_KEYS:
+        changes.unwatch(page, key)
+    stage_cards.stop_drying_timer(page)
     while len(page.views) > 2:
         page.views.pop()
     page.update()
 
 
 # ─── моніторингові списки ─────────────────────────────────────────────
-# Фільтрація за фактичним % із calculate_progress():
-#   active=True  -> показуємо лише ті, де pct < 100
-#   active=False -> показуємо лише ті, де pct >= 100
+# Фільтрація за фактичним % (stage_cards.requests_overview / calculate_progress):
+#   active=True  -> незакриті заявки, де pct < 100 (лише робочі журнали)
+#   active=False -> незакриті з pct >= 100 і всі закриті (is_closed) — лише тут
+#                   читається архів журналів (database/journal_archive)
+#
+# Відкриті списки підписані на database/changes: після запису в іншій сесії
+# перечитується лише зачеплена заявка, а її картка замінюється на місці.
+
+NO_REQUEST_TABLES = ("casting_no_request", "drying_no_request", "trimming_no_request",
+                     "cutting_no_request", "cleaning_no_request", "final_quality_no_request", "product_base")
+WATCH_KEYS = ("monitoring.requests.active", "monitoring.requests.closed",
+              "monitoring.no_request", "monitoring.details")
+
 
 def _requests_view(page: ft.Page, active: bool) -> ft.Column:
-    # Беремо всі унікальні заявки (без фільтра по stage)
-    rows = db_fetch(
-        "SELECT DISTINCT request_number FROM casting_requests ORDER BY request_number DESC"
-    )
+    grid = ft.ResponsiveRow(controls=[], spacing=12, run_spacing=12, expand=1)
+    empty = ft.Text("Немає заявок", color="#e2e8f0")
+    cards: dict[str, ft.Control] = {}
 
-    cards = []
-    for r in rows:
-        rn = r["request_number"]
-        pct = stage_cards.calculate_progress(rn)  # фактичний % по final_quality
-        # Фільтр за вкладкою
-        if active and pct >= 100:
-            continue
-        if not active and pct < 100:
-            continue
+    def _rows(rns: tuple[str, ...] | None = None) -> list[dict]:
+        # фактичний % по final_quality; архів — лише для закритих заявок
+        rows = [r for r in stage_cards.requests_overview(rns) if (r["pct"] < 100) == active]
+        if not active:
+            rows += stage_cards.requests_overview(rns, closed=True)
+            rows.sort(key=lambda r: r["request_number"], reverse=True)
+        return rows
 
-        stages = stage_cards.get_active_stages(rn)
-        cards.append(_build_request_card(page, rn, stages, pct))
+    def _card(r: dict) -> ft.Control:
+        return _build_request_card(page, r["request_number"], r["stages"], r["pct"])
 
-    if not cards:
-        cards = [ft.Text("Немає заявок", color="#e2e8f0")]
+    def _fill(rows: list[dict]):
+        # Усі унікальні заявки (без фільтра по stage) з % і активними етапами — одним проходом
+        cards.clear()
+        for r in rows:
+            cards[r["request_number"]] = _card(r)
+        grid.controls = list(cards.values()) or [empty]
+
+    def _patch(rows: list[dict], rns: set[str]):
+        controls = [c for c in grid.controls if c is not empty]
+        fresh = {r["request_number"]: r for r in rows}
+        for rn in rns:
+            old = cards.pop(rn, None)
+            r = fresh.get(rn)
+            new = _card(r) if r is not None else None
+            if old is not None and new is not None:
+                controls[controls.index(old)] = new
+            elif old is not None:
+                controls.remove(old)
+            elif new is not None:
+                controls.insert(0, new)
+            if new is not None:
+                cards[rn] = new
+        grid.controls = controls or [empty]
+
+    def _on_changes(batch: list[changes.Change]):
+        rns = {c.request_number for c in batch}
+        if None in rns:
+            _fill(_rows())
+        else:
+            _patch(_rows(tuple(sorted(rns))), rns)
+        schedule_update(page, grid)
+
+    _fill(_rows())
+    changes.watch(page, f"monitoring.requests.{'active' if active else 'closed'}", _on_changes,
+                  tables=stage_cards.AGGREGATE_TABLES)
 
     return ft.Column(
         scroll=ft.ScrollMode.AUTO,
-        controls=[
-            ft.ResponsiveRow(
-                controls=cards,
-                spacing=12,
-                run_spacing=12,
-                expand=1,
-            )
-        ],
+        controls=[grid],
     )
 
 
@@ -150,10 +190,36 @@ def _no_request_active_view(page: ft.Page) -> ft.Column:
     Активними вважаються ті, де потрібний етап не виконано (немає запису у відповідній таблиці).
     Виводимо картки з артикулом, назвою, переліком незавершених етапів та прогресом.
     """
-    # зібрати всі артикули, що мають відливки без заявки
+    grid = ft.ResponsiveRow(controls=_no_request_cards(page), spacing=12, run_spacing=12, expand=1)
+
+    def _on_changes(_batch: list[changes.Change]):
+        # увесь список — один запит, тож перечитуємо його цілком
+        grid.controls = _no_request_cards(page)
+        schedule_update(page, grid)
+
+    changes.watch(page, "monitoring.no_request", _on_changes, tables=NO_REQUEST_TABLES)
+    return ft.Column(
+        scroll=ft.ScrollMode.AUTO,
+        controls=[grid],
+    )
+
+
+def _no_request_cards(page: ft.Page) -> list[ft.Control]:
+    # один запит: артикули з відливками без заявки, прапорці етапів,
+    # наявність записів на кожному етапі і кількості для прогресу
     article_rows = db_fetch(
         """
-        SELECT co.article_code AS code, MAX(pb.name) AS name
+        SELECT co.article_code AS code, MAX(pb.name) AS name,
+               MAX(pb.drying_needed) AS drying_needed, MAX(pb.trimming_needed) AS trimming_needed,
+               MAX(pb.cutting_needed) AS cutting_needed, MAX(pb.cleaning_needed) AS cleaning_needed,
+               EXISTS (SELECT 1 FROM drying_no_request x   WHERE x.article_code = co.article_code) AS has_drying,
+               EXISTS (SELECT 1 FROM trimming_no_request x WHERE x.article_code = co.article_code) AS has_trimming,
+               EXISTS (SELECT 1 FROM cutting_no_request x  WHERE x.article_code = co.article_code) AS has_cutting,
+               EXISTS (SELECT 1 FROM cleaning_no_request x WHERE x.article_code = co.article_code) AS has_cleaning,
+               EXISTS (SELECT 1 FROM final_quality_no_request x WHERE x.article_code = co.article_code) AS has_final,
+               SUM(co.quantity - COALESCE(co.defect_quantity,0)) AS good_total,
+               (SELECT SUM(f.accepted_quantity) FROM final_quality_no_request f
+                 WHERE f.article_code = co.article_code) AS accepted
           FROM casting_no_request co
           JOIN product_base pb ON pb.article_code = co.article_code
       GROUP BY co.article_code
@@ -164,65 +230,25 @@ def _no_request_active_view(page: ft.Page) -> ft.Column:
     for ar in article_rows:
         code = ar["code"]
         name = ar.get("name") or ""
-        # отримати прапорці необхідних етапів
-        flags = db_fetch(
-            "SELECT drying_needed, trimming_needed, cutting_needed, cleaning_needed FROM product_base WHERE article_code=%s",
-            (code,),
-        )
-        if not flags:
-            continue
-        flag = flags[0]
         stages: list[str] = []
-        # для кожного етапу перевірити наявність записів
-        if flag.get("drying_needed"):
-            cnt = db_fetch(
-                "SELECT 1 FROM drying_no_request WHERE article_code=%s LIMIT 1",
-                (code,),
-            )
-            if not cnt:
-                stages.append("Сушка")
-        if flag.get("trimming_needed"):
-            cnt = db_fetch(
-                "SELECT 1 FROM trimming_no_request WHERE article_code=%s LIMIT 1",
-                (code,),
-            )
-            if not cnt:
-                stages.append("Обрізка")
-        if flag.get("cutting_needed"):
-            cnt = db_fetch(
-                "SELECT 1 FROM cutting_no_request WHERE article_code=%s LIMIT 1",
-                (code,),
-            )
-            if not cnt:
-                stages.append("Різка")
-        if flag.get("cleaning_needed"):
-            cnt = db_fetch(
-                "SELECT 1 FROM cleaning_no_request WHERE article_code=%s LIMIT 1",
-                (code,),
-            )
-            if not cnt:
-                stages.append("Зачистка")
+        # етап потрібен, але записів на ньому ще немає
+        for flag, has, label in (
+            ("drying_needed", "has_drying", "Сушка"),
+            ("trimming_needed", "has_trimming", "Обрізка"),
+            ("cutting_needed", "has_cutting", "Різка"),
+            ("cleaning_needed", "has_cleaning", "Зачистка"),
+        ):
+            if ar.get(flag) and not ar.get(has):
+                stages.append(label)
         # Фінальний КЯ завжди потрібен (для партій без заявки)
-        cnt = db_fetch(
-            "SELECT 1 FROM final_quality_no_request WHERE article_code=%s LIMIT 1",
-            (code,),
-        )
-        if not cnt:
+        if not ar.get("has_final"):
             stages.append("Фінальний К/Я")
         # якщо немає незавершених етапів — пропускаємо
         if not stages:
             continue
-        # обчислити прогрес за accepted_quantity/final_quality
-        good_total_row = db_fetch(
-            "SELECT SUM(quantity - COALESCE(defect_quantity,0)) AS v FROM casting_no_request WHERE article_code=%s",
-            (code,),
-        )
-        good_total = good_total_row[0].get("v") or 0
-        accepted_row = db_fetch(
-            "SELECT SUM(accepted_quantity) AS v FROM final_quality_no_request WHERE article_code=%s",
-            (code,),
-        )
-        accepted = accepted_row[0].get("v") or 0
+        # прогрес за accepted_quantity/final_quality
+        good_total = ar.get("good_total") or 0
+        accepted = ar.get("accepted") or 0
         pct = int(accepted / good_total * 100) if good_total else 0
         if pct > 100:
             pct = 100
@@ -230,17 +256,7 @@ def _no_request_active_view(page: ft.Page) -> ft.Column:
         cards.append(_build_no_request_card(page, code, name, stages, pct))
     if not cards:
         cards = [ft.Text("Немає активних етапів", color="#e2e8f0")]
-    return ft.Column(
-        scroll=ft.ScrollMode.AUTO,
-        controls=[
-            ft.ResponsiveRow(
-                controls=cards,
-                spacing=12,
-                run_spacing=12,
-                expand=1,
-            )
-        ],
-    )
+    return cards
 
 
 def _build_no_request_card(page: ft.Page, code: str, name: str, stages: list[str], pct: int) -> ft.Container:
@@ -269,6 +285,19 @@ def _build_no_request_card(page: ft.Page, code: str, name: str, stages: list[str
 def open_details(page: ft.Page, request_number: str):
     log(f"[monitoring] Open details for {request_number}", tag="monitoring")
     cards = stage_cards.build_all_stage_cards(request_number, page)
+    grid = ft.ResponsiveRow(
+        controls=cards,
+        spacing=12,
+        run_spacing=12,
+        expand=1,
+    )
+
+    def _on_changes(_batch: list[changes.Change]):
+        grid.controls = stage_cards.build_all_stage_cards(request_number, page)
+        schedule_update(page, grid)
+
+    changes.watch(page, "monitoring.details", _on_changes,
+                  tables=stage_cards.AGGREGATE_TABLES, request_number=request_number)
 
     detail_view = ft.View(
         route=f"/monitoring/{request_number}",
@@ -285,12 +314,7 @@ def open_details(page: ft.Page, request_number: str):
                 ft.Text("Моніторинг етапів", size=20, weight="bold"),
                 padding=10,
             ),
-            ft.ResponsiveRow(
-                controls=cards,
-                spacing=12,
-                run_spacing=12,
-                expand=1,
-            ),
+            grid,
         ],
         scroll=ft.ScrollMode.AUTO,
     )
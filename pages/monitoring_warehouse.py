@@ -7,6 +7,12 @@ import csv
 import io
 import flet as ft
 from database.db_manager import db_fetch
+from database import changes
+from database.result_cache import cached_fetch
+from database.executor import QuerySlot
+
+# Скільки карток заявок підвантажувати за раз у лівій колонці
+MASTER_PAGE_SIZE = 50
 
 
 # ─────────────────── helpers: безпечна робота з № заявки ───────────────────
@@ -19,21 +25,6 @@ def _norm_rn(v) -> str | None:
     return s or None
 
 
-def _safe_union_sorted_keys(*dicts) -> list[str]:
-    """
-    Об'єднати ключі словників, прибрати None, відсортувати за рядком у зворотному порядку.
-    Уніфіковано, щоб не падати на порівнянні str ↔ NoneType.
-    """
-    keys = set()
-    for d in dicts:
-        try:
-            keys |= set(d.keys())
-        except Exception:
-            pass
-    clean = [k for k in keys if _norm_rn(k) is not None]
-    return sorted((str(k) for k in clean), key=str, reverse=True)
-
-
 # ─────────────────── інші утиліти ───────────────────
 
 def _fmt_int(x):
@@ -284,124 +275,179 @@ def warehouse_view(page: ft.Page) -> ft.Row:
         return where, tuple(params), request_only
 
     # ── побудова списку заявок
-    def _load_master():
-        nonlocal selected_request
-
-        where_recv, params, request_only = _where_recv_and_params()
+    slot_master = QuerySlot(page, name="warehouse.master")
+    slot_details = QuerySlot(page, name="warehouse.details")
+    slot_live = QuerySlot(page, name="warehouse.live")
+    master = {"offset": 0, "cards": {}}
+    btn_more = ft.TextButton("Показати ще", icon=ft.icons.EXPAND_MORE,
+                             on_click=lambda e: _load_master(reset=False))
+
+    def _master_sql():
+        """
+        Один запит: план (casting_requests) ⟗ передано (warehouse_moves) по заявці,
+        з фільтром «Лише із потребою», сортуванням і пагінацією на боці MySQL.
+        Повертає: sql, params, request_only
+        """
+        where_recv, params_recv, request_only = _where_recv_and_params()
 
-        # План по заявках (нормалізуємо ключі)
+        where_plan, params_plan = "", ()
         if request_only:
-            plan_rows = db_fetch(
-                "SELECT request_number, SUM(quantity) AS plan_qty "
-                "FROM casting_requests WHERE request_number = %s GROUP BY request_number",
-                (request_only,)
-            )
-        else:
-            plan_rows = db_fetch(
-                "SELECT request_number, SUM(quantity) AS plan_qty "
-                "FROM casting_requests GROUP BY request_number"
-            )
-        plan: dict[str, int] = {}
-        for r in plan_rows:
-            k = _norm_rn(r.get("request_number"))
-            if k is not None:
-                plan[k] = r.get("plan_qty") or 0
-
-        # Передано по заявках (з урахуванням фільтрів; ключі нормалізуємо)
-        recv_rows = db_fetch(
-            f"SELECT request_number, SUM(qty) AS recv_qty "
-            f"FROM warehouse_moves {where_recv} GROUP BY request_number",
-            params
+            where_plan, params_plan = "WHERE request_number = %s", (request_only,)
+
+        having = "HAVING SUM(u.plan_qty) - SUM(u.recv_qty) > 0" if cb_only_need.value else ""
+
+        sql = f"""
+            SELECT u.rn AS request_number,
+                   SUM(u.plan_qty) AS plan_qty,
+                   SUM(u.recv_qty) AS recv_qty
+              FROM (
+                    SELECT TRIM(request_number) AS rn, quantity AS plan_qty, 0 AS recv_qty
+                      FROM casting_requests {where_plan}
+                    UNION ALL
+                    SELECT TRIM(request_number) AS rn, 0 AS plan_qty, qty AS recv_qty
+                      FROM warehouse_moves {where_recv}
+                   ) u
+             WHERE u.rn IS NOT NULL AND u.rn <> ''
+             GROUP BY u.rn
+             {having}
+             ORDER BY u.rn DESC
+             LIMIT %s OFFSET %s
+        """
+        return sql, params_plan + params_recv, request_only
+
+    def _card_border(rn: str):
+        return ft.border.all(2, "#3b82f6") if rn == selected_request else ft.border.all(1, "#1f2937")
+
+    def _make_card(rn: str, p: int, r: int) -> ft.Container:
+        need = max(0, p - r)  # Потреба не менше 0
+        pct = 0 if p == 0 else min(100, round(100 * r / p))
+        return ft.Container(
+            bgcolor="#0b1220",
+            border_radius=10,
+            padding=10,
+            border=_card_border(rn),
+            on_click=lambda e, req=rn: _load_details(req),
+            content=ft.Column(
+                tight=True, spacing=6,
+                controls=[
+                    ft.Text(f"Заявка №{rn}", size=16, weight="bold", color="#ffffff"),
+                    ft.Row([ft.Text(f"{pct}%", color="#22d3ee")],
+                           alignment=ft.MainAxisAlignment.END),
+                    ft.ProgressBar(value=pct / 100 if p else 0),
+                    ft.Row(
+                        [
+                            ft.Text(f"План: {_fmt_int(p)}", color="#94a3b8"),
+                            ft.Text(f"Передано: {_fmt_int(r)}", color="#94a3b8"),
+                            ft.Text(f"Потреба: {_fmt_int(need)}", color="#94a3b8"),
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                    ),
+                ],
+            ),
         )
-        recv: dict[str, int] = {}
-        for r in recv_rows:
-            k = _norm_rn(r.get("request_number"))
-            if k is not None:
-                recv[k] = r.get("recv_qty") or 0
 
-        # Перелік заявок: безпечне об'єднання/сортування
-        all_rn = _safe_union_sorted_keys(plan, recv)
+    def _load_master(reset: bool = True):
+        """
+        reset=True — перша сторінка (зміна фільтрів);
+        reset=False — «Показати ще»: дочитуємо наступну сторінку і лише додаємо картки.
+        Запит іде у фоновому потоці, картки застосовуються одним page.update().
+        """
+        sql, params, request_only = _master_sql()
+        offset = 0 if reset else master["offset"]
+        # +1 рядок — щоб дізнатися, чи є наступна сторінка, без окремого COUNT(*)
+        slot_master.run(
+            lambda: cached_fetch(sql, params + (MASTER_PAGE_SIZE + 1, offset)),
+            apply=lambda rows: _apply_master(rows, reset, request_only),
+        )
 
-        # Якщо ввели конкретну заявку — показуємо лише її (якщо є в плані або рухах)
-        if request_only:
-            ro = _norm_rn(request_only)
-            all_rn = [ro] if (ro in plan or ro in recv) else []
-
-        list_requests.controls.clear()
-        shown = 0
-        for rn in all_rn:
-            p, r = plan.get(rn, 0), recv.get(rn, 0)
-            need = max(0, p - r)  # Потреба не менше 0
-            if cb_only_need.value and need <= 0:
+    def _apply_master(rows: list[dict], reset: bool, request_only: str | None):
+        if reset:
+            master["offset"] = 0
+            master["cards"] = {}
+            list_requests.controls.clear()
+        elif btn_more in list_requests.controls:
+            list_requests.controls.remove(btn_more)
+
+        has_more = len(rows) > MASTER_PAGE_SIZE
+        rows = rows[:MASTER_PAGE_SIZE]
+
+        # Якщо ввели конкретну заявку — показуємо лише її
+        ro = _norm_rn(request_only)
+        for row in rows:
+            rn = _norm_rn(row.get("request_number"))
+            if rn is None or (ro is not None and rn != ro):
                 continue
-            pct = 0 if p == 0 else min(100, round(100 * r / p))
-
-            row = ft.Container(
-                bgcolor="#0b1220",
-                border_radius=10,
-                padding=10,
-                border=ft.border.all(2, "#3b82f6") if rn == selected_request else ft.border.all(1, "#1f2937"),
-                on_click=lambda e, req=rn: _load_details(req),
-                content=ft.Column(
-                    tight=True, spacing=6,
-                    controls=[
-                        ft.Text(f"Заявка №{rn}", size=16, weight="bold", color="#ffffff"),
-                        ft.Row([ft.Text(f"{pct}%", color="#22d3ee")],
-                               alignment=ft.MainAxisAlignment.END),
-                        ft.ProgressBar(value=pct / 100 if p else 0),
-                        ft.Row(
-                            [
-                                ft.Text(f"План: {_fmt_int(p)}", color="#94a3b8"),
-                                ft.Text(f"Передано: {_fmt_int(r)}", color="#94a3b8"),
-                                ft.Text(f"Потреба: {_fmt_int(need)}", color="#94a3b8"),
-                            ],
-                            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                        ),
-                    ],
-                ),
-            )
-            list_requests.controls.append(row)
-            shown += 1
+            card = _make_card(rn, int(row.get("plan_qty") or 0), int(row.get("recv_qty") or 0))
+            master["cards"][rn] = card
+            list_requests.controls.append(card)
 
-        requests_count.value = f"{shown} заявок"
-        page.update()
+        master["offset"] += len(rows)
+        if has_more:
+            list_requests.controls.append(btn_more)
+
+        shown = len(master["cards"])
+        requests_count.value = f"{shown}+ заявок" if has_more else f"{shown} заявок"
+
+    def _highlight_selected():
+        """Підсвітити вибрану заявку без повторного запиту списку."""
+        for rn, card in master["cards"].items():
+            card.border = _card_border(rn)
 
     # ── завантаження деталей заявки
     def _load_details(request_number: str):
-        nonlocal selected_request, last_articles_csv, last_moves_csv
+        nonlocal selected_request
         selected_request = request_number
         details_title.value = f"Деталі заявки №{request_number}"
+        _highlight_selected()
 
         where_recv, params_base, _ = _where_recv_and_params()
         where_recv_req = where_recv + " AND request_number = %s"
         params = params_base + (request_number,)
 
-        # План по артикулах
-        rows_plan = db_fetch(
-            """
-            SELECT cr.article_code,
-                   SUM(cr.quantity) AS plan_qty,
-                   COALESCE(pb.name,'') AS product_name
-            FROM casting_requests cr
-            LEFT JOIN product_base pb ON pb.article_code = cr.article_code
-            WHERE cr.request_number = %s
-            GROUP BY cr.article_code, pb.name
-            """,
-            (request_number,),
-        )
-        plan_by_art = {r["article_code"]: {"plan_qty": r["plan_qty"] or 0, "name": r["product_name"]} for r in rows_plan}
+        def _fetch():
+            # План по артикулах (план/передано — спільний кеш, скидається записом у таблиці)
+            rows_plan = cached_fetch(
+                """
+                SELECT cr.article_code,
+                       SUM(cr.quantity) AS plan_qty,
+                       COALESCE(pb.name,'') AS product_name
+                FROM casting_requests cr
+                LEFT JOIN product_base pb ON pb.article_code = cr.article_code
+                WHERE cr.request_number = %s
+                GROUP BY cr.article_code, pb.name
+                """,
+                (request_number,),
+            )
+            # Передано по артикулах
+            rows_recv = cached_fetch(
+                f"""
+                SELECT article_code, SUM(qty) AS recv_qty, MAX(product_name) AS product_name
+                FROM warehouse_moves
+                {where_recv_req}
+                GROUP BY article_code
+                ORDER BY article_code
+                """,
+                params,
+            )
+            # Останні рухи (без location, з ПІБ Робітника)
+            rows_moves = db_fetch(
+                f"""
+                SELECT move_time, article_code, product_name, qty,
+                       operator_name, reason
+                FROM warehouse_moves
+                {where_recv_req}
+                ORDER BY move_time DESC
+                LIMIT 300
+                """,
+                params,
+            )
+            return rows_plan, rows_recv, rows_moves
 
-        # Передано по артикулах
-        rows_recv = db_fetch(
-            f"""
-            SELECT article_code, SUM(qty) AS recv_qty, MAX(product_name) AS product_name
-            FROM warehouse_moves
-            {where_recv_req}
-            GROUP BY article_code
-            ORDER BY article_code
-            """,
-            params,
-        )
+        slot_details.run(_fetch, apply=lambda res: _apply_details(*res))
+
+    def _apply_details(rows_plan: list[dict], rows_recv: list[dict], rows_moves: list[dict]):
+        nonlocal last_articles_csv, last_moves_csv
+        plan_by_art = {r["article_code"]: {"plan_qty": r["plan_qty"] or 0, "name": r["product_name"]} for r in rows_plan}
         recv_by_art = {r["article_code"]: {"recv_qty": r["recv_qty"] or 0, "name": r["product_name"]} for r in rows_recv}
 
         # Таблиця по артикулах
@@ -436,18 +482,6 @@ def warehouse_view(page: ft.Page) -> ft.Row:
             ft.Text(f"Потреба: {_fmt_int(tot_need)}", color="#f59e0b" if tot_need > 0 else "#22c55e"),
         ]
 
-        # Останні рухи (без location, з ПІБ Робітника)
-        rows_moves = db_fetch(
-            f"""
-            SELECT move_time, article_code, product_name, qty,
-                   operator_name, reason
-            FROM warehouse_moves
-            {where_recv_req}
-            ORDER BY move_time DESC
-            LIMIT 300
-            """,
-            params,
-        )
         tbl_moves.rows.clear()
         last_moves_csv = []
         for r in rows_moves:
@@ -467,9 +501,6 @@ def warehouse_view(page: ft.Page) -> ft.Row:
                 r.get("operator_name") or "", r.get("reason") or ""
             ])
 
-        _load_master()  # підсвітити вибрану
-        page.update()
-
     # ── Експорт
     def _export_articles():
         if last_articles_csv and selected_request:
@@ -483,6 +514,58 @@ def warehouse_view(page: ft.Page) -> ft.Row:
                         ["Час", "Артикул", "Найменування", "К-сть", "ПІБ Робітника", "Коментар"],
                         last_moves_csv)
 
+    # ── оновлення після записів з інших сесій (database/changes)
+    def _refresh_requests(rns: list[str]):
+        """План/передано лише для цих заявок; їхні картки замінюються на місці."""
+        where_recv, params_recv, _ = _where_recv_and_params()
+        ph = ",".join(["%s"] * len(rns))
+        sql = f"""
+            SELECT u.rn AS request_number,
+                   SUM(u.plan_qty) AS plan_qty,
+                   SUM(u.recv_qty) AS recv_qty
+              FROM (
+                    SELECT TRIM(request_number) AS rn, quantity AS plan_qty, 0 AS recv_qty
+                      FROM casting_requests WHERE request_number IN ({ph})
+                    UNION ALL
+                    SELECT TRIM(request_number) AS rn, 0 AS plan_qty, qty AS recv_qty
+                      FROM warehouse_moves {where_recv} AND request_number IN ({ph})
+                   ) u
+             GROUP BY u.rn
+        """
+        slot_live.run(
+            lambda: cached_fetch(sql, tuple(rns) + params_recv + tuple(rns)),
+            apply=_apply_refresh,
+        )
+
+    def _apply_refresh(rows: list[dict]):
+        for row in rows:
+            rn = _norm_rn(row.get("request_number"))
+            old = master["cards"].get(rn)
+            if old is None or old not in list_requests.controls:
+                continue
+            p, r = int(row.get("plan_qty") or 0), int(row.get("recv_qty") or 0)
+            if cb_only_need.value and p - r <= 0:
+                list_requests.controls.remove(old)
+                del master["cards"][rn]
+                continue
+            card = _make_card(rn, p, r)
+            list_requests.controls[list_requests.controls.index(old)] = card
+            master["cards"][rn] = card
+
+    def _on_changes(batch: list[changes.Change]):
+        rns = {c.request_number for c in batch}
+        known = {rn for rn in rns if rn in master["cards"]}
+        if None in rns or known != rns:
+            # нова заявка або невідомо яка — перечитуємо першу сторінку списку
+            _load_master(reset=True)
+        else:
+            _refresh_requests(sorted(rns))
+        if selected_request and (None in rns or selected_request in rns):
+            _load_details(selected_request)
+
+    changes.watch(page, "warehouse", _on_changes,
+                  tables=("warehouse_moves", "casting_requests", "product_base"))
+
     # ── Застосування фільтрів
     def _apply_filters():
         _load_master()
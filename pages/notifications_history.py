@@ -19,6 +19,9 @@ def view(page: ft.Page, user_key: str) -> ft.View:
         width=180,
     )
 
+    # старші сповіщення ретеншн переносить в архів — шукаємо там лише на вимогу
+    archive_cb = ft.Checkbox(label="Включно з архівом", value=False, on_change=lambda e: load(reset=True))
+
     mark_all_btn = ft.TextButton("Позначити видимі як прочитані", icon=ft.icons.DONE_ALL)
     back_btn = ft.TextButton("Назад", icon=ft.icons.ARROW_BACK, on_click=lambda e: (page.views.pop(), page.update()))
     more_btn = ft.FilledButton("Показати ще", on_click=lambda e: load(reset=False))
@@ -87,7 +90,7 @@ def view(page: ft.Page, user_key: str) -> ft.View:
 
         q = (search.value or "").strip() or None
         limit = int(page_size_dd.value or 100)
-        rows = notif.history(user_key, q=q, limit=limit, offset=offset)
+        rows = notif.history(user_key, q=q, limit=limit, offset=offset, include_archive=bool(archive_cb.value))
         last_batch_ids = [int(r["id"]) for r in rows] if rows else []
         list_col.controls.extend(render_rows(rows))
         offset += len(rows)
@@ -111,7 +114,7 @@ def view(page: ft.Page, user_key: str) -> ft.View:
         controls=[
             ft.Container(
                 ft.Row(
-                    [title, ft.Container(expand=True), search, page_size_dd, mark_all_btn],
+                    [title, ft.Container(expand=True), search, archive_cb, page_size_dd, mark_all_btn],
                     vertical_alignment="center",
                     spacing=12,
                 ),
@@ -74,31 +74,8 @@ FIELDS = [
 def _tab_main(page: ft.Page) -> ft.Column:
     product_list = ft.Column(scroll=ft.ScrollMode.ADAPTIVE)
 
-    # Ensure both product_base and product_base_old contain the weight_g column and
-    # that it uses a DECIMAL type to preserve fractional grams.  Avoid the
-    # unsupported IF NOT EXISTS syntax on MySQL versions prior to 8.  We query
-    # information_schema to decide whether to add the column.  When the column
-    # already exists, no ALTER is attempted.
-    try:
-        # Ensure both product tables have weight_g column with DECIMAL type.  We add the column
-        # if missing, and migrate it from INT to DECIMAL if required.  This makes sure that
-        # fractional grams are stored correctly and not rounded.
-        for tbl in ("product_base", "product_base_old"):
-            rows = db_fetch(
-                "SELECT DATA_TYPE FROM information_schema.COLUMNS "
-                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME='weight_g'",
-                (tbl,)
-            )
-            if not rows:
-                # column missing -> add as DECIMAL(10,3)
-                db_exec(f"ALTER TABLE {tbl} ADD COLUMN weight_g DECIMAL(10,3) NULL")
-            else:
-                dt = rows[0].get("DATA_TYPE", "").lower()
-                if dt.startswith("int"):
-                    # convert INT to DECIMAL preserving NULL
-                    db_exec(f"ALTER TABLE {tbl} MODIFY COLUMN weight_g DECIMAL(10,3) NULL")
-    except Exception:
-        pass
+    # weight_g (DECIMAL(10,3)) у product_base/product_base_old гарантує database/bootstrap
+    # (TABLES + міграція 0005), тож при відкритті вкладки DDL не виконується.
     selected_product_code = None
     is_editing = False
 
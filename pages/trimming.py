@@ -1,8 +1,9 @@
 # pages/trimming.py
 import flet as ft
 from datetime import datetime
-from database.db_manager import connect_db
+from database.db_manager import connect_db, db_exec
 import compat
+from components.journal_table import JournalTable
 
 # ────────── DB helpers ──────────
 def db_fetch(sql, p=None):
@@ -11,47 +12,36 @@ def db_fetch(sql, p=None):
         cu.execute(sql, p or ())
         return cu.fetchall()
 
-def db_exec(sql, p=None):
-    with connect_db() as cn:
-        cu = cn.cursor()
-        cu.execute(sql, p or ())
-        cn.commit()
-
-# перевірка наявності created_at у таблиці trimming
-with connect_db() as _cn:
-    _c = _cn.cursor()
-    _c.execute("SHOW COLUMNS FROM trimming LIKE 'created_at'")
-    HAS_CREATED_AT = _c.fetchone() is not None
+# created_at у trimming гарантує database/bootstrap (TABLES["trimming"])
 
 # ────────── допоміжні функції ──────────
 def get_product_name(code: str) -> str:
     row = db_fetch("SELECT name FROM product_base WHERE article_code=%s LIMIT 1", (code,))
     return row[0]["name"] if row else "-"
 
-def accepted_after_quality(req: str, code: str) -> int:
-    """Скільки прийнято після контролю якості лиття."""
-    row = db_fetch(
-        """
+# план цих запитів перевіряє tests/test_explain.py (покриваючі індекси *_req_art_qty)
+ACCEPTED_AFTER_QUALITY_SQL = """
         SELECT COALESCE(SUM(accepted_quantity),0) AS a
           FROM casting_quality
          WHERE request_number=%s
            AND article_code=%s
-        """,
-        (req, code),
-    )
-    return int(row[0]["a"]) if row else 0
-
-def already_trimmed(req: str, code: str) -> int:
-    """Скільки вже обрізано."""
-    row = db_fetch(
         """
+
+ALREADY_TRIMMED_SQL = """
         SELECT COALESCE(SUM(processed_quantity),0) AS s
           FROM trimming
          WHERE request_number=%s
            AND article_code=%s
-        """,
-        (req, code),
-    )
+        """
+
+def accepted_after_quality(req: str, code: str) -> int:
+    """Скільки прийнято після контролю якості лиття."""
+    row = db_fetch(ACCEPTED_AFTER_QUALITY_SQL, (req, code))
+    return int(row[0]["a"]) if row else 0
+
+def already_trimmed(req: str, code: str) -> int:
+    """Скільки вже обрізано."""
+    row = db_fetch(ALREADY_TRIMMED_SQL, (req, code))
     return int(row[0]["s"]) if row else 0
 
 # ───────────────────── View ─────────────────────
@@ -115,78 +105,82 @@ def view(page: ft.Page, request_no: str = ""):
         rows=[],
     )
 
-    def refresh_table():
-        table.rows.clear()
-        rows = (
+    def make_row(r):
+        total  = r["processed_quantity"]
+        defect = r["defect_quantity"] or 0
+        perc   = f"{defect * 100 / total:.1f} %" if total else "0 %"
+        date_s = (
+            r["created_at"].strftime("%d.%m.%Y %H:%M")
+            if r.get("created_at")
+            else "—"
+        )
+
+        def make_edit_handler(rec):
+            def _edit(_e):
+                editing_id["id"] = rec["id"]
+                dd_request.value    = rec["request_number"]
+                dd_request.disabled = True
+                dd_article.options  = [
+                    ft.dropdown.Option(f"{rec['article_code']} ({rec['product_name']})")
+                ]
+                dd_article.value    = dd_article.options[0].value
+                dd_article.disabled = True
+                tf_operator.value   = rec["operator_name"] or ""
+                tf_qty.value        = str(rec["processed_quantity"])
+                tf_defect.value     = str(rec["defect_quantity"] or 0)
+                for f in (tf_operator, tf_qty, tf_defect):
+                    f.disabled = False
+                qty_left_lbl.value  = ""
+                btn_save.disabled   = False
+                btn_cancel.visible  = True
+                page.update()
+            return _edit
+
+        return ft.DataRow(cells=[
+            ft.DataCell(ft.Text(str(r["id"]))),
+            ft.DataCell(ft.Text(r["request_number"])),
+            ft.DataCell(ft.Text(r["article_code"])),
+            ft.DataCell(ft.Text(r["product_name"] or "—")),
+            ft.DataCell(ft.Text(str(total))),
+            ft.DataCell(ft.Text(str(defect))),
+            ft.DataCell(ft.Text(perc)),
+            ft.DataCell(ft.Text(r["operator_name"] or "—")),
+            ft.DataCell(ft.Text(date_s)),
+            ft.DataCell(
+                ft.Row(
+                    [
+                        ft.IconButton(
+                            ft.icons.EDIT,
+                            tooltip="Редагувати",
+                            on_click=make_edit_handler(r),
+                        ),
+                        ft.IconButton(
+                            ft.icons.DELETE,
+                            tooltip="Видалити",
+                            icon_color=ft.colors.RED,
+                            on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid),
+                        ),
+                    ],
+                    spacing=4,
+                )
+            ),
+        ])
+
+    journal = JournalTable(
+        table, make_row,
+        load_rows=lambda: (
             db_fetch(
                 "SELECT * FROM trimming WHERE request_number=%s ORDER BY id DESC",
                 (dd_request.value,),
             )
             if dd_request.value
             else []
-        )
-        for r in rows:
-            total  = r["processed_quantity"]
-            defect = r["defect_quantity"] or 0
-            perc   = f"{defect * 100 / total:.1f} %" if total else "0 %"
-            date_s = (
-                r["created_at"].strftime("%d.%m.%Y %H:%M")
-                if HAS_CREATED_AT and r.get("created_at")
-                else "—"
-            )
+        ),
+        load_one=lambda rid: (db_fetch("SELECT * FROM trimming WHERE id=%s", (rid,)) or [None])[0],
+    )
 
-            def make_edit_handler(rec):
-                def _edit(_e):
-                    editing_id["id"] = rec["id"]
-                    dd_request.value    = rec["request_number"]
-                    dd_request.disabled = True
-                    dd_article.options  = [
-                        ft.dropdown.Option(f"{rec['article_code']} ({rec['product_name']})")
-                    ]
-                    dd_article.value    = dd_article.options[0].value
-                    dd_article.disabled = True
-                    tf_operator.value   = rec["operator_name"] or ""
-                    tf_qty.value        = str(rec["processed_quantity"])
-                    tf_defect.value     = str(rec["defect_quantity"] or 0)
-                    for f in (tf_operator, tf_qty, tf_defect):
-                        f.disabled = False
-                    qty_left_lbl.value  = ""
-                    btn_save.disabled   = False
-                    btn_cancel.visible  = True
-                    page.update()
-                return _edit
-
-            table.rows.append(
-                ft.DataRow(cells=[
-                    ft.DataCell(ft.Text(str(r["id"]))),
-                    ft.DataCell(ft.Text(r["request_number"])),
-                    ft.DataCell(ft.Text(r["article_code"])),
-                    ft.DataCell(ft.Text(r["product_name"] or "—")),
-                    ft.DataCell(ft.Text(str(total))),
-                    ft.DataCell(ft.Text(str(defect))),
-                    ft.DataCell(ft.Text(perc)),
-                    ft.DataCell(ft.Text(r["operator_name"] or "—")),
-                    ft.DataCell(ft.Text(date_s)),
-                    ft.DataCell(
-                        ft.Row(
-                            [
-                                ft.IconButton(
-                                    ft.icons.EDIT,
-                                    tooltip="Редагувати",
-                                    on_click=make_edit_handler(r),
-                                ),
-                                ft.IconButton(
-                                    ft.icons.DELETE,
-                                    tooltip="Видалити",
-                                    icon_color=ft.colors.RED,
-                                    on_click=lambda ev, rid=r["id"]: confirm_delete(ev, rid),
-                                ),
-                            ],
-                            spacing=4,
-                        )
-                    ),
-                ])
-            )
+    def refresh_table():
+        journal.reload()
         page.update()
 
     # ─── завантаження заявок ───────────────────────────
@@ -208,10 +202,14 @@ def view(page: ft.Page, request_no: str = ""):
     # ─── при зміні заявки ─────────────────────────────
     def on_request_change(e):
         reset_form()
+        reload_articles()
+        refresh_table()
+        page.update()
+
+    def reload_articles():
         dd_article.options.clear()
         if not dd_request.value:
-            refresh_table()
-            page.update()
+            dd_article.disabled = True
             return
 
         # доступно = accepted_after_quality − already_trimmed
@@ -233,8 +231,6 @@ def view(page: ft.Page, request_no: str = ""):
                 dd_article.options.append(ft.dropdown.Option(f"{code} ({r['name']})"))
 
         dd_article.disabled = not bool(dd_article.options)
-        refresh_table()
-        page.update()
 
     dd_request.on_change = on_request_change
 
@@ -268,6 +264,7 @@ def view(page: ft.Page, request_no: str = ""):
             page.update()
             return
 
+        saved_id = editing_id["id"]
         if editing_id["id"]:
             db_exec(
                 """
@@ -280,24 +277,26 @@ def view(page: ft.Page, request_no: str = ""):
                 (tf_operator.value, qty, defect, editing_id["id"]),
             )
         else:
-            cols   = "(request_number,article_code,product_name,operator_name,processed_quantity,defect_quantity"
-            vals   = "%s,%s,%s,%s,%s,%s"
-            params = [
-                dd_request.value,
-                code,
-                get_product_name(code),
-                tf_operator.value,
-                qty,
-                defect,
-            ]
-            if HAS_CREATED_AT:
-                cols += ",created_at"
-                vals += ",NOW()"
-            cols += ")"
-            db_exec(f"INSERT INTO trimming {cols} VALUES ({vals})", tuple(params))
+            saved_id = db_exec(
+                """
+                INSERT INTO trimming
+                (request_number,article_code,product_name,operator_name,processed_quantity,defect_quantity,created_at)
+                VALUES (%s,%s,%s,%s,%s,%s,NOW())
+                """,
+                (
+                    dd_request.value,
+                    code,
+                    get_product_name(code),
+                    tf_operator.value,
+                    qty,
+                    defect,
+                ),
+            )
 
         reset_form()
-        on_request_change(None)
+        reload_articles()
+        journal.refresh_one(saved_id)
+        page.update()
 
     btn_save.on_click   = save_record
     btn_cancel.on_click = lambda e: reset_form(full=False)
@@ -326,7 +325,9 @@ def view(page: ft.Page, request_no: str = ""):
         page.update()
         if ok and record_to_delete["id"]:
             db_exec("DELETE FROM trimming WHERE id=%s", (record_to_delete["id"],))
-            on_request_change(None)
+            reload_articles()
+            journal.remove(record_to_delete["id"])
+            page.update()
         record_to_delete["id"] = None
 
     # ─── ініціалізація ─────────────────────────────────
@@ -0,0 +1,42 @@
+# tests/conftest.py
+"""
+Тести, що працюють з MySQL, запускаються лише на тестовій БД (як bench/):
+DB_NAME має закінчуватися на «_bench», інакше — skip.
+
+    DB_NAME=mpi_agro_bench python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def bench_db():
+    """Схема на тестовій БД; без драйвера, тестової БД або з'єднання — skip."""
+    pytest.importorskip("mysql.connector")
+    pytest.importorskip("dotenv")
+    from database.db_manager import DB_CONFIG, connect_db
+
+    name = DB_CONFIG.get("database") or ""
+    if not name.endswith("_bench"):
+        pytest.skip(f"DB_NAME={name!r} не схожа на тестову (очікується *_bench)")
+    try:
+        connect_db().close()
+    except Exception as e:
+        pytest.skip(f"тестова БД недоступна: {e}")
+
+    from database.bootstrap import ensure_schema
+    ensure_schema()
+    return name
+
+
+@pytest.fixture
+def plant(bench_db):
+    """Невеликий засіяний «завод» (bench.dataset) на кожен тест."""
+    from bench.dataset import seed_plant
+    return seed_plant(products=30, requests=12, notifications=200)
@@ -0,0 +1,69 @@
+# tests/test_changes.py
+"""Шина змін (database.changes) — без БД."""
+import threading
+
+from database import changes
+from database.changes import Change
+
+
+class _Page:
+    pass
+
+
+def _collect(page, **kw):
+    got, done = [], threading.Event()
+
+    def fn(batch):
+        got.extend(batch)
+        done.set()
+
+    changes.watch(page, "test", fn, tables=("casting",), delay=0.01, **kw)
+    return got, done
+
+
+def test_skip_own_ignores_writes_of_the_same_session():
+    mine, other = _Page(), _Page()
+    got, done = _collect(mine, skip_own=True)
+    try:
+        with changes.written_by(mine):
+            changes.publish([Change("casting", "insert", "R1", "A1", 1)])
+        with changes.written_by(other):
+            changes.publish([Change("casting", "insert", "R1", "A1", 2)])
+        assert done.wait(2)
+        assert [c.id for c in got] == [2]
+    finally:
+        changes.forget(mine)
+
+
+def test_insert_with_subquery_in_values_keeps_alignment():
+    sql = (
+        "INSERT INTO casting (request_number, article_code, product_name, quantity) "
+        "VALUES (%s, %s, (SELECT name FROM product_base WHERE article_code=%s LIMIT 1), %s)"
+    )
+    assert changes.parse_write(sql, ("R1", "A1", "A1", 5), last_id=7) == [
+        Change("casting", "insert", "R1", "A1", 7)
+    ]
+    sql = "INSERT INTO casting (quantity, request_number, article_code) VALUES (COALESCE(%s, 0), %s, %s)"
+    assert changes.parse_write(sql, (3, "R2", "A2")) == [Change("casting", "insert", "R2", "A2")]
+
+
+def test_insert_tail_is_not_a_row():
+    sql = "INSERT INTO t (request_number) VALUES (%s) ON DUPLICATE KEY UPDATE request_number = VALUES(request_number)"
+    assert changes.parse_write(sql, ("R1",)) == [Change("t", "insert", "R1")]
+
+
+def test_update_placeholders_in_expressions_shift_position():
+    sql = "UPDATE casting SET quantity = quantity + %s, article_code=%s WHERE id=%s"
+    assert changes.parse_write(sql, (2, "A9", 5)) == [
+        Change("casting", "update", None, "A9", 5),
+        Change("casting", "update", None, None, 5),     # старий артикул невідомий
+    ]
+    sql = "UPDATE casting SET quantity = IF(article_code=%s, 1, 0) WHERE request_number=%s"
+    assert changes.parse_write(sql, ("A1", "R1")) == [Change("casting", "update", "R1")]
+
+
+def test_ambiguous_write_falls_back_to_table():
+    sql = "DELETE FROM casting WHERE id IN (SELECT id FROM x WHERE request_number=%s)"
+    assert changes.parse_write(sql, ("R1",)) == [Change("casting", "delete")]
+    sql = "DELETE FROM casting WHERE request_number=%s OR article_code=%s"
+    assert changes.parse_write(sql, ("R1", "A1")) == [Change("casting", "delete")]
@@ -0,0 +1,22 @@
+# tests/test_executor.py
+"""Фоновий виконавець (database.executor): контекст викликача доходить до пулу."""
+from contextvars import ContextVar
+
+import pytest
+
+_var: ContextVar[str | None] = ContextVar("test_executor_var", default=None)
+
+
+def test_query_slot_worker_sees_caller_context():
+    pytest.importorskip("mysql.connector")
+    pytest.importorskip("dotenv")
+    from database.executor import QuerySlot, wait_idle
+
+    got = []
+    token = _var.set("action")
+    try:
+        QuerySlot(None).run(_var.get, apply=got.append)
+    finally:
+        _var.reset(token)
+    assert wait_idle(2)
+    assert got == ["action"]
@@ -0,0 +1,71 @@
+# tests/test_explain.py
+"""
+Плани «гарячих» агрегатів по (request_number, article_code).
+
+EXPLAIN виконується для тих самих рядків SQL, що і на сторінках (імпортуються
+з модулів), і перевіряє, що MySQL бере очікуваний складений індекс з
+bootstrap.TABLES, а для покриваючих — читає лише індекс («Using index»).
+Параметри — з реальної заявки засіяної БД, щоб оптимізатор бачив справжню
+селективність.
+"""
+import importlib
+
+import pytest
+
+# (назва, модуль, атрибут з SQL або фабрика SQL, її аргументи, параметри запиту,
+#  таблиця/аліас у плані, очікуваний індекс, покриваючий?)
+HOT_QUERIES: list[tuple] = [
+    ("trimming.accepted_after_quality", "pages.trimming", "ACCEPTED_AFTER_QUALITY_SQL", None, "req,art",
+     "casting_quality", "idx_cq_req_art_qty", True),
+    ("trimming.already_trimmed", "pages.trimming", "ALREADY_TRIMMED_SQL", None, "req,art",
+     "trimming", "idx_trim_req_art_qty", True),
+    ("final_quality._articles_completion (accepted)", "pages.final_quality", "accepted_sql", (1,), "req,art",
+     "final_quality", "idx_fq_req_art_qty", True),
+    ("final_quality._articles_completion (ready: drying)", "pages.final_quality", "ready_sql", ("drying", 1), "req,art",
+     "s", "idx_drying_req_art_qty", True),
+    ("final_quality._articles_completion (ready: trimming)", "pages.final_quality", "ready_sql", ("trimming", 1), "req,art",
+     "s", "idx_trim_req_art_qty", True),
+    ("final_quality._articles_completion (ready: cutting)", "pages.final_quality", "ready_sql", ("cutting", 1), "req,art",
+     "s", "idx_cut_req_art_qty", True),
+    ("final_quality._articles_completion (ready: cleaning)", "pages.final_quality", "ready_sql", ("cleaning", 1), "req,art",
+     "s", "idx_clean_req_art_qty", True),
+    # підзапит «виготовлено» фільтрує лише заявку, артикул — GROUP BY по тому ж індексу
+    ("casting.load_need (made)", "pages.casting", "NEED_SQL", None, "req,req",
+     "casting", "idx_casting_req_art_qty", True),
+    ("stage_cards._drying_min_remaining_minutes", "monitoring_cards.stage_cards", "DRYING_LEFT_SQL", None, "",
+     "drying", "idx_drying_end", False),
+]
+
+
+def _sql(module: str, attr: str, args) -> str:
+    obj = getattr(importlib.import_module(module), attr)
+    return obj(*args) if args is not None else obj
+
+
+@pytest.fixture(scope="module")
+def sample(bench_db):
+    pytest.importorskip("flet")
+    from bench.dataset import seed_plant
+    from database.db_manager import db_fetch
+
+    seed_plant(products=60, requests=40, notifications=100)
+    rows = db_fetch(
+        "SELECT request_number, article_code FROM casting "
+        "GROUP BY request_number, article_code ORDER BY COUNT(*) DESC LIMIT 1"
+    )
+    return rows[0]["request_number"], rows[0]["article_code"]
+
+
+@pytest.mark.parametrize("query", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_index(sample, query):
+    from database.db_manager import db_fetch
+
+    name, module, attr, args, params, table, expected, covering = query
+    values = {"req": sample[0], "art": sample[1]}
+    plan = db_fetch("EXPLAIN " + _sql(module, attr, args), tuple(values[p] for p in params.split(",") if p))
+    plan = [r for r in plan if r.get("table") == table]
+    assert plan, f"{name}: у плані немає таблиці {table}"
+    key, extra = plan[0].get("key"), plan[0].get("Extra") or ""
+    assert key == expected, f"{name}: key={key} (очікується {expected}) {extra}"
+    if covering:
+        assert "Using index" in extra, f"{name}: індекс не покриваючий: {extra}"
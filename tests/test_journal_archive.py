@@ -0,0 +1,107 @@
+# tests/test_journal_archive.py
+"""Закрита заявка після архівації журналів показується так само, як до неї."""
+import pytest
+
+REQ = "T-ARCH-1"
+ART = "T-ARCH-ART"
+
+
+def _closed_request():
+    from database.db_manager import db_exec
+
+    db_exec("INSERT INTO product_base (article_code, name) VALUES (%s, %s)", (ART, "Тестовий виріб"))
+    db_exec(
+        "INSERT INTO casting_requests (request_number, article_code, quantity, stage, request_date, "
+        "client, reason, is_closed) VALUES (%s, %s, 10, 'casting', CURDATE(), 'test', 'test', 1)",
+        (REQ, ART),
+    )
+    db_exec(
+        "INSERT INTO casting (request_number, article_code, product_name, quantity, defect_quantity) "
+        "VALUES (%s, %s, 'Тестовий виріб', 10, 0)",
+        (REQ, ART),
+    )
+    db_exec(
+        "INSERT INTO casting_quality (request_number, article_code, product_name, checked_quantity, "
+        "accepted_quantity, defect_quantity) VALUES (%s, %s, 'Тестовий виріб', 10, 10, 0)",
+        (REQ, ART),
+    )
+    db_exec(
+        "INSERT INTO final_quality (request_number, article_code, product_name, checked_quantity, "
+        "accepted_quantity) VALUES (%s, %s, 'Тестовий виріб', 10, 10)",
+        (REQ, ART),
+    )
+
+
+def _overview(rn: str) -> dict:
+    from monitoring_cards.stage_cards import requests_overview
+    return next(r for r in requests_overview((rn,), closed=True) if r["request_number"] == rn)
+
+
+def test_archived_request_still_shows_100_percent(plant):
+    pytest.importorskip("flet")
+    import monitoring_cards
+    from database import journal_archive
+    from database.db_manager import db_fetch
+    from monitoring_cards.details.stage_details import stage_summary
+    from monitoring_cards.stage_cards import calculate_progress
+
+    _closed_request()
+    assert _overview(REQ) == {"request_number": REQ, "pct": 100, "stages": []}
+
+    moved = journal_archive.archive_request(REQ)
+    assert moved["casting"] == 1 and moved["final_quality"] == 1
+    assert not db_fetch("SELECT id FROM casting WHERE request_number=%s", (REQ,))
+
+    # вкладка закритих, картки закритої заявки і діалоги деталей читають архів
+    assert _overview(REQ) == {"request_number": REQ, "pct": 100, "stages": []}
+    assert calculate_progress(REQ, history=True) == 100
+    assert [r["good"] for r in stage_summary("final_quality", REQ, history=True)] == [10]
+    assert len(monitoring_cards.load_request_snapshot(REQ, history=True)["casting"]) == 1
+    # без явної історії — лише робочі журнали
+    assert calculate_progress(REQ) == 0
+    assert not monitoring_cards.load_request_snapshot(REQ)["casting"]
+
+
+def test_active_overview_reads_live_tables_only(plant):
+    pytest.importorskip("flet")
+    from database import journal_archive
+    from monitoring_cards.stage_cards import requests_overview
+
+    journal_archive.archive_closed_requests()
+    closed = {r["request_number"] for r in requests_overview(closed=True)}
+    assert closed, "у засіві мають бути закриті заявки"
+    assert not closed & {r["request_number"] for r in requests_overview()}
+
+
+def test_rows_without_created_at_are_archived(plant):
+    pytest.importorskip("flet")
+    from database import journal_archive
+    from database.db_manager import db_exec, db_fetch
+
+    _closed_request()
+    # старі схеми cutting / cleaning: created_at DATETIME NULL
+    db_exec("ALTER TABLE cleaning MODIFY created_at DATETIME NULL")
+    try:
+        db_exec(
+            "INSERT INTO cleaning (request_number, article_code, product_name, processed_quantity, created_at) "
+            "VALUES (%s, %s, 'Тестовий виріб', 10, NULL)",
+            (REQ, ART),
+        )
+        moved = journal_archive.archive_request(REQ)
+    finally:
+        db_exec("UPDATE cleaning SET created_at = NOW() WHERE created_at IS NULL")
+        db_exec("ALTER TABLE cleaning MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP")
+    assert moved["cleaning"] == 1
+    assert db_fetch("SELECT created_at FROM cleaning_archive WHERE request_number=%s", (REQ,))[0]["created_at"]
+
+
+def test_archiving_keeps_overview_of_seeded_closed_requests(plant):
+    pytest.importorskip("flet")
+    from database import journal_archive
+    from monitoring_cards.stage_cards import requests_overview
+
+    before = {r["request_number"]: r for r in requests_overview(closed=True)}
+    archived = journal_archive.archive_closed_requests()
+    assert archived, "у засіві мають бути закриті заявки"
+    after = {r["request_number"]: r for r in requests_overview(closed=True)}
+    assert after == before
@@ -0,0 +1,58 @@
+# tests/test_migrations.py
+"""Невдала міграція не записується і не вимикає застосунок (крім REQUIRED_MIGRATIONS)."""
+import pytest
+
+
+class _Cursor:
+    """Мінімальний курсор: schema_migrations у пам'яті."""
+
+    def __init__(self):
+        self.applied: list[str] = []
+        self._rows: list[dict] = []
+
+    def execute(self, sql, params=()):
+        if sql.lstrip().startswith("SELECT version"):
+            self._rows = [{"version": v} for v in self.applied]
+        elif sql.lstrip().startswith("INSERT INTO `schema_migrations`"):
+            self.applied.append(params[0])
+
+    def fetchall(self):
+        return self._rows
+
+
+def _boom(cur):
+    raise RuntimeError("dirty table")
+
+
+@pytest.fixture
+def bootstrap(monkeypatch):
+    pytest.importorskip("mysql.connector")
+    pytest.importorskip("dotenv")
+    from database import bootstrap
+
+    notified = []
+    monkeypatch.setattr(bootstrap, "FAILED_MIGRATIONS", [])
+    monkeypatch.setattr(bootstrap, "_notify_failed_migration", lambda v, d: notified.append(v))
+    monkeypatch.setattr(bootstrap, "MIGRATIONS", [
+        ("9001", "ok", lambda cur: None),
+        ("9002", "fails", _boom),
+        ("9003", "after the failed one", lambda cur: None),
+    ])
+    bootstrap.notified = notified
+    return bootstrap
+
+
+def test_failed_migration_is_reported_not_raised(bootstrap):
+    cur = _Cursor()
+    assert bootstrap.run_migrations(cur) == ["9002"]
+    assert cur.applied == ["9001"]                 # 9002 не записана, 9003 чекає наступного запуску
+    assert [f[0] for f in bootstrap.FAILED_MIGRATIONS] == ["9002"]
+    assert bootstrap.notified == ["9002"]
+
+
+def test_required_migration_failure_raises(bootstrap, monkeypatch):
+    monkeypatch.setattr(bootstrap, "REQUIRED_MIGRATIONS", {"9002"})
+    cur = _Cursor()
+    with pytest.raises(RuntimeError):
+        bootstrap.run_migrations(cur)
+    assert cur.applied == ["9001"]
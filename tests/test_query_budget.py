@@ -0,0 +1,20 @@
+# tests/test_query_budget.py
+"""Ліміти SQL-запитів конструкторів екранів (bench.query_budget) як тест pytest."""
+import pytest
+
+from bench.query_budget import BUDGETS, DEFAULT_SIZES, measure, violations
+
+
+@pytest.fixture(scope="module")
+def runs(bench_db):
+    pytest.importorskip("flet")
+    from database import result_cache
+
+    prev = result_cache.ENABLED
+    yield measure(DEFAULT_SIZES)     # вимикає спільний кеш на час замірів
+    result_cache.enable(prev)
+
+
+@pytest.mark.parametrize("name", list(BUDGETS))
+def test_query_budget(runs, name):
+    assert violations(name, runs) == []
@@ -0,0 +1,24 @@
+# tests/test_query_profiler.py
+"""Відбитки SQL (database.query_profiler.fingerprint) — без БД."""
+import pytest
+
+from database.query_profiler import fingerprint
+
+
+@pytest.mark.parametrize("rows", [1, 2, 5])
+def test_multirow_values_with_functions_collapse(rows):
+    one = "(%s, %s, NOW(), COALESCE(%s, 0))"
+    sql = "INSERT INTO casting (request_number, article_code, created_at, quantity) VALUES " + ", ".join([one] * rows)
+    assert fingerprint(sql) == (
+        "insert into casting (request_number, article_code, created_at, quantity) values (?+)"
+    )
+
+
+def test_values_keeps_tail():
+    sql = "INSERT INTO t (a) VALUES (%s), (NOW()) ON DUPLICATE KEY UPDATE a = a + 1"
+    assert fingerprint(sql) == "insert into t (a) values (?+) on duplicate key update a = a + ?"
+
+
+def test_in_list_and_literals():
+    sql = "SELECT * FROM casting WHERE id IN (1, 2, 3) AND req='7'"
+    assert fingerprint(sql) == "select * from casting where id in (?+) and req=?"
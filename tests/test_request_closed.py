@@ -0,0 +1,22 @@
+# tests/test_request_closed.py
+"""«Заявка … завершена» публікується один раз на БД, а не на процес."""
+import pytest
+
+REQ = "T-CLOSE-1"
+
+
+def test_closed_notice_is_claimed_once(bench_db):
+    pytest.importorskip("flet")
+    from database.db_manager import db_exec
+    from pages import final_quality
+
+    db_exec("DELETE FROM casting_requests WHERE request_number=%s", (REQ,))
+    db_exec(
+        "INSERT INTO casting_requests (request_number, article_code, quantity, stage, request_date, client, reason) "
+        "VALUES (%s, 'T-CLOSE-ART', 1, 'casting', CURDATE(), 'test', 'test')",
+        (REQ,),
+    )
+    assert final_quality._claim_closed_notice(REQ)
+    # інше робоче місце (або цей процес після перезапуску) вже не публікує
+    final_quality.invalidate_completion(REQ)
+    assert not final_quality._claim_closed_notice(REQ)
@@ -1,5 +1,224 @@
-import datetime, sys
+# utils/logger.py
+"""
+Асинхронний структурований логер.
 
-def log(message: str, tag: str = "monitoring"):
-    ts = datetime.datetime.now().isoformat(" ", "seconds")
-    print(f"[{tag} {ts}] {message}", file=sys.stderr)
+log(message, tag) лишається тим самим фронтендом, але нічого не пише в
+потоці, що викликав: запис кладеться в обмежену чергу, фоновий потік
+вивантажує її пачками
+
+    * у файл JSON-рядками (ts, level, tag, msg, duration_ms, thread, …)
+      з ротацією за розміром (LOG_MAX_BYTES, LOG_BACKUPS);
+    * у stderr — як раніше, «[tag ts] message» (LOG_STDERR=0 вимикає,
+      LOG_STDERR_FORMAT=json — ті самі JSON-рядки).
+
+Якщо черга переповнена, запис відкидається (лічильник dropped потрапить
+у наступний запис), UI-потік ніколи не чекає на консоль/диск.
+
+Часті теги можна проріджувати (лише явно, за замовчуванням усе пишеться):
+LOG_SAMPLE="monitoring_cards=0.1,ui=0.5" — частка записів, що лишаються;
+warning/error не проріджуються.
+
+    log("Building stage cards", tag="monitoring_cards")
+    log("slow query", tag="db", level="warning", duration_ms=812, sql_fp="select …")
+    with timed("load_need", tag="casting"):
+        ...
+"""
+import atexit
+import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+_DEFAULT_DIR = Path(os.getenv("LOCALAPPDATA", str(Path.home()))) / "MPI Agro" / "logs"
+
+LOG_FILE = os.getenv("LOG_FILE", str(_DEFAULT_DIR / "app.jsonl"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "3"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_STDERR = os.getenv("LOG_STDERR", "1").lower() in ("1", "true", "yes")
+LOG_STDERR_FORMAT = os.getenv("LOG_STDERR_FORMAT", "text")
+
+LEVELS = ("debug", "info", "warning", "error")
+_UNSAMPLED = ("warning", "error")
+
+
+def _parse_sampling(spec: str) -> dict:
+    out = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        tag, rate = part.split("=", 1)
+        try:
+            out[tag.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            pass
+    return out
+
+
+SAMPLING = _parse_sampling(os.getenv("LOG_SAMPLE", ""))   # за замовчуванням без проріджування
+
+_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_lock = threading.Lock()
+_worker = None
+_dropped = 0
+_seen = {}          # tag → к-сть записів (для проріджування)
+_stats = {"written": 0, "dropped": 0, "sampled_out": 0}
+
+
+# ───────────────────────── фронтенд ─────────────────────────
+def _keep(tag: str, level: str) -> bool:
+    rate = SAMPLING.get(tag)
+    if rate is None or rate >= 1.0 or level in _UNSAMPLED:
+        return True
+    with _lock:
+        n = _seen.get(tag, 0)
+        _seen[tag] = n + 1
+    if rate <= 0.0:
+        return False
+    # кожен k-й запис: детерміновано, без random у гарячому шляху
+    return n % max(1, round(1 / rate)) == 0
+
+
+def log(message: str, tag: str = "monitoring", *, level: str = "info", duration_ms: float = None, **fields):
+    global _dropped
+    if not _keep(tag, level):
+        _stats["sampled_out"] += 1
+        return
+    rec = {
+        "ts": datetime.datetime.now().isoformat(" ", "milliseconds"),
+        "level": level if level in LEVELS else "info",
+        "tag": tag,
+        "msg": str(message),
+        "thread": threading.current_thread().name,
+    }
+    if duration_ms is not None:
+        rec["duration_ms"] = round(float(duration_ms), 2)
+    if fields:
+        rec.update(fields)
+    _ensure_worker()
+    with _lock:
+        if _dropped:
+            rec["dropped"] = _dropped
+        try:
+            _queue.put_nowait(rec)
+            _dropped = 0
+        except queue.Full:
+            _dropped += 1
+            _stats["dropped"] += 1
+
+
+@contextmanager
+def timed(message: str, tag: str = "monitoring", **fields):
+    """Записати тривалість блоку в duration_ms (і помилку, якщо була)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        log(f"{message}: {e}", tag=tag, level="error",
+            duration_ms=(time.perf_counter() - t0) * 1000, **fields)
+        raise
+    log(message, tag=tag, duration_ms=(time.perf_counter() - t0) * 1000, **fields)
+
+
+def stats() -> dict:
+    return dict(_stats, queued=_queue.qsize())
+
+
+def flush(timeout: float = 2.0) -> bool:
+    """Дочекатися, поки черга вивантажиться (напр. перед виходом). False — таймаут."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if _queue.unfinished_tasks == 0:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+# ───────────────────────── фоновий запис ─────────────────────────
+class _RotatingFile:
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._fh = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def write(self, lines: list):
+        if self._fh is None:
+            self._open()
+        self._fh.write("".join(lines))
+        self._fh.flush()
+        if self.max_bytes > 0 and self._fh.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._fh.close()
+        self._fh = None
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink(missing_ok=True)
+
+
+def _text_line(rec: dict) -> str:
+    extra = f" ({rec['duration_ms']} ms)" if "duration_ms" in rec else ""
+    lvl = "" if rec["level"] == "info" else f"{rec['level'].upper()} "
+    return f"[{rec['tag']} {rec['ts'][:19]}] {lvl}{rec['msg']}{extra}\n"
+
+
+def _drain():
+    out = None
+    if LOG_FILE:
+        try:
+            out = _RotatingFile(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUPS)
+        except Exception:
+            out = None
+    while True:
+        batch = [_queue.get()]
+        # забираємо все, що вже накопичилось, — один запис на диск на пачку
+        while len(batch) < 500:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            lines = [json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch]
+            if out is not None:
+                try:
+                    out.write(lines)
+                except Exception as e:
+                    out = None
+                    sys.stderr.write(f"[logger] file output disabled: {e}\n")
+            if LOG_STDERR or out is None:
+                sys.stderr.write("".join(lines) if LOG_STDERR_FORMAT == "json" else "".join(_text_line(r) for r in batch))
+            _stats["written"] += len(batch)
+        except Exception:
+            pass
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_drain, name="log-writer", daemon=True)
+            _worker.start()
+
+
+atexit.register(flush)
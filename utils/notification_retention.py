@@ -0,0 +1,175 @@
+# utils/notification_retention.py
+# -*- coding: utf-8 -*-
+"""
+Ретеншн сповіщень.
+
+* compact_reads() — для кожного користувача зсуває межу прочитаного
+  (notification_read_marks.last_id) до першого непрочитаного сповіщення
+  і видаляє з notification_reads рядки, що вже покриті межею.
+* archive_old()   — переносить сповіщення, старші за NOTIF_RETENTION_DAYS,
+  у notifications_archive.
+
+Усе виконується пачками по NOTIF_ARCHIVE_BATCH рядків, кожна пачка — окрема
+коротка транзакція, тож робочі запити не блокуються надовго.
+
+    python -m utils.notification_retention        # один прохід
+    start_background()                            # з лаунчера: раз на NOTIF_RETENTION_INTERVAL_H год
+
+Лаунчер запускає фоновий потік на кожному робочому місці, але прохід
+виконує лише процес, що взяв MySQL GET_LOCK('notif_retention').
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from database.db_manager import connect_db, named_lock
+from utils.logger import log
+
+RETENTION_DAYS = int(os.getenv("NOTIF_RETENTION_DAYS", "90"))
+BATCH_SIZE = max(1, int(os.getenv("NOTIF_ARCHIVE_BATCH", "1000")))
+INTERVAL_H = float(os.getenv("NOTIF_RETENTION_INTERVAL_H", "24"))
+
+
+def _fetchall(cu, sql: str, params: tuple = ()):
+    cu.execute(sql, params)
+    return cu.fetchall()
+
+
+# -------------------- межі прочитаного --------------------
+def compact_reads(batch: int = BATCH_SIZE) -> int:
+    """
+    Межа користувача = (перше непрочитане сповіщення вище поточної межі) − 1,
+    або MAX(id), якщо непрочитаних немає. Повертає к-сть видалених рядків reads.
+    """
+    removed = 0
+    with connect_db() as cn:
+        cu = cn.cursor(dictionary=True)
+        users = [r["user_key"] for r in _fetchall(cu, "SELECT DISTINCT user_key FROM notification_reads")]
+        for user in users:
+            rows = _fetchall(
+                cu,
+                """
+                SELECT COALESCE(w.last_id, 0) AS cur,
+                       (SELECT MIN(n.id)
+                          FROM notifications n
+                          LEFT JOIN notification_reads r
+                                 ON r.notification_id = n.id AND r.user_key = %s
+                         WHERE n.id > COALESCE(w.last_id, 0) AND r.id IS NULL) AS first_unread,
+                       (SELECT COALESCE(MAX(id), 0) FROM notifications) AS max_id
+                  FROM (SELECT %s AS user_key) u
+                  LEFT JOIN notification_read_marks w ON w.user_key = u.user_key
+                """,
+                (user, user),
+            )
+            cur_wm = int(rows[0]["cur"] or 0)
+            first_unread = rows[0]["first_unread"]
+            wm = int(first_unread) - 1 if first_unread is not None else int(rows[0]["max_id"] or 0)
+            wm = max(wm, cur_wm)
+            if wm > cur_wm:
+                cu.execute(
+                    "INSERT INTO notification_read_marks (user_key, last_id) VALUES (%s, %s) "
+                    "ON DUPLICATE KEY UPDATE last_id = GREATEST(last_id, VALUES(last_id))",
+                    (user, wm),
+                )
+                cn.commit()
+            # рядки під межею більше не потрібні
+            while True:
+                cu.execute(
+                    "DELETE FROM notification_reads WHERE user_key=%s AND notification_id <= %s LIMIT %s",
+                    (user, wm, int(batch)),
+                )
+                n = cu.rowcount or 0
+                cn.commit()
+                removed += n
+                if n < batch:
+                    break
+    return removed
+
+
+# -------------------- архів --------------------
+def archive_old(days: int = RETENTION_DAYS, batch: int = BATCH_SIZE, max_batches: int | None = None) -> int:
+    """Перенести сповіщення, старші за `days` днів, в архів. Повертає к-сть перенесених."""
+    moved = 0
+    done_batches = 0
+    cn = connect_db()
+    try:
+        cu = cn.cursor()
+        while max_batches is None or done_batches < max_batches:
+            cn.start_transaction()
+            cu.execute(
+                "SELECT id FROM notifications "
+                "WHERE created_at < NOW() - INTERVAL %s DAY "
+                "ORDER BY id LIMIT %s FOR UPDATE",
+                (int(days), int(batch)),
+            )
+            ids = [r[0] for r in cu.fetchall()]
+            if not ids:
+                cn.rollback()
+                break
+            ph = ",".join(["%s"] * len(ids))
+            cu.execute(
+                f"""
+                INSERT IGNORE INTO notifications_archive (id, message, level, src, created_at)
+                SELECT id, message, level, src, created_at FROM notifications WHERE id IN ({ph})
+                """,
+                tuple(ids),
+            )
+            # notification_reads цих id підуть каскадом (FK ON DELETE CASCADE)
+            cu.execute(f"DELETE FROM notifications WHERE id IN ({ph})", tuple(ids))
+            cn.commit()
+            moved += len(ids)
+            done_batches += 1
+            if len(ids) < batch:
+                break
+    except Exception:
+        cn.rollback()
+        raise
+    finally:
+        cn.close()
+    return moved
+
+
+def run_retention() -> dict:
+    """Один прохід: спершу межі прочитаного, потім архів."""
+    t0 = time.perf_counter()
+    compacted = compact_reads()
+    archived = archive_old()
+    res = {"reads_compacted": compacted, "archived": archived, "sec": round(time.perf_counter() - t0, 2)}
+    log(f"notifications retention: {res}", tag="retention")
+    return res
+
+
+# -------------------- фоновий потік --------------------
+_worker: threading.Thread | None = None
+
+
+def start_background(interval_h: float = INTERVAL_H) -> threading.Thread | None:
+    """Запустити періодичний ретеншн (один потік на процес)."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return _worker
+    if interval_h <= 0:
+        return None
+
+    def _loop():
+        while True:
+            try:
+                # один прохід на всю БД: решта робочих місць цей інтервал пропускає
+                with named_lock("notif_retention") as got:
+                    if got:
+                        run_retention()
+                    else:
+                        log("notifications retention: already running elsewhere", tag="retention", level="debug")
+            except Exception as e:
+                log(f"notifications retention failed: {e}", tag="retention")
+            time.sleep(interval_h * 3600)
+
+    _worker = threading.Thread(target=_loop, name="notif-retention", daemon=True)
+    _worker.start()
+    return _worker
+
+
+if __name__ == "__main__":
+    print(run_retention())
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from typing import Optional, Dict, List, Tuple
-from database.db_manager import connect_db
+from database.db_manager import connect_db, db_write
 
 
 # -------------------- низькорівневі хелпери --------------------
@@ -14,30 +14,19 @@ def _fetchall(sql: str, params: tuple = ()):
         return cur.fetchall()
 
 
+# записи разом із change_log в одній транзакції — банери інших ПК дізнаються одразу
 def _exec(sql: str, params: tuple = ()):
-    with connect_db() as cn:
-        cur = cn.cursor()
-        cur.execute(sql, params)
-        cn.commit()
-        return cur.rowcount
+    return db_write(sql, params)[1]
 
 
 def _exec_lastrowid(sql: str, params: tuple = ()):
-    with connect_db() as cn:
-        cur = cn.cursor()
-        cur.execute(sql, params)
-        cn.commit()
-        return cur.lastrowid
+    return db_write(sql, params)[0]
 
 
 def _exec_many(sql: str, params_seq: List[Tuple]):
     if not params_seq:
         return 0
-    with connect_db() as cn:
-        cur = cn.cursor()
-        cur.executemany(sql, params_seq)
-        cn.commit()
-        return cur.rowcount
+    return db_write(sql, params_seq, many=True)[1]
 
 
 def _current_db_name() -> str:
@@ -141,6 +130,17 @@ _SRC_CANDIDATES = ["src", "source"]   # app|system|banner|...
 _UNREAD_BOOL = ["is_read"]
 _READ_AT = ["read_at"]
 
+# Прочитаність для користувача: окремий рядок у notification_reads або id
+# нижче його межі в notification_read_marks (після ущільнення ретеншном).
+# Обидва JOIN беруть user_key параметром: (user_key, user_key).
+_READ_JOINS = """
+        LEFT JOIN notification_reads r
+               ON r.notification_id = n.id AND r.user_key = %s
+        LEFT JOIN notification_read_marks w
+               ON w.user_key = %s
+"""
+_IS_READ = "(r.id IS NOT NULL OR n.id <= COALESCE(w.last_id, 0))"
+
 
 def _select_message_expr(cols: Dict[str, Dict]) -> str:
     present = [c for c in _MESSAGE_CANDIDATES if c in cols]
@@ -202,6 +202,28 @@ def push(msg: str, *, level: str = "info", src: str = "app") -> Optional[int]:
     return _exec_lastrowid(sql, tuple(params))
 
 
+def push_once(msg: str, *, level: str = "info", src: str = "app") -> Optional[int]:
+    """
+    Як push(), але ідемпотентно: якщо таке ж повідомлення цього джерела вже є,
+    повертає його id і нового не створює.
+    Перевірка не атомарна і не бачить архів сповіщень — для «рівно один раз»
+    між робочими місцями потрібен власний прапорець у БД (див. final_quality).
+    """
+    _ensure_reads_table()
+    cols = _columns_meta()
+    msg_col = _pick_first_writable(cols, _MESSAGE_CANDIDATES)
+    src_col = next((s for s in _SRC_CANDIDATES if s in cols), None)
+    if msg_col:
+        where, params = f"{msg_col}=%s", [msg]
+        if src_col:
+            where += f" AND {src_col}=%s"
+            params.append(src)
+        rows = _fetchall(f"SELECT id FROM notifications WHERE {where} ORDER BY id DESC LIMIT 1", tuple(params))
+        if rows:
+            return int(rows[0]["id"])
+    return push(msg, level=level, src=src)
+
+
 # -------------------- публічні API: читання / статус --------------------
 def latest_id() -> int:
     _ensure_reads_table()
@@ -215,14 +237,13 @@ def unread_count(user_key: str) -> int:
     К-сть нотифікацій, які користувач ще не бачив (один раз на користувача).
     """
     _ensure_reads_table()
-    sql = """
+    sql = f"""
         SELECT COUNT(*) AS c
         FROM notifications n
-        LEFT JOIN notification_reads r
-               ON r.notification_id = n.id AND r.user_key = %s
-        WHERE r.id IS NULL
+        {_READ_JOINS}
+        WHERE NOT {_IS_READ}
     """
-    rows = _fetchall(sql, (user_key,))
+    rows = _fetchall(sql, (user_key, user_key))
     return int(rows[0]["c"] if rows else 0)
 
 
@@ -245,24 +266,31 @@ def recent(user_key: str, limit: int = 50, offset: int = 0) -> List[Dict]:
         f"{t_expr} AS dt",
         (level_name or "NULL") + " AS level",
         (src_name or "NULL") + " AS src",
-        "CASE WHEN r.id IS NULL THEN 0 ELSE 1 END AS is_read",
+        f"CASE WHEN {_IS_READ} THEN 1 ELSE 0 END AS is_read",
     ]
 
     sql = f"""
         SELECT {', '.join(sel_parts)}
         FROM notifications n
-        LEFT JOIN notification_reads r
-               ON r.notification_id=n.id AND r.user_key=%s
+        {_READ_JOINS}
         ORDER BY n.id DESC
         LIMIT %s OFFSET %s
     """
-    rows = _fetchall(sql, (user_key, int(limit), int(offset)))
+    rows = _fetchall(sql, (user_key, user_key, int(limit), int(offset)))
     return rows
 
 
-def history(user_key: str, q: Optional[str] = None, limit: int = 200, offset: int = 0) -> List[Dict]:
+def history(
+    user_key: str,
+    q: Optional[str] = None,
+    limit: int = 200,
+    offset: int = 0,
+    *,
+    include_archive: bool = False,
+) -> List[Dict]:
     """
     Повна історія з optional-пошуком по тексту (LIKE, case-insensitive).
+    include_archive=True — разом із notifications_archive (архівні вважаються прочитаними).
     """
     _ensure_reads_table()
     cols = _columns_meta()
@@ -279,23 +307,32 @@ def history(user_key: str, q: Optional[str] = None, limit: int = 200, offset: in
         f"{t_expr} AS dt",
         (level_name or "NULL") + " AS level",
         (src_name or "NULL") + " AS src",
-        "CASE WHEN r.id IS NULL THEN 0 ELSE 1 END AS is_read",
+        f"CASE WHEN {_IS_READ} THEN 1 ELSE 0 END AS is_read",
     ]
 
-    base = f"""
+    live = f"""
         SELECT {', '.join(sel_parts)}
         FROM notifications n
-        LEFT JOIN notification_reads r
-               ON r.notification_id=n.id AND r.user_key=%s
+        {_READ_JOINS}
     """
+    params: List = [user_key, user_key]
+
+    if include_archive and _table_exists("notifications_archive"):
+        archived = """
+            SELECT a.id, a.message AS msg, a.created_at AS dt, a.level, a.src, 1 AS is_read
+            FROM notifications_archive a
+        """
+        base = f"SELECT * FROM ({live} UNION ALL {archived}) h"
+        msg_filter, id_col = "h.msg", "h.id"
+    else:
+        base, msg_filter, id_col = live, msg_expr, "n.id"
 
-    params: List = [user_key]
     where = ""
     if q:
-        where = f"WHERE LOWER({msg_expr}) LIKE %s"
+        where = f" WHERE LOWER({msg_filter}) LIKE %s"
         params.append(f"%{q.lower()}%")
 
-    tail = " ORDER BY n.id DESC LIMIT %s OFFSET %s"
+    tail = f" ORDER BY {id_col} DESC LIMIT %s OFFSET %s"
     params.extend([int(limit), int(offset)])
 
     rows = _fetchall(base + where + tail, tuple(params))
@@ -306,6 +343,10 @@ def unread_of_source(user_key: str, src_value: str, limit: int = 1) -> List[Dict
     """
     Повертає непрочитані нотифікації певного джерела (наприклад, src='banner'),
     щоб показати банер 1 раз.
+    Пошук іде по індексу (src, id) від межі ущільнення користувача
+    (notification_read_marks.last_id — усе до неї прочитано), а вище неї
+    прочитані відсіює анти-join з notification_reads: банер, пропущений
+    між двома прочитаними, теж буде показаний.
     """
     _ensure_reads_table()
     cols = _columns_meta()
@@ -328,16 +369,19 @@ def unread_of_source(user_key: str, src_value: str, limit: int = 1) -> List[Dict
         f"{src_col} AS src",
     ]
 
+    # скалярний підзапит по PK обчислюється один раз — межа діапазону для (src, id)
     sql = f"""
         SELECT {', '.join(sel_parts)}
         FROM notifications n
         LEFT JOIN notification_reads r
                ON r.notification_id = n.id AND r.user_key = %s
-        WHERE r.id IS NULL AND {src_col}=%s
+        WHERE n.{src_col} = %s
+          AND n.id > COALESCE((SELECT last_id FROM notification_read_marks WHERE user_key = %s), 0)
+          AND r.id IS NULL
         ORDER BY n.id ASC
         LIMIT %s
     """
-    return _fetchall(sql, (user_key, src_value, int(limit)))
+    return _fetchall(sql, (user_key, src_value, user_key, int(limit)))
 
 
 def mark_read(ids: List[int]) -> int:
@@ -382,6 +426,7 @@ def request_closed(
     """
     Публікує стандартне повідомлення про закриття/завершення заявки.
     Параметри гнучкі, щоб підходило під різні виклики у коді.
+    Повторний виклик з тими ж параметрами не дублює повідомлення.
     """
     parts: List[str] = [f"Заявка {request_number} завершена"]
     tail: List[str] = []
@@ -394,4 +439,4 @@ def request_closed(
     if tail:
         parts.append(f"({', '.join(tail)})")
     msg = " ".join(parts)
-    return push(msg, level="success", src=src)
+    return push_once(msg, level="success", src=src)
@@ -0,0 +1,220 @@
+# utils/perf_overlay.py
+"""
+Діагностична панель продуктивності екранів (опційна, PERF_OVERLAY=1).
+
+Для останньої дії на поточному екрані (відкриття плитки, оновлення списку…)
+показує загальний час і з чого він складається:
+
+    DB      — сумарний час SQL (з database.query_profiler) і к-сть запитів
+    build   — Python: побудова контролів без часу БД
+    update  — page.update()/page.go() — серіалізація і відправка клієнту
+    controls — скільки контролів у побудованому дереві
+
+Використання в лаунчері:
+
+    attach(page)                                        # None, якщо вимкнено
+    with action(page, "Моніторинг"):
+        view = timed_build(page, monitoring_view, page)
+        with phase(page, "update"):
+            page.views.append(view); page.go(view.route)
+
+Ctrl+Shift+P — сховати/показати панель.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import flet as ft
+
+from database import query_profiler
+from utils.logger import log
+
+ENABLED = os.getenv("PERF_OVERLAY", "0").lower() in ("1", "true", "yes")
+
+# трекер дії, що виконується в цьому потоці / задачі: запити інших сесій
+# і фонових потоків (стрічка змін, архівація) у її лічильники не потрапляють
+_acting: ContextVar["PerfTracker | None"] = ContextVar("perf_acting", default=None)
+
+
+def count_controls(root) -> int:
+    """Кількість контролів у дереві (controls / content / rows / cells …)."""
+    seen = 0
+    stack = [root]
+    while stack:
+        c = stack.pop()
+        if c is None:
+            continue
+        if isinstance(c, (list, tuple)):
+            stack.extend(c)
+            continue
+        if not isinstance(c, ft.Control):
+            continue
+        seen += 1
+        for attr in ("controls", "content", "rows", "cells", "columns", "tabs", "actions", "title", "leading", "appbar"):
+            child = getattr(c, attr, None)
+            if child is not None and not isinstance(child, (str, int, float, bool)):
+                stack.append(child)
+    return seen
+
+
+class PerfTracker:
+    """Метрики останньої дії однієї сесії + контроли панелі."""
+
+    def __init__(self, page: ft.Page):
+        self.page = page
+        self._lock = threading.Lock()
+        self._active = False
+        self._t0 = 0.0
+        self._db_sec = 0.0
+        self._db_count = 0
+        self.last: dict = {}
+        self.text = ft.Text("perf: —", size=11, color="#e2e8f0", font_family="monospace", selectable=True)
+        self.panel = ft.Container(
+            self.text,
+            right=12, bottom=12,
+            padding=ft.padding.symmetric(horizontal=10, vertical=6),
+            border_radius=8,
+            bgcolor="#cc0b0b1a",
+            border=ft.border.all(1, "#334155"),
+        )
+        query_profiler.add_listener(self._on_query)
+
+    # ── БД: рахуємо лише запити самої вимірюваної дії ──
+    def _on_query(self, fp, elapsed, rows, caller):
+        if _acting.get() is not self:
+            return
+        with self._lock:
+            if self._active:
+                self._db_sec += elapsed
+                self._db_count += 1
+
+    def begin(self, name: str):
+        with self._lock:
+            self._active = True
+            self._t0 = time.perf_counter()
+            self._db_sec = 0.0
+            self._db_count = 0
+            self.last = {"action": name, "build_ms": 0.0, "update_ms": 0.0, "controls": 0}
+
+    def add_phase(self, phase: str, elapsed: float, db_before: float, controls: int | None = None):
+        """Python-час фази = її тривалість мінус SQL, що виконувався всередині."""
+        with self._lock:
+            if not self._active:
+                return
+            key = "build_ms" if phase == "build" else "update_ms"
+            self.last[key] += max(0.0, elapsed - (self._db_sec - db_before)) * 1000
+            if controls is not None:
+                self.last["controls"] = controls
+
+    def finish(self):
+        with self._lock:
+            self._active = False
+            self.last["db_ms"] = self._db_sec * 1000
+            self.last["queries"] = self._db_count
+            self.last["wall_ms"] = (time.perf_counter() - self._t0) * 1000
+            snap = dict(self.last)
+        self._render(snap)
+
+    def _render(self, m: dict):
+        self.text.value = (
+            f"{m.get('action', '—')}: {m.get('wall_ms', 0):.0f} ms | "
+            f"DB {m.get('db_ms', 0):.0f} ms / {m.get('queries', 0)} q | "
+            f"build {m.get('build_ms', 0):.0f} ms | update {m.get('update_ms', 0):.0f} ms | "
+            f"{m.get('controls', 0)} ctrl"
+        )
+        try:
+            if self.text.page is not None:
+                self.text.update()
+        except Exception as e:
+            log(f"perf overlay update failed: {e}", tag="perf")
+
+    def toggle(self):
+        self.panel.visible = not self.panel.visible
+        try:
+            self.panel.update()
+        except Exception:
+            pass
+
+    def close(self):
+        query_profiler.remove_listener(self._on_query)
+
+
+# ── один трекер на сесію ──
+_TRACKERS: dict[int, PerfTracker] = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def attach(page: ft.Page) -> PerfTracker | None:
+    """Увімкнути панель для сесії (якщо PERF_OVERLAY=1). Вмикає і профайлер SQL."""
+    if not ENABLED:
+        return None
+    query_profiler.enable(True)
+    with _TRACKERS_LOCK:
+        tr = _TRACKERS.get(id(page))
+        if tr is None or tr.page is not page:
+            tr = _TRACKERS[id(page)] = PerfTracker(page)
+    if tr.panel not in page.overlay:
+        page.overlay.append(tr.panel)
+    return tr
+
+
+def get(page: ft.Page) -> PerfTracker | None:
+    return _TRACKERS.get(id(page))
+
+
+def forget(page: ft.Page):
+    with _TRACKERS_LOCK:
+        tr = _TRACKERS.pop(id(page), None)
+    if tr is not None:
+        tr.close()
+
+
+@contextmanager
+def action(page: ft.Page, name: str):
+    """Одна дія користувача: скидає лічильники і показує підсумок після завершення."""
+    tr = get(page)
+    if tr is None:
+        yield
+        return
+    tr.begin(name)
+    token = _acting.set(tr)
+    try:
+        yield
+    finally:
+        _acting.reset(token)
+        tr.finish()
+
+
+@contextmanager
+def phase(page: ft.Page, kind: str = "update", *, root=None):
+    """Фаза всередині action(): "build" або "update" (page.update / page.go)."""
+    tr = get(page)
+    if tr is None:
+        yield
+        return
+    db_before = tr._db_sec
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        tr.add_phase(kind, time.perf_counter() - t0, db_before,
+                     count_controls(root) if root is not None else None)
+
+
+def timed_build(page: ft.Page, builder, *args, **kwargs):
+    """Викликати конструктор екрану як фазу "build" і порахувати контроли результату."""
+    tr = get(page)
+    if tr is None:
+        return builder(*args, **kwargs)
+    db_before = tr._db_sec
+    t0 = time.perf_counter()
+    result = None
+    try:
+        result = builder(*args, **kwargs)
+        return result
+    finally:
+        tr.add_phase("build", time.perf_counter() - t0, db_before, count_controls(result))
@@ -0,0 +1,128 @@
+# utils/ui_updates.py
+"""
+Планувальник оновлень UI для Flet-сесії.
+
+Кожен page.update() серіалізує все «брудне» дерево контролів і відправляє
+його клієнту. Фонові цикли (годинник, поллери, таймер сушки) та обробники
+часто роблять кілька таких викликів поспіль. Тут оновлення збираються у
+вікні FRAME_WINDOW і відправляються одним повідомленням:
+
+    schedule_update(page, time_lbl)      # лише конкретні контроли
+    schedule_update(page)                # повний page.update()
+
+Контроли, передані явно, оновлюються через page.update(*controls) —
+без обходу решти сторінки. Для кожної сесії ведеться лічильник
+оновлень/контролів за секунду (update_stats(page)).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+from utils.logger import log
+
+FRAME_WINDOW = 0.05          # секунд: все, що прийшло у вікні, піде одним оновленням
+STATS_WINDOW = 5.0           # секунд: за який проміжок рахуємо «за секунду»
+
+
+class UpdateScheduler:
+    def __init__(self, page, window: float = FRAME_WINDOW):
+        self.page = page
+        self.window = window
+        self._lock = threading.Lock()
+        self._dirty: dict[int, object] = {}
+        self._full = False
+        self._timer: threading.Timer | None = None
+        self._history: deque[tuple[float, int]] = deque()   # (час, к-сть контролів; 0 = вся сторінка)
+        self.total_updates = 0
+        self.total_requests = 0
+
+    # ── публічне API ──
+    def request(self, *controls):
+        """Позначити контроли «брудними» (без аргументів — уся сторінка)."""
+        with self._lock:
+            self.total_requests += 1
+            if controls:
+                for c in controls:
+                    if c is not None:
+                        self._dirty[id(c)] = c
+            else:
+                self._full = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            full, dirty = self._full, list(self._dirty.values())
+            self._full = False
+            self._dirty.clear()
+        # контроли, ще не додані на сторінку, відправляти нема куди —
+        # їхні значення підуть разом із першим повним оновленням
+        dirty = [c for c in dirty if getattr(c, "page", True) is not None]
+        if not full and not dirty:
+            return
+        try:
+            if full:
+                self.page.update()
+            else:
+                self.page.update(*dirty)
+        except Exception as e:
+            log(f"update failed: {e}", tag="ui")
+            return
+        with self._lock:
+            self.total_updates += 1
+            now = time.monotonic()
+            self._history.append((now, 0 if full else len(dirty)))
+            self._trim(now)
+
+    def stats(self) -> dict:
+        """Оновлень і контролів за секунду за останні STATS_WINDOW секунд."""
+        with self._lock:
+            self._trim(time.monotonic())
+            n = len(self._history)
+            ctrls = sum(c for _, c in self._history)
+            full = sum(1 for _, c in self._history if c == 0)
+        return {
+            "updates_per_sec": n / STATS_WINDOW,
+            "controls_per_sec": ctrls / STATS_WINDOW,
+            "full_updates_per_sec": full / STATS_WINDOW,
+            "total_updates": self.total_updates,
+            "total_requests": self.total_requests,
+        }
+
+    def _trim(self, now: float):
+        while self._history and now - self._history[0][0] > STATS_WINDOW:
+            self._history.popleft()
+
+
+# ── один планувальник на сесію (page) ──
+_SCHEDULERS: dict[int, UpdateScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(page) -> UpdateScheduler:
+    key = id(page)
+    with _SCHEDULERS_LOCK:
+        sched = _SCHEDULERS.get(key)
+        if sched is None or sched.page is not page:
+            sched = UpdateScheduler(page)
+            _SCHEDULERS[key] = sched
+    return sched
+
+
+def schedule_update(page, *controls):
+    get_scheduler(page).request(*controls)
+
+
+def update_stats(page) -> dict:
+    return get_scheduler(page).stats()
+
+
+def forget(page):
+    """Прибрати планувальник сесії (на відключенні клієнта)."""
+    with _SCHEDULERS_LOCK:
+        _SCHEDULERS.pop(id(page), None)